@@ -6,6 +6,7 @@ from sqlalchemy import create_engine
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .base.model import init_model
+from .profiling import init_route_profiling, init_sql_profiling
 from .views.graph import graph_bp
 from .views.main import main_bp
 from .views.tree import tree_bp
@@ -20,6 +21,8 @@ def create_app():
     db_url = os.environ.get("CH_DBURL", "mysql://chuser@localhost/ch?connect_timeout=1")
     engine = create_engine(db_url, echo=False, pool_recycle=60)
     init_model(engine)
+    init_sql_profiling(app, engine)
+    init_route_profiling(app)
     app.register_blueprint(main_bp)
     app.register_blueprint(graph_bp)
     app.register_blueprint(tree_bp)
@@ -0,0 +1,39 @@
+"""add DataVersion table
+
+Revision ID: 2b6d9f4e7a13
+Revises: e8f3c5a1b9d7
+Create Date: 2026-10-19 19:05:51.402716
+
+"""
+
+from datetime import UTC, datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2b6d9f4e7a13"
+down_revision = "e8f3c5a1b9d7"
+
+
+def upgrade():
+    table = op.create_table(
+        "DataVersion",
+        sa.Column("name", sa.String(20), nullable=False, primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("changed", sa.DateTime(), nullable=False),
+        mysql_charset="utf8",
+        mysql_engine="InnoDB",
+    )
+    now = datetime.now(UTC).replace(tzinfo=None)
+    op.bulk_insert(
+        table,
+        [
+            {"name": "ingest", "version": 1, "changed": now},
+            {"name": "reference", "version": 1, "changed": now},
+        ],
+    )
+
+
+def downgrade():
+    op.drop_table("DataVersion")
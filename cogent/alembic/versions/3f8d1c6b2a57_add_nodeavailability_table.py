@@ -0,0 +1,43 @@
+"""add NodeAvailability table
+
+Revision ID: 3f8d1c6b2a57
+Revises: 7c2e4a91d0b3
+Create Date: 2026-10-19 10:02:17.530284
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.sql import text
+
+# revision identifiers, used by Alembic.
+revision = "3f8d1c6b2a57"
+down_revision = "7c2e4a91d0b3"
+
+
+def upgrade():
+    op.create_table(
+        "NodeAvailability",
+        sa.Column("nodeId", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("type", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("firstSeen", sa.DateTime(), nullable=False),
+        sa.Column("lastSeen", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["nodeId"], ["Node.id"]),
+        sa.ForeignKeyConstraint(["type"], ["SensorType.id"]),
+        mysql_charset="utf8",
+        mysql_engine="InnoDB",
+    )
+    op.create_index("na_1", "NodeAvailability", ["type", "lastSeen"])
+    conn = op.get_bind()
+    conn.execute(
+        text(
+            "INSERT INTO NodeAvailability (nodeId, `type`, firstSeen, lastSeen) "
+            "SELECT nodeId, `type`, MIN(time), MAX(time) FROM Reading "
+            "GROUP BY nodeId, `type`"
+        )
+    )
+
+
+def downgrade():
+    op.drop_index("na_1", "NodeAvailability")
+    op.drop_table("NodeAvailability")
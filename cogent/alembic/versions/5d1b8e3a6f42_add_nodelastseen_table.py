@@ -0,0 +1,40 @@
+"""add NodeLastSeen table
+
+Revision ID: 5d1b8e3a6f42
+Revises: c4a7f2e9b815
+Create Date: 2026-10-19 17:11:32.551270
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.orm import Session
+
+from cogent.base.model.nodelastseen import backfill_last_seen
+
+# revision identifiers, used by Alembic.
+revision = "5d1b8e3a6f42"
+down_revision = "c4a7f2e9b815"
+
+
+def upgrade():
+    op.create_table(
+        "NodeLastSeen",
+        sa.Column("nodeId", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("time", sa.DateTime(), nullable=False),
+        sa.Column("seq_num", sa.Integer(), nullable=True),
+        sa.Column("parent", sa.Integer(), nullable=True),
+        sa.Column("rssi", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["nodeId"], ["Node.id"]),
+        mysql_charset="utf8",
+        mysql_engine="InnoDB",
+    )
+    op.create_index("nls_1", "NodeLastSeen", ["time"])
+    session = Session(bind=op.get_bind())
+    backfill_last_seen(session)
+    session.flush()
+
+
+def downgrade():
+    op.drop_index("nls_1", table_name="NodeLastSeen")
+    op.drop_table("NodeLastSeen")
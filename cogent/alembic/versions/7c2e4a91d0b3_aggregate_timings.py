@@ -0,0 +1,48 @@
+"""aggregate timings
+
+Revision ID: 7c2e4a91d0b3
+Revises: d6f7e37a8d50
+Create Date: 2026-10-19 09:12:44.118021
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c2e4a91d0b3"
+down_revision = "d6f7e37a8d50"
+
+_COLUMNS = [
+    ("calls", sa.Integer),
+    ("total", sa.Float),
+    ("minimum", sa.Float),
+    ("maximum", sa.Float),
+    ("p50", sa.Float),
+    ("p95", sa.Float),
+    ("p99", sa.Float),
+    ("flushed", sa.DateTime),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "Timings" not in inspector.get_table_names():
+        op.create_table(
+            "Timings",
+            sa.Column("id", sa.Integer(), nullable=False, primary_key=True),
+            sa.Column("text", sa.Text(), nullable=True),
+            sa.Column("function", sa.Text(), nullable=True),
+            sa.Column("args", sa.Text(), nullable=True),
+            sa.Column("kwargs", sa.Text(), nullable=True),
+            sa.Column("time", sa.Float(), nullable=True),
+            *[sa.Column(name, typ(), nullable=True) for name, typ in _COLUMNS],
+        )
+        return
+    for name, typ in _COLUMNS:
+        op.add_column("Timings", sa.Column(name, typ(), nullable=True))
+
+
+def downgrade():
+    for name, _ in reversed(_COLUMNS):
+        op.drop_column("Timings", name)
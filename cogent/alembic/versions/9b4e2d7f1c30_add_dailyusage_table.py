@@ -0,0 +1,42 @@
+"""add DailyUsage table
+
+Revision ID: 9b4e2d7f1c30
+Revises: 3f8d1c6b2a57
+Create Date: 2026-10-19 14:21:05.318842
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.orm import Session
+
+from cogent.base.model.dailyusage import backfill_usage
+
+# revision identifiers, used by Alembic.
+revision = "9b4e2d7f1c30"
+down_revision = "3f8d1c6b2a57"
+
+
+def upgrade():
+    op.create_table(
+        "DailyUsage",
+        sa.Column("nodeId", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("type", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False, primary_key=True),
+        sa.Column("used", sa.Float(), nullable=False),
+        sa.Column("readings", sa.Integer(), nullable=False),
+        sa.Column("lastTime", sa.DateTime(), nullable=False),
+        sa.Column("lastValue", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["nodeId"], ["Node.id"]),
+        sa.ForeignKeyConstraint(["type"], ["SensorType.id"]),
+        mysql_charset="utf8",
+        mysql_engine="InnoDB",
+    )
+    # consumption needs the counter reset rules, so is computed in Python
+    session = Session(bind=op.get_bind())
+    backfill_usage(session)
+    session.flush()
+
+
+def downgrade():
+    op.drop_table("DailyUsage")
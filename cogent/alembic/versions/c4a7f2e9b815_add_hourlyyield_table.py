@@ -0,0 +1,44 @@
+"""add HourlyYield table
+
+Revision ID: c4a7f2e9b815
+Revises: 9b4e2d7f1c30
+Create Date: 2026-10-19 16:02:47.904113
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.orm import Session
+
+from cogent.base.model.hourlyyield import backfill_yield
+
+# revision identifiers, used by Alembic.
+revision = "c4a7f2e9b815"
+down_revision = "9b4e2d7f1c30"
+
+
+def upgrade():
+    op.create_table(
+        "HourlyYield",
+        sa.Column("nodeId", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("hour", sa.DateTime(), nullable=False, primary_key=True),
+        sa.Column("packets", sa.Integer(), nullable=False),
+        sa.Column("firstTime", sa.DateTime(), nullable=False),
+        sa.Column("firstSeq", sa.Integer(), nullable=False),
+        sa.Column("lastTime", sa.DateTime(), nullable=False),
+        sa.Column("lastSeq", sa.Integer(), nullable=False),
+        sa.Column("missed", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["nodeId"], ["Node.id"]),
+        mysql_charset="utf8",
+        mysql_engine="InnoDB",
+    )
+    op.create_index("hy_1", "HourlyYield", ["hour"])
+    # missed packets need the sequence wrap rules, so are computed in Python
+    session = Session(bind=op.get_bind())
+    backfill_yield(session)
+    session.flush()
+
+
+def downgrade():
+    op.drop_index("hy_1", table_name="HourlyYield")
+    op.drop_table("HourlyYield")
@@ -0,0 +1,43 @@
+"""add HourlyLink table
+
+Revision ID: e8f3c5a1b9d7
+Revises: 5d1b8e3a6f42
+Create Date: 2026-10-19 18:24:09.117385
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.orm import Session
+
+from cogent.base.model.hourlylink import backfill_links
+
+# revision identifiers, used by Alembic.
+revision = "e8f3c5a1b9d7"
+down_revision = "5d1b8e3a6f42"
+
+
+def upgrade():
+    op.create_table(
+        "HourlyLink",
+        sa.Column("nodeId", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("parent", sa.Integer(), nullable=False, primary_key=True),
+        sa.Column("hour", sa.DateTime(), nullable=False, primary_key=True),
+        sa.Column("packets", sa.Integer(), nullable=False),
+        sa.Column("rssiCount", sa.Integer(), nullable=False),
+        sa.Column("rssiSum", sa.Integer(), nullable=False),
+        sa.Column("rssiMin", sa.Integer(), nullable=True),
+        sa.Column("rssiMax", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["nodeId"], ["Node.id"]),
+        mysql_charset="utf8",
+        mysql_engine="InnoDB",
+    )
+    op.create_index("hl_1", "HourlyLink", ["hour"])
+    session = Session(bind=op.get_bind())
+    backfill_links(session)
+    session.flush()
+
+
+def downgrade():
+    op.drop_index("hl_1", table_name="HourlyLink")
+    op.drop_table("HourlyLink")
@@ -0,0 +1,173 @@
+"""
+Consumption from cumulative counter readings.
+
+Meter nodes (the Opti Smart Count, gas pulse counters and heat meters)
+report a running total rather than the consumption since their last
+packet.  The functions here turn arrays of ``(node, time, total)`` readings
+into the consumption of each reading, and sum that consumption per node
+into hourly, daily or weekly buckets.
+
+* Readings may be in any order; they are sorted by node and time first.
+* A total lower than its predecessor means the counter was reset, in which
+  case the reading itself is the consumption since the reset.
+* The first reading of a node only sets the baseline unless the previous
+  total of the node is given.
+* Consumption over a gap between readings is credited to the reading that
+  ends the gap, so hourly sums add up to daily sums.
+* Missing values (None or NaN) are ignored.
+
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+
+# sensor type ids of cumulative counters
+HEAT_ENERGY = 18
+HEAT_VOLUME = 19
+OPTI_SMART_COUNT = 40
+GAS_PULSE_COUNT = 43
+COUNTER_TYPES = (HEAT_ENERGY, HEAT_VOLUME, OPTI_SMART_COUNT, GAS_PULSE_COUNT)
+
+RESOLUTIONS = ("hour", "day", "week")
+
+# 1970-01-05 was a Monday, so weeks are counted from there
+_MONDAY = np.datetime64("1970-01-05", "s")
+
+
+def counter_step(previous, value):
+    """Consumption between two successive counter readings"""
+    if value < previous:
+        # the counter has been reset
+        return value if value >= 0 else 0.0
+    return value - previous
+
+
+def _stamps(times) -> np.ndarray:
+    """``times`` (dates or datetimes, possibly timezone aware) as
+    datetime64[s]"""
+    if isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.datetime64):
+        return times.astype("datetime64[s]")
+    return np.array(
+        [t.replace(tzinfo=None) if getattr(t, "tzinfo", None) else t for t in times],
+        dtype="datetime64[s]",
+    )
+
+
+def reading_usage(nodes, times, values, baseline=None):
+    """Consumption attributed to each reading
+
+    :param nodes: node id of each reading
+    :param times: time of each reading
+    :param values: counter total of each reading (None or NaN if missing)
+    :param baseline: optional dict mapping node id to the counter total
+        before its first reading here
+    :return: ``(nodes, times, values, usage)`` arrays sorted by node and
+        time, with missing readings removed
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    stamps = _stamps(times)
+    values = np.array(values, dtype=float)
+    keep = ~np.isnan(values)
+    nodes, stamps, values = nodes[keep], stamps[keep], values[keep]
+    order = np.lexsort((stamps, nodes))
+    nodes, stamps, values = nodes[order], stamps[order], values[order]
+
+    previous = np.empty_like(values)
+    previous[1:] = values[:-1]
+    first = np.ones(len(values), dtype=bool)
+    first[1:] = nodes[1:] != nodes[:-1]
+    # the first reading of each node steps from its baseline, if known
+    previous[first] = np.nan
+    for i in np.flatnonzero(first).tolist():
+        if baseline and baseline.get(int(nodes[i])) is not None:
+            previous[i] = baseline[int(nodes[i])]
+
+    usage = np.where(values < previous, np.maximum(values, 0.0), values - previous)
+    usage[np.isnan(previous)] = 0.0
+    return nodes, stamps, values, usage
+
+
+def bucket_index(stamps: np.ndarray, resolution: str) -> np.ndarray:
+    """Number of the hour, day or week (from Monday) containing each time"""
+    if resolution == "hour":
+        return stamps.astype("datetime64[h]").astype(np.int64)
+    if resolution == "day":
+        return stamps.astype("datetime64[D]").astype(np.int64)
+    if resolution == "week":
+        days = (stamps - _MONDAY) // np.timedelta64(1, "D")
+        return np.floor_divide(days, 7).astype(np.int64)
+    raise ValueError(f"unknown resolution {resolution!r}")
+
+
+def bucket_start(index: int, resolution: str) -> datetime:
+    """Start time of bucket ``index`` from :func:`bucket_index`"""
+    if resolution == "hour":
+        return datetime(1970, 1, 1) + timedelta(hours=index)
+    if resolution == "day":
+        return datetime(1970, 1, 1) + timedelta(days=index)
+    if resolution == "week":
+        return datetime(1970, 1, 5) + timedelta(weeks=index)
+    raise ValueError(f"unknown resolution {resolution!r}")
+
+
+class UsageBreakdown(NamedTuple):
+    """Consumption per bucket, for each node and in total"""
+
+    starts: list[datetime]
+    nodes: list[int]
+    by_node: np.ndarray
+    total: np.ndarray
+
+    def node_totals(self) -> dict[int, float]:
+        return dict(zip(self.nodes, self.by_node.sum(axis=1).tolist()))
+
+
+def _as_datetime(when) -> datetime:
+    if isinstance(when, datetime):
+        return when.replace(tzinfo=None)
+    if isinstance(when, date):
+        return datetime.combine(when, datetime.min.time())
+    return when
+
+
+def bucket_usage(nodes, times, usage, start, end, resolution="day") -> UsageBreakdown:
+    """Sum ``usage`` per node into the buckets covering ``start`` to ``end``
+
+    Usage outside the buckets is dropped.
+
+    :param start: first time (or day) to cover
+    :param end: last time (or day) to cover, inclusive
+    :param resolution: one of :data:`RESOLUTIONS`
+    """
+    first, last = bucket_index(
+        _stamps([_as_datetime(start), _as_datetime(end)]), resolution
+    ).tolist()
+    width = max(last - first + 1, 0)
+    starts = [bucket_start(i, resolution) for i in range(first, first + width)]
+
+    nodes = np.asarray(nodes, dtype=np.int64)
+    usage = np.asarray(usage, dtype=float)
+    cell = bucket_index(_stamps(times), resolution) - first
+    keep = (cell >= 0) & (cell < width)
+    ids, row = np.unique(nodes[keep], return_inverse=True)
+    by_node = np.bincount(
+        row * width + cell[keep],
+        weights=usage[keep],
+        minlength=len(ids) * width,
+    ).reshape(len(ids), width)
+    return UsageBreakdown(starts, ids.tolist(), by_node, by_node.sum(axis=0))
+
+
+def counter_usage(
+    nodes, times, values, start, end, resolution="day", baseline=None
+) -> UsageBreakdown:
+    """Consumption per node and bucket from raw counter readings
+
+    See :func:`reading_usage` and :func:`bucket_usage`.
+    """
+    nodes, stamps, _, usage = reading_usage(nodes, times, values, baseline)
+    return bucket_usage(nodes, stamps, usage, start, end, resolution)
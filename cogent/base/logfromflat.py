@@ -24,6 +24,12 @@ from sqlalchemy import and_, create_engine
 import cogent.base.model as models
 import cogent.base.model.meta as meta
 from cogent.base.model import Node, NodeState, Reading, SensorType
+from cogent.base.model.dailyusage import record_usage
+from cogent.base.model.dataversion import INGEST, bump_version
+from cogent.base.model.hourlylink import record_link
+from cogent.base.model.hourlyyield import record_yield
+from cogent.base.model.nodeavailability import record_availability
+from cogent.base.model.nodelastseen import record_last_seen
 
 LOGGER = logging.getLogger("ch.base")
 
@@ -135,7 +141,13 @@ class LogFromFlat(object):
                     rssi=rssi_val,
                 )
                 session.add(node_state)
+                record_yield(session, node_id, seq, current_time)
+                record_link(session, node_id, parent_id, rssi_val, current_time)
+                record_last_seen(
+                    session, node_id, current_time, seq, parent_id, rssi_val
+                )
 
+                values = {}
                 for i, value in list(msg.items()):
                     # skip any non-numeric type_ids
                     try:
@@ -163,6 +175,11 @@ class LogFromFlat(object):
                     )
                     session.add(r)
                     session.flush()
+                    values[type_id] = value
+
+                record_availability(session, node_id, list(values), current_time)
+                record_usage(session, node_id, values, current_time)
+                bump_version(session, INGEST, current_time)
 
                 self.log.debug("reading: {}".format(node_state))
                 session.commit()
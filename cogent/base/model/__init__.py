@@ -11,18 +11,24 @@ Classes to initialise the SQL and populate with default Sensors
 """
 
 from .bitset import Bitset
+from .dailyusage import DailyUsage
+from .dataversion import DataVersion
 from .deployment import Deployment
 from .deploymentmetadata import DeploymentMetadata
 from .event import Event
 from .host import Host
+from .hourlylink import HourlyLink
+from .hourlyyield import HourlyYield
 from .house import House
 from .init import clsFromJSON, findClass, init_model, initialise_sql, newClsFromJSON
 from .lastreport import LastReport
 from .location import Location
 from .meta import Base, Session
 from .node import Node
+from .nodeavailability import NodeAvailability
 from .nodeboot import NodeBoot
 from .nodehistory import NodeHistory
+from .nodelastseen import NodeLastSeen
 from .nodestate import NodeState
 from .nodetype import NodeType
 from .occupier import Occupier
@@ -42,14 +48,20 @@ from .weather import Weather
 __all__ = [
     Base,
     Bitset,
+    DailyUsage,
+    DataVersion,
     Deployment,
     DeploymentMetadata,
     Event,
     Host,
+    HourlyLink,
+    HourlyYield,
     House,
     LastReport,
     Location,
     Node,
+    NodeAvailability,
+    NodeLastSeen,
     NodeBoot,
     NodeHistory,
     NodeState,
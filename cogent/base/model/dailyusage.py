@@ -0,0 +1,208 @@
+"""
+Daily consumption recorded by cumulative meter readings.
+
+Meter nodes such as the Opti Smart Count report a running total rather than
+the consumption since the last packet.  The table holds the consumption per
+node, type and day, maintained as readings are logged, so that usage pages
+read one row per node per day rather than every raw reading.
+
+Consumption is worked out by :mod:`cogent.base.counters`, which also lists
+the counter types recorded here.
+
+"""
+
+import logging
+from datetime import datetime
+from itertools import groupby
+
+import numpy as np
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    and_,
+    delete,
+)
+
+from ..counters import COUNTER_TYPES, counter_step, reading_usage
+from . import meta
+from .reading import Reading
+
+LOG = logging.getLogger(__name__)
+
+
+class DailyUsage(meta.Base, meta.InnoDBMix):
+    """
+    Consumption measured by a cumulative counter on one day.
+
+    :var Integer nodeId: Id of `Node`
+    :var Integer typeId: Id of `SensorType` (stored in column ``type``)
+    :var Date day: UTC day
+    :var Float used: consumption attributed to readings on this day
+    :var Integer readings: number of readings on this day
+    :var DateTime lastTime: time of the last reading on this day
+    :var Float lastValue: counter value of the last reading on this day
+    """
+
+    __tablename__ = "DailyUsage"
+
+    nodeId = Column(
+        Integer, ForeignKey("Node.id"), primary_key=True, autoincrement=False
+    )
+    typeId = Column(
+        "type",
+        Integer,
+        ForeignKey("SensorType.id"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    day = Column(Date, primary_key=True, autoincrement=False)
+    used = Column(Float, nullable=False, default=0.0)
+    readings = Column(Integer, nullable=False, default=0)
+    lastTime = Column(DateTime, nullable=False)
+    lastValue = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return "DailyUsage({0},{1},{2},{3})".format(
+            self.nodeId, self.typeId, self.day, self.used
+        )
+
+
+def _naive(when):
+    return when.replace(tzinfo=None)
+
+
+def daily_rows(node_id, type_id, readings, previous=None):
+    """DailyUsage rows for ``readings``
+
+    :param readings: ``(time, value)`` pairs
+    :param previous: ``(time, value)`` of the reading before the first, if
+        there is one
+    """
+    readings = list(readings)
+    if not readings:
+        return []
+    times, values = zip(*readings)
+    baseline = {node_id: previous[1]} if previous is not None else None
+    _, stamps, values, usage = reading_usage(
+        np.full(len(times), node_id), times, values, baseline
+    )
+    days = stamps.astype("datetime64[D]")
+    edges = np.flatnonzero(days[1:] != days[:-1]) + 1
+    starts = np.concatenate(([0], edges)).tolist()
+    stops = np.concatenate((edges, [len(days)])).tolist()
+    return [
+        DailyUsage(
+            nodeId=node_id,
+            typeId=type_id,
+            day=days[start].item(),
+            used=float(usage[start:stop].sum()),
+            readings=stop - start,
+            lastTime=stamps[stop - 1].item(),
+            lastValue=float(values[stop - 1]),
+        )
+        for start, stop in zip(starts, stops)
+    ]
+
+
+def rebuild_usage(session, node_id, type_id, since):
+    """Recompute the rows of one node and type from day ``since`` onward"""
+    start = datetime.combine(since, datetime.min.time())
+    previous = (
+        session.query(Reading.time, Reading.value)
+        .filter(
+            and_(
+                Reading.nodeId == node_id,
+                Reading.typeId == type_id,
+                Reading.time < start,
+                Reading.value.isnot(None),
+            )
+        )
+        .order_by(Reading.time.desc())
+        .first()
+    )
+    readings = (
+        session.query(Reading.time, Reading.value)
+        .filter(
+            and_(
+                Reading.nodeId == node_id,
+                Reading.typeId == type_id,
+                Reading.time >= start,
+                Reading.value.isnot(None),
+            )
+        )
+        .order_by(Reading.time)
+        .all()
+    )
+    session.execute(
+        delete(DailyUsage).where(
+            and_(
+                DailyUsage.nodeId == node_id,
+                DailyUsage.typeId == type_id,
+                DailyUsage.day >= since,
+            )
+        )
+    )
+    session.add_all(daily_rows(node_id, type_id, readings, previous))
+
+
+def record_usage(session, node_id, values, when):
+    """Add readings logged at ``when`` to the daily usage of ``node_id``
+
+    :param values: dict mapping type id to reading value; types that are
+        not in :data:`COUNTER_TYPES` are ignored
+
+    A reading older than the latest one already recorded (which happens
+    when logs are replayed out of order) causes the days from its own
+    onward to be recomputed from the Reading table.  The caller is
+    responsible for committing the session.
+    """
+    when = _naive(when)
+    for type_id, value in values.items():
+        if type_id not in COUNTER_TYPES or value is None:
+            continue
+        latest = (
+            session.query(DailyUsage)
+            .filter(DailyUsage.nodeId == node_id, DailyUsage.typeId == type_id)
+            .order_by(DailyUsage.day.desc())
+            .first()
+        )
+        if latest is not None and when <= latest.lastTime:
+            session.flush()
+            rebuild_usage(session, node_id, type_id, when.date())
+            continue
+        row = latest
+        if latest is None or latest.day != when.date():
+            row = DailyUsage(
+                nodeId=node_id, typeId=type_id, day=when.date(), used=0.0, readings=0
+            )
+            session.add(row)
+        if latest is not None:
+            row.used += counter_step(latest.lastValue, value)
+        row.readings += 1
+        row.lastTime = when
+        row.lastValue = value
+
+
+def backfill_usage(session):
+    """Rebuild the DailyUsage table from the Reading table
+
+    :return: number of rows written
+    """
+    session.execute(delete(DailyUsage))
+    readings = (
+        session.query(Reading.nodeId, Reading.typeId, Reading.time, Reading.value)
+        .filter(Reading.typeId.in_(COUNTER_TYPES), Reading.value.isnot(None))
+        .order_by(Reading.nodeId, Reading.typeId, Reading.time)
+        .yield_per(10000)
+    )
+    rows = []
+    for (node_id, type_id), group in groupby(readings, key=lambda r: r[:2]):
+        rows.extend(daily_rows(node_id, type_id, ((t, v) for (_, _, t, v) in group)))
+    session.add_all(rows)
+    count = len(rows)
+    LOG.info("Backfilled %d DailyUsage rows", count)
+    return count
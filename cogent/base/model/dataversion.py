@@ -0,0 +1,122 @@
+"""
+Watermarks that change whenever the data shown by the web pages changes.
+
+There is one row per kind of change: ``ingest`` is bumped as packets are
+logged and ``reference`` whenever houses, rooms, nodes, sensors and other
+reference data are added, edited or removed through the ORM.  Together with
+the per-node times in NodeLastSeen, this lets views answer conditional
+requests with a single small query.
+
+"""
+
+import logging
+from datetime import UTC, datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, event, insert, select, update
+from sqlalchemy.orm import Session as _Session
+
+from . import meta
+from .deployment import Deployment
+from .house import House
+from .location import Location
+from .node import Node
+from .nodetype import NodeType
+from .occupier import Occupier
+from .room import Room
+from .roomtype import RoomType
+from .sensor import Sensor
+from .sensortype import SensorType
+
+LOG = logging.getLogger(__name__)
+
+INGEST = "ingest"
+REFERENCE = "reference"
+
+REFERENCE_CLASSES = (
+    Deployment,
+    House,
+    Location,
+    Node,
+    NodeType,
+    Occupier,
+    Room,
+    RoomType,
+    Sensor,
+    SensorType,
+)
+
+
+class DataVersion(meta.Base, meta.InnoDBMix):
+    """
+    Counter bumped on every change of one kind of data.
+
+    :var String name: kind of change (``ingest`` or ``reference``)
+    :var Integer version: number of changes so far
+    :var DateTime changed: time of the latest change
+    """
+
+    __tablename__ = "DataVersion"
+
+    name = Column(String(20), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    changed = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return "DataVersion({0},{1},{2})".format(self.name, self.version, self.changed)
+
+
+def bump_version(connection, name, when=None):
+    """Record a change of kind ``name`` at ``when`` (default now)
+
+    :param connection: session or connection to execute on; the change is
+        committed with it
+    """
+    when = (when or datetime.now(UTC)).replace(tzinfo=None)
+    result = connection.execute(
+        update(DataVersion)
+        .where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1, changed=when)
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            insert(DataVersion).values(name=name, version=1, changed=when)
+        )
+
+
+def watermark(session, name):
+    """Return ``(version, changed)`` of the watermark ``name``, or
+    ``(0, None)`` if nothing of that kind has been recorded"""
+    row = session.execute(
+        select(DataVersion.version, DataVersion.changed).where(DataVersion.name == name)
+    ).first()
+    return (row.version, row.changed) if row is not None else (0, None)
+
+
+def data_version(session):
+    """Return ``(version, changed)`` covering every kind of change
+
+    ``version`` is a string that differs whenever any watermark has been
+    bumped, and ``changed`` the time of the latest change (None if nothing
+    has been recorded).
+    """
+    rows = session.execute(
+        select(DataVersion.name, DataVersion.version, DataVersion.changed).order_by(
+            DataVersion.name
+        )
+    ).all()
+    version = ",".join(f"{name}:{count}" for name, count, _ in rows)
+    changed = max((when for _, _, when in rows), default=None)
+    return version or "none", changed
+
+
+@event.listens_for(_Session, "before_flush")
+def _reference_edited(session, flush_context, instances):
+    """Bump the reference watermark when reference data is flushed"""
+    edited = [
+        obj
+        for obj in (*session.new, *session.deleted, *session.dirty)
+        if isinstance(obj, REFERENCE_CLASSES)
+        and (obj not in session.dirty or session.is_modified(obj))
+    ]
+    if edited:
+        bump_version(session.connection(), REFERENCE)
@@ -0,0 +1,121 @@
+"""
+Hourly statistics of the radio link from each node to its parent.
+
+The network tree shows, for each node, the parents it has sent packets
+through and the mean signal strength of those packets.  The table holds the
+packet count and RSSI statistics per node, parent and hour, maintained as
+packets are logged, so that the tree for any period is combined from a few
+rows per link rather than by averaging the NodeState table.
+
+"""
+
+import logging
+from itertools import groupby
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, delete
+
+from . import meta
+from .nodestate import NodeState
+
+LOG = logging.getLogger(__name__)
+
+
+class HourlyLink(meta.Base, meta.InnoDBMix):
+    """
+    Packets a node sent through one parent during one hour.
+
+    :var Integer nodeId: Id of `Node`
+    :var Integer parent: parent node in the routing tree
+    :var DateTime hour: start of the (UTC) hour
+    :var Integer packets: number of packets received
+    :var Integer rssiCount: number of those packets with an RSSI
+    :var Integer rssiSum: sum of their RSSI
+    :var Integer rssiMin: lowest RSSI
+    :var Integer rssiMax: highest RSSI
+    """
+
+    __tablename__ = "HourlyLink"
+
+    nodeId = Column(
+        Integer, ForeignKey("Node.id"), primary_key=True, autoincrement=False
+    )
+    parent = Column(Integer, primary_key=True, autoincrement=False)
+    hour = Column(DateTime, primary_key=True, autoincrement=False)
+    packets = Column(Integer, nullable=False)
+    rssiCount = Column(Integer, nullable=False, default=0)
+    rssiSum = Column(Integer, nullable=False, default=0)
+    rssiMin = Column(Integer)
+    rssiMax = Column(Integer)
+
+    __table_args__ = (Index("hl_1", "hour"),)  # type: ignore[assignment]
+
+    def __repr__(self):
+        return "HourlyLink({0},{1},{2},{3})".format(
+            self.nodeId, self.parent, self.hour, self.packets
+        )
+
+    def add(self, rssi):
+        """Count one packet with signal strength ``rssi`` (may be None)"""
+        self.packets += 1
+        if rssi is None:
+            return
+        self.rssiCount += 1
+        self.rssiSum += rssi
+        self.rssiMin = rssi if self.rssiMin is None else min(self.rssiMin, rssi)
+        self.rssiMax = rssi if self.rssiMax is None else max(self.rssiMax, rssi)
+
+
+def _hour(when):
+    return when.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+
+
+def _empty(node_id, parent, hour):
+    return HourlyLink(
+        nodeId=node_id, parent=parent, hour=hour, packets=0, rssiCount=0, rssiSum=0
+    )
+
+
+def record_link(session, node_id, parent, rssi, when):
+    """Count a packet from ``node_id`` through ``parent`` received at ``when``
+
+    The caller is responsible for committing the session.
+    """
+    if parent is None:
+        return
+    hour = _hour(when)
+    row = session.get(HourlyLink, (node_id, parent, hour))
+    if row is None:
+        row = _empty(node_id, parent, hour)
+        session.add(row)
+    row.add(rssi)
+
+
+def backfill_links(session):
+    """Rebuild the HourlyLink table from the NodeState table
+
+    :return: number of rows written
+    """
+    session.execute(delete(HourlyLink))
+    states = (
+        session.query(
+            NodeState.nodeId, NodeState.time, NodeState.parent, NodeState.rssi
+        )
+        .filter(NodeState.parent.isnot(None))
+        .order_by(NodeState.nodeId, NodeState.time)
+        .yield_per(10000)
+    )
+    rows = []
+    for (node_id, hour), group in groupby(
+        states, key=lambda s: (s.nodeId, _hour(s.time))
+    ):
+        links = {}
+        for state in group:
+            row = links.get(state.parent)
+            if row is None:
+                row = links[state.parent] = _empty(node_id, state.parent, hour)
+            row.add(state.rssi)
+        rows.extend(links.values())
+    session.add_all(rows)
+    count = len(rows)
+    LOG.info("Backfilled %d HourlyLink rows", count)
+    return count
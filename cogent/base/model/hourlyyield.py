@@ -0,0 +1,195 @@
+"""
+Hourly summary of the packets received from each node.
+
+Packet yield compares the number of packets received with the number sent,
+which is inferred from the 8-bit sequence numbers of the packets.  The
+table holds, for each node and hour, the packet count and the first and
+last sequence numbers, maintained as packets are logged.  Yield over any
+window is then combined from the hourly rows rather than by scanning the
+NodeState table.
+
+"""
+
+import logging
+from datetime import datetime
+from itertools import groupby
+from typing import NamedTuple
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, delete
+
+from cogent.sip.calc_yield import calc_missed_and_yield
+
+from . import meta
+from .nodestate import NodeState
+
+LOG = logging.getLogger(__name__)
+
+
+class HourlyYield(meta.Base, meta.InnoDBMix):
+    """
+    Packets received from a node during one hour.
+
+    :var Integer nodeId: Id of `Node`
+    :var DateTime hour: start of the (UTC) hour
+    :var Integer packets: number of packets received
+    :var DateTime firstTime: time of the earliest packet
+    :var Integer firstSeq: sequence number of the earliest packet
+    :var DateTime lastTime: time of the latest packet
+    :var Integer lastSeq: sequence number of the latest packet
+    :var Integer missed: packets missed during the hour, as given by
+        :func:`~cogent.sip.calc_yield.calc_missed_and_yield`
+    """
+
+    __tablename__ = "HourlyYield"
+
+    nodeId = Column(
+        Integer, ForeignKey("Node.id"), primary_key=True, autoincrement=False
+    )
+    hour = Column(DateTime, primary_key=True, autoincrement=False)
+    packets = Column(Integer, nullable=False)
+    firstTime = Column(DateTime, nullable=False)
+    firstSeq = Column(Integer, nullable=False)
+    lastTime = Column(DateTime, nullable=False)
+    lastSeq = Column(Integer, nullable=False)
+    missed = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("hy_1", "hour"),)  # type: ignore[assignment]
+
+    def __repr__(self):
+        return "HourlyYield({0},{1},{2},{3})".format(
+            self.nodeId, self.hour, self.packets, self.missed
+        )
+
+
+class NodeYield(NamedTuple):
+    """Packet yield of one node over a window"""
+
+    packets: int
+    minseq: int
+    maxseq: int
+    last: datetime
+    missed: int
+    yld: float
+
+
+def _naive(when):
+    return when.replace(tzinfo=None)
+
+
+def _hour(when):
+    return _naive(when).replace(minute=0, second=0, microsecond=0)
+
+
+def _missed(packets, first_seq, last_seq):
+    return calc_missed_and_yield(packets, first_seq, last_seq)[0]
+
+
+def record_yield(session, node_id, seq, when):
+    """Count a packet with sequence number ``seq`` received at ``when``
+
+    The caller is responsible for committing the session.
+    """
+    when = _naive(when)
+    hour = _hour(when)
+    row = session.get(HourlyYield, (node_id, hour))
+    if row is None:
+        session.add(
+            HourlyYield(
+                nodeId=node_id,
+                hour=hour,
+                packets=1,
+                firstTime=when,
+                firstSeq=seq,
+                lastTime=when,
+                lastSeq=seq,
+                missed=0,
+            )
+        )
+        return
+    row.packets += 1
+    # packets replayed out of order may come before the first
+    if when < row.firstTime:
+        row.firstTime, row.firstSeq = when, seq
+    if when >= row.lastTime:
+        row.lastTime, row.lastSeq = when, seq
+    row.missed = _missed(row.packets, row.firstSeq, row.lastSeq)
+
+
+def combine_hours(rows):
+    """Yield over consecutive hours from their HourlyYield rows
+
+    The packets missed within each hour are added to those missed between
+    the last packet of one hour and the first of the next, so that the
+    result agrees with :func:`~cogent.sip.calc_yield.calc_missed_and_yield`
+    over the whole window while fewer than 256 packets go missing in a row.
+
+    :param rows: HourlyYield rows of one node in time order
+    :return: :class:`NodeYield`, or None if there are no rows
+    """
+    rows = list(rows)
+    if not rows:
+        return None
+    packets = sum(row.packets for row in rows)
+    missed = sum(row.missed for row in rows)
+    for before, after in zip(rows, rows[1:]):
+        missed += _missed(2, before.lastSeq, after.firstSeq)
+    return NodeYield(
+        packets=packets,
+        minseq=rows[0].firstSeq,
+        maxseq=rows[-1].lastSeq,
+        last=rows[-1].lastTime,
+        missed=missed,
+        yld=packets * 100.0 / (packets + missed),
+    )
+
+
+def window_yields(session, start, end=None):
+    """Packet yield of each node that reported between ``start`` and ``end``
+
+    The window is widened to whole hours.
+
+    :return: dict mapping node id to :class:`NodeYield`
+    """
+    qry = session.query(HourlyYield).filter(HourlyYield.hour >= _hour(start))
+    if end is not None:
+        qry = qry.filter(HourlyYield.hour <= _naive(end))
+    qry = qry.order_by(HourlyYield.nodeId, HourlyYield.hour)
+    return {
+        node_id: combine_hours(rows)
+        for node_id, rows in groupby(qry, key=lambda row: row.nodeId)
+    }
+
+
+def backfill_yield(session):
+    """Rebuild the HourlyYield table from the NodeState table
+
+    :return: number of rows written
+    """
+    session.execute(delete(HourlyYield))
+    states = (
+        session.query(NodeState.nodeId, NodeState.time, NodeState.seq_num)
+        .order_by(NodeState.nodeId, NodeState.time)
+        .yield_per(10000)
+    )
+    rows = []
+    for (node_id, hour), group in groupby(
+        states, key=lambda s: (s.nodeId, _hour(s.time))
+    ):
+        group = list(group)
+        first, last = group[0], group[-1]
+        rows.append(
+            HourlyYield(
+                nodeId=node_id,
+                hour=hour,
+                packets=len(group),
+                firstTime=_naive(first.time),
+                firstSeq=first.seq_num,
+                lastTime=_naive(last.time),
+                lastSeq=last.seq_num,
+                missed=_missed(len(group), first.seq_num, last.seq_num),
+            )
+        )
+    session.add_all(rows)
+    count = len(rows)
+    LOG.info("Backfilled %d HourlyYield rows", count)
+    return count
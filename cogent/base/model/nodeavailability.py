@@ -0,0 +1,108 @@
+"""
+Summary of which sensor types each node has reported and when.
+
+The table is maintained as readings are logged so that pages such as
+``/allGraphs`` can find the nodes with data for a type with a single indexed
+join rather than probing the Reading table once per node.
+
+"""
+
+import logging
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    delete,
+    func,
+    insert,
+    select,
+)
+
+from . import meta
+from .reading import Reading
+
+LOG = logging.getLogger(__name__)
+
+
+class NodeAvailability(meta.Base, meta.InnoDBMix):
+    """
+    First and last time a node reported a given sensor type.
+
+    :var Integer nodeId: Id of `Node`
+    :var Integer typeId: Id of `SensorType` (stored in column ``type``)
+    :var DateTime firstSeen: Time of the earliest reading of this type
+    :var DateTime lastSeen: Time of the latest reading of this type
+    """
+
+    __tablename__ = "NodeAvailability"
+
+    nodeId = Column(
+        Integer, ForeignKey("Node.id"), primary_key=True, autoincrement=False
+    )
+    typeId = Column(
+        "type",
+        Integer,
+        ForeignKey("SensorType.id"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    firstSeen = Column(DateTime, nullable=False)
+    lastSeen = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("na_1", "type", "lastSeen"),)  # type: ignore[assignment]
+
+    def __repr__(self):
+        return "NodeAvailability({0},{1},{2},{3})".format(
+            self.nodeId, self.typeId, self.firstSeen, self.lastSeen
+        )
+
+
+def record_availability(session, node_id, type_ids, when):
+    """Note that ``node_id`` reported each of ``type_ids`` at ``when``
+
+    Existing rows for the node are loaded with one query; the caller is
+    responsible for committing the session.
+    """
+    existing = {
+        row.typeId: row
+        for row in session.query(NodeAvailability).filter(
+            NodeAvailability.nodeId == node_id
+        )
+    }
+    for type_id in type_ids:
+        row = existing.get(type_id)
+        if row is None:
+            session.add(
+                NodeAvailability(
+                    nodeId=node_id, typeId=type_id, firstSeen=when, lastSeen=when
+                )
+            )
+            continue
+        # compare naive values since the database may drop the timezone
+        naive = when.replace(tzinfo=None)
+        if naive < row.firstSeen.replace(tzinfo=None):
+            row.firstSeen = when
+        if naive > row.lastSeen.replace(tzinfo=None):
+            row.lastSeen = when
+
+
+def backfill_availability(session):
+    """Rebuild the NodeAvailability table from the Reading table
+
+    :return: number of rows written
+    """
+    session.execute(delete(NodeAvailability))
+    summary = select(
+        Reading.nodeId, Reading.typeId, func.min(Reading.time), func.max(Reading.time)
+    ).group_by(Reading.nodeId, Reading.typeId)
+    session.execute(
+        insert(NodeAvailability).from_select(
+            ["nodeId", "type", "firstSeen", "lastSeen"], summary
+        )
+    )
+    count = session.query(func.count()).select_from(NodeAvailability).scalar()
+    LOG.info("Backfilled %d NodeAvailability rows", count)
+    return count
@@ -0,0 +1,94 @@
+"""
+The most recent packet received from each node.
+
+The table has one row per node, updated as packets are logged, so that
+pages such as ``/missing`` and the server down report read one row per
+node rather than scanning the NodeState table.
+
+"""
+
+import logging
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, delete, func
+
+from . import meta
+from .nodestate import NodeState
+
+LOG = logging.getLogger(__name__)
+
+
+class NodeLastSeen(meta.Base, meta.InnoDBMix):
+    """
+    Last packet received from a node.
+
+    :var Integer nodeId: Id of `Node`
+    :var DateTime time: time the packet was received
+    :var Integer seq_num: packet sequence number
+    :var Integer parent: parent node in the routing tree
+    :var Integer rssi: received signal strength indicator
+    """
+
+    __tablename__ = "NodeLastSeen"
+
+    nodeId = Column(
+        Integer, ForeignKey("Node.id"), primary_key=True, autoincrement=False
+    )
+    time = Column(DateTime, nullable=False)
+    seq_num = Column(Integer)
+    parent = Column(Integer)
+    rssi = Column(Integer)
+
+    __table_args__ = (Index("nls_1", "time"),)  # type: ignore[assignment]
+
+    def __repr__(self):
+        return "NodeLastSeen({0},{1},{2})".format(self.nodeId, self.time, self.seq_num)
+
+
+def record_last_seen(session, node_id, when, seq_num=None, parent=None, rssi=None):
+    """Note a packet from ``node_id`` received at ``when``
+
+    Packets older than the one already recorded are ignored.  The caller is
+    responsible for committing the session.
+    """
+    when = when.replace(tzinfo=None)
+    row = session.get(NodeLastSeen, node_id)
+    if row is None:
+        session.add(
+            NodeLastSeen(
+                nodeId=node_id, time=when, seq_num=seq_num, parent=parent, rssi=rssi
+            )
+        )
+    elif when >= row.time:
+        row.time = when
+        row.seq_num = seq_num
+        row.parent = parent
+        row.rssi = rssi
+
+
+def backfill_last_seen(session):
+    """Rebuild the NodeLastSeen table from the NodeState table
+
+    :return: number of rows written
+    """
+    session.execute(delete(NodeLastSeen))
+    latest = (
+        session.query(NodeState.nodeId, func.max(NodeState.time).label("time"))
+        .group_by(NodeState.nodeId)
+        .subquery()
+    )
+    rows = {}
+    for state in session.query(NodeState).join(
+        latest,
+        (NodeState.nodeId == latest.c.nodeId) & (NodeState.time == latest.c.time),
+    ):
+        # several states may share the latest time; keep one per node
+        rows[state.nodeId] = NodeLastSeen(
+            nodeId=state.nodeId,
+            time=state.time,
+            seq_num=state.seq_num,
+            parent=state.parent,
+            rssi=state.rssi,
+        )
+    session.add_all(rows.values())
+    LOG.info("Backfilled %d NodeLastSeen rows", len(rows))
+    return len(rows)
@@ -2,25 +2,62 @@
 Methods to time how long functions take to run
 
 Consists of a decorator function that can be applied to preixisting code
-this will check the running time of that function call and insert a record
-into the database
+this will check the running time of that function call and record it in an
+in-process histogram.  The aggregated figures (call count, total, min, max
+and percentiles) are written to the database in a single batch, either
+periodically by a background thread or when the process exits, so the
+decorators are cheap enough to use on hot paths.
 
 :author: Daniel goldsmith <djgoldsmith@googlemail.com>
 """
 
+import atexit
+import functools
 import logging
+import math
+import os
+import threading
 import time
+from datetime import UTC, datetime
 
 import sqlalchemy
+from sqlalchemy.orm import Session as _Session
 
 from . import meta
 
 LOG = logging.getLogger("Timings")
 LOG.setLevel(logging.DEBUG)
 
+# Seconds between flushes of the aggregated timings to the database
+FLUSH_INTERVAL = float(os.environ.get("CH_TIMINGS_INTERVAL", "60"))
+
+# Histogram buckets grow geometrically from _BUCKET_BASE seconds, giving
+# percentiles that are accurate to within about 10%.
+_BUCKET_BASE = 1e-6
+_BUCKET_GROWTH = 1.1
+_BUCKET_COUNT = 256
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+PERCENTILES = (50, 95, 99)
+
 
 class Timings(meta.Base):
-    """Table to hold the timing information"""
+    """Table to hold the timing information
+
+    Each row summarises the calls made to one function between two flushes.
+
+    :var String function: name of the decorated function
+    :var String text: optional label given to :func:`timedtext`
+    :var Float time: mean duration of a call in seconds
+    :var Integer calls: number of calls aggregated into this row
+    :var Float total: total time spent in the function
+    :var Float minimum: fastest call
+    :var Float maximum: slowest call
+    :var Float p50: median call duration (approximate)
+    :var Float p95: 95th percentile call duration (approximate)
+    :var Float p99: 99th percentile call duration (approximate)
+    :var DateTime flushed: time that the row was written
+    """
 
     __tablename__ = "Timings"
 
@@ -30,40 +67,230 @@ class Timings(meta.Base):
     args = sqlalchemy.Column(sqlalchemy.Text)
     kwargs = sqlalchemy.Column(sqlalchemy.Text)
     time = sqlalchemy.Column(sqlalchemy.Float)
+    calls = sqlalchemy.Column(sqlalchemy.Integer)
+    total = sqlalchemy.Column(sqlalchemy.Float)
+    minimum = sqlalchemy.Column(sqlalchemy.Float)
+    maximum = sqlalchemy.Column(sqlalchemy.Float)
+    p50 = sqlalchemy.Column(sqlalchemy.Float)
+    p95 = sqlalchemy.Column(sqlalchemy.Float)
+    p99 = sqlalchemy.Column(sqlalchemy.Float)
+    flushed = sqlalchemy.Column(sqlalchemy.DateTime)
 
     def __str__(self):
-        return "[{0}] {5} {1} ({2}, {3}) = {4}s".format(
-            self.id, self.function, self.args, self.kwargs, self.time, self.text
+        return "[{0}] {5} {1} x{2} mean={3}s max={4}s".format(
+            self.id, self.function, self.calls, self.time, self.maximum, self.text
         )
 
 
-def timed(function):
-    """Decorator to log the amount of time taken by a function"""
+def _bucket(duration):
+    """Return the histogram bucket index for a duration in seconds"""
+    if duration <= _BUCKET_BASE:
+        return 0
+    idx = int(math.log(duration / _BUCKET_BASE) / _LOG_GROWTH) + 1
+    return idx if idx < _BUCKET_COUNT else _BUCKET_COUNT - 1
 
-    def timeit(*args, **kwargs):
-        session = meta.Session()
-        starttime = time.time()
-        result = function(*args, **kwargs)
-        endtime = time.time()
-        total = endtime - starttime
-        timeobject = Timings(
-            function=str(function.__name__),
-            text=None,
-            args=str(args),
-            kwargs=str(kwargs),
-            time=total,
-        )
 
-        session.add(timeobject)
+def _bucket_upper(idx):
+    """Upper bound (in seconds) of a histogram bucket"""
+    return _BUCKET_BASE * _BUCKET_GROWTH**idx
+
+
+class _Histogram(object):
+    """Running count, sum, min, max and bucket counts for one function"""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+        self.buckets = {}
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration < self.minimum:
+            self.minimum = duration
+        if duration > self.maximum:
+            self.maximum = duration
+        idx = _bucket(duration)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+
+    def merge(self, other):
+        """Add the calls counted by ``other`` to this histogram"""
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        for idx, count in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + count
+
+    def percentile(self, pct):
+        """Approximate percentile, clamped to the observed min and max"""
+        if self.count == 0:
+            return None
+        wanted = math.ceil(self.count * pct / 100.0)
+        seen = 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen >= wanted:
+                return min(max(_bucket_upper(idx), self.minimum), self.maximum)
+        return self.maximum
+
+
+class TimingAggregator(object):
+    """Collect call durations in memory and write them out in batches
+
+    :param flush_interval: seconds between automatic flushes, or ``None`` to
+        only flush explicitly (and at exit).  Automatic flushes run in a
+        daemon thread started by the first :meth:`record` in each process.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._flusher_pid = None
+
+    def record(self, function, text, duration):
+        """Add one call of ``function`` taking ``duration`` seconds"""
+        key = (function, text)
+        with self._lock:
+            hist = self._stats.get(key)
+            if hist is None:
+                hist = self._stats[key] = _Histogram()
+            hist.add(duration)
+            if self.flush_interval is not None and self._flusher_pid != os.getpid():
+                self._start_flusher()
+
+    def _start_flusher(self):
+        # a forked worker does not inherit its parent's thread
+        self._flusher_pid = os.getpid()
+        threading.Thread(
+            target=self._flush_periodically, name="timings-flush", daemon=True
+        ).start()
 
-        session.flush()
-        # #session.close()
-        LOG.debug(timeobject)
-        return result
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                LOG.exception("Unable to flush timings")
+
+    def snapshot(self):
+        """Return the current statistics as a dictionary keyed by
+        ``(function, text)`` without resetting them"""
+        with self._lock:
+            return {key: self._summary(hist) for key, hist in self._stats.items()}
+
+    @staticmethod
+    def _summary(hist):
+        out = {
+            "calls": hist.count,
+            "total": hist.total,
+            "minimum": hist.minimum,
+            "maximum": hist.maximum,
+            "mean": hist.total / hist.count,
+        }
+        for pct in PERCENTILES:
+            out["p%d" % pct] = hist.percentile(pct)
+        return out
+
+    def flush(self, session=None):
+        """Write the aggregated statistics to the Timings table
+
+        :param session: session to add the rows to.  If omitted a new
+            session is created and committed.  When no database engine has
+            been configured, or the rows cannot be written, the statistics
+            are kept for a later flush.
+        :return: list of :class:`Timings` rows written
+        """
+        if session is None and meta.engine is None:
+            return []
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        if not stats:
+            return []
+
+        now = datetime.now(UTC)
+        rows = []
+        for (function, text), hist in stats.items():
+            summary = self._summary(hist)
+            rows.append(
+                Timings(
+                    function=function,
+                    text=text,
+                    time=summary["mean"],
+                    calls=summary["calls"],
+                    total=summary["total"],
+                    minimum=summary["minimum"],
+                    maximum=summary["maximum"],
+                    p50=summary["p50"],
+                    p95=summary["p95"],
+                    p99=summary["p99"],
+                    flushed=now,
+                )
+            )
+
+        try:
+            if session is None:
+                # keep the rows readable once the session is closed
+                with _Session(meta.engine, expire_on_commit=False) as own_session:
+                    own_session.add_all(rows)
+                    own_session.commit()
+            else:
+                session.add_all(rows)
+                session.flush()
+        except Exception:
+            LOG.exception("Unable to store %d timing rows", len(rows))
+            self._restore(stats)
+            return []
+
+        for row in rows:
+            LOG.debug(row)
+        return rows
+
+    def _restore(self, stats):
+        """Merge statistics taken by a failed flush back in"""
+        with self._lock:
+            for key, hist in stats.items():
+                current = self._stats.get(key)
+                if current is not None:
+                    hist.merge(current)
+                self._stats[key] = hist
+
+    def reset(self):
+        """Discard all statistics collected so far"""
+        with self._lock:
+            self._stats = {}
+
+
+AGGREGATOR = TimingAggregator()
+atexit.register(AGGREGATOR.flush)
+
+
+def _timer(function, text):
+    name = str(function.__name__)
+    record = AGGREGATOR.record
+
+    @functools.wraps(function)
+    def timeit(*args, **kwargs):
+        starttime = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, text, time.perf_counter() - starttime)
 
     return timeit
 
 
+def timed(function):
+    """Decorator to log the amount of time taken by a function"""
+    return _timer(function, None)
+
+
 def timedtext(theText):
     """Decorator to log the amount of time taken by a function
     This version allows a paramter (ie @timedtext("theText")
@@ -72,28 +299,6 @@ def timedtext(theText):
 
     def wrap(function):
         # Wrap the Outer Function and push the function into the namespace
-
-        def timeit(*args, **kwargs):
-            session = meta.Session()
-            starttime = time.time()
-            result = function(*args, **kwargs)
-            endtime = time.time()
-            total = endtime - starttime
-            timeobject = Timings(
-                function=str(function.__name__),
-                text=theText,
-                args=str(args),
-                kwargs=str(kwargs),
-                time=total,
-            )
-
-            session.add(timeobject)
-            session.flush()
-            # #session.close()
-            LOG.debug(timeobject)
-            # LOG.info(timeobject)
-            return result
-
-        return timeit
+        return _timer(function, theText)
 
     return wrap
@@ -0,0 +1,10 @@
+"""Optional request instrumentation for the Flask application.
+
+Everything in this package is switched off unless enabled through an
+environment variable so it can be left in place in production.
+"""
+
+from .route import init_route_profiling
+from .sql import init_sql_profiling
+
+__all__ = ["init_route_profiling", "init_sql_profiling"]
@@ -0,0 +1,245 @@
+"""On-demand and sampled CPU/memory profiling of Flask routes.
+
+Profiling is guarded by a shared secret in ``CH_PROFILE_TOKEN``; nothing is
+installed when it is unset.  Any route can then be profiled in place:
+
+* ``?profile=<token>`` runs the request under :mod:`cProfile` and
+  :mod:`tracemalloc` and replaces the response with a plain text report of
+  the top functions and allocation sites.
+* An ``X-Profile: <token>`` header profiles the request in the same way but
+  returns the normal response; the report is written to ``CH_PROFILE_DIR``
+  and its file name returned in the ``X-Profile-Report`` header.
+
+Setting ``CH_PROFILE_SAMPLE=N`` additionally profiles one request in N
+(CPU only) and aggregates the results per endpoint.  The aggregate for the
+current worker can be read from ``/_profile?token=<token>`` and, when
+``CH_PROFILE_DIR`` is set, is dumped there as ``<endpoint>.<pid>.prof`` for
+use with :mod:`pstats` or snakeviz.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hmac
+import io
+import itertools
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import UTC, datetime
+
+from flask import Flask, Response, abort, g, request
+
+TOKEN_ENV_VAR = "CH_PROFILE_TOKEN"
+SAMPLE_ENV_VAR = "CH_PROFILE_SAMPLE"
+DIR_ENV_VAR = "CH_PROFILE_DIR"
+
+PROFILE_ARG = "profile"
+PROFILE_HEADER = "X-Profile"
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+_TRACEMALLOC_FRAMES = 10
+
+_CONTENT_TEXT = "text/plain"
+
+# cProfile cannot run in two threads at once on recent Pythons, so only
+# one request per process is profiled at a time.
+_PROFILER_LOCK = threading.Lock()
+
+
+class EndpointProfiles:
+    """Accumulated :class:`pstats.Stats` for sampled requests per endpoint"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: dict[str, pstats.Stats] = {}
+        self._counts: dict[str, int] = {}
+        self._times: dict[str, float] = {}
+
+    def add(self, endpoint: str, profiler: cProfile.Profile, elapsed: float) -> None:
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                self._stats[endpoint] = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+            self._times[endpoint] = self._times.get(endpoint, 0.0) + elapsed
+
+    def endpoints(self) -> list[tuple[str, int, float]]:
+        """Return ``(endpoint, samples, mean seconds)`` for every endpoint"""
+        with self._lock:
+            return sorted(
+                (ep, n, self._times[ep] / n) for ep, n in self._counts.items()
+            )
+
+    def report(self, endpoint: str, limit: int = TOP_FUNCTIONS) -> str | None:
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                return None
+            out = io.StringIO()
+            stats.stream = out  # type: ignore[attr-defined]
+            stats.sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+
+    def dump(self, endpoint: str, directory: str) -> str | None:
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                return None
+            path = os.path.join(directory, f"{endpoint}.{os.getpid()}.prof")
+            stats.dump_stats(path)
+            return path
+
+
+class RouteProfiler:
+    """Hooks that profile selected requests on a Flask application
+
+    :param token: secret that must accompany an on-demand profiling request
+    :param sample: profile one request in ``sample`` (0 disables sampling)
+    :param directory: where reports and aggregated profiles are written
+    """
+
+    def __init__(self, token: str, sample: int = 0, directory: str | None = None):
+        self.token = token
+        self.sample = sample
+        self.directory = directory
+        self.profiles = EndpointProfiles()
+        self._counter = itertools.count(1)
+
+    def install(self, app: Flask) -> None:
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule("/_profile", "profile_stats", self.stats_view)
+
+    def _authorised(self, value: str | None) -> bool:
+        return value is not None and hmac.compare_digest(value, self.token)
+
+    def _start(self) -> None:
+        if request.endpoint == "profile_stats":
+            return
+        if self._authorised(request.args.get(PROFILE_ARG)):
+            mode = "report"
+        elif self._authorised(request.headers.get(PROFILE_HEADER)):
+            mode = "store"
+        elif self.sample > 0 and next(self._counter) % self.sample == 0:
+            mode = "sample"
+        else:
+            return
+        if not _PROFILER_LOCK.acquire(blocking=False):
+            g.profile_busy = True
+            return
+        g.profile_mode = mode
+        if mode != "sample" and not tracemalloc.is_tracing():
+            tracemalloc.start(_TRACEMALLOC_FRAMES)
+            g.profile_tracemalloc = True
+        g.profile_started = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    def _stop(self) -> tuple[cProfile.Profile, float, tracemalloc.Snapshot | None]:
+        profiler = g.pop("profiler")
+        profiler.disable()
+        elapsed = time.perf_counter() - g.pop("profile_started")
+        snapshot = None
+        if g.pop("profile_tracemalloc", False):
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        _PROFILER_LOCK.release()
+        return profiler, elapsed, snapshot
+
+    def _finish(self, response: Response) -> Response:
+        if g.pop("profile_busy", False):
+            response.headers["X-Profile-Report"] = "busy"
+            return response
+        if "profiler" not in g:
+            return response
+        mode = g.pop("profile_mode")
+        profiler, elapsed, snapshot = self._stop()
+        endpoint = request.endpoint or "unknown"
+        if mode == "sample":
+            self.profiles.add(endpoint, profiler, elapsed)
+            if self.directory:
+                self.profiles.dump(endpoint, self.directory)
+            return response
+
+        report = _format_report(request.full_path, profiler, elapsed, snapshot)
+        if mode == "report":
+            return Response(report, mimetype=_CONTENT_TEXT)
+        response.headers["X-Profile-Report"] = self._store(endpoint, report)
+        return response
+
+    def _teardown(self, exc: BaseException | None) -> None:
+        # the view raised before after_request could stop the profiler
+        if "profiler" in g:
+            g.pop("profile_mode", None)
+            self._stop()
+
+    def _store(self, endpoint: str, report: str) -> str:
+        directory = self.directory or tempfile.gettempdir()
+        stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(directory, f"{endpoint}-{stamp}-{os.getpid()}.txt")
+        with open(path, "w") as report_file:
+            report_file.write(report)
+        return os.path.basename(path)
+
+    def stats_view(self) -> Response:
+        if not self._authorised(request.args.get("token")):
+            abort(404)
+        endpoint = request.args.get("endpoint")
+        if endpoint:
+            report = self.profiles.report(endpoint)
+            if report is None:
+                abort(404)
+            return Response(report, mimetype=_CONTENT_TEXT)
+        lines = [f"pid {os.getpid()}, sampling 1 in {self.sample}", ""]
+        lines.extend(
+            f"{ep:30s} {n:6d} samples {mean * 1000.0:9.1f}ms mean"
+            for ep, n, mean in self.profiles.endpoints()
+        )
+        return Response("\n".join(lines) + "\n", mimetype=_CONTENT_TEXT)
+
+
+def _format_report(
+    path: str,
+    profiler: cProfile.Profile,
+    elapsed: float,
+    snapshot: tracemalloc.Snapshot | None,
+) -> str:
+    out = io.StringIO()
+    out.write(f"{path}\n{elapsed * 1000.0:.1f}ms wall time\n\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(
+        TOP_FUNCTIONS
+    )
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        out.write("Top allocation sites\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+    return out.getvalue()
+
+
+def init_route_profiling(app: Flask) -> RouteProfiler | None:
+    """Install route profiling on ``app`` if ``CH_PROFILE_TOKEN`` is set"""
+    token = os.environ.get(TOKEN_ENV_VAR)
+    if not token:
+        return None
+    try:
+        sample = int(os.environ.get(SAMPLE_ENV_VAR, "0"))
+    except ValueError:
+        sample = 0
+    directory = os.environ.get(DIR_ENV_VAR) or None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    profiler = RouteProfiler(token, sample=max(sample, 0), directory=directory)
+    profiler.install(app)
+    app.logger.info("Route profiling enabled (sampling 1 in %d)", profiler.sample)
+    return profiler
@@ -0,0 +1,190 @@
+"""Per-request SQL statistics and slow-query logging.
+
+When ``CH_SQL_PROFILE`` is set to a true value, every statement executed on
+the application engine is counted against the current Flask request.  The
+number of statements, rows fetched (or changed) and time spent in the
+database are added to the response as a ``Server-Timing`` header, and any
+statement that takes longer than ``CH_SLOW_QUERY_MS`` milliseconds is
+written to the ``cogent.slowquery`` logger together with the route and its
+parameters.
+Set ``CH_SLOW_QUERY_LOG`` to a file name to also append slow queries there.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ENV_VAR = "CH_SQL_PROFILE"
+SLOW_ENV_VAR = "CH_SLOW_QUERY_MS"
+SLOW_LOG_ENV_VAR = "CH_SLOW_QUERY_LOG"
+
+DEFAULT_SLOW_MS = 500.0
+_MAX_PARAM_CHARS = 500
+
+SLOW_LOG = logging.getLogger("cogent.slowquery")
+
+
+def _enabled(value: str | None) -> bool:
+    return (value or "").strip().lower() in ("1", "y", "yes", "true", "on")
+
+
+class RequestStats:
+    """Statement count, rows and database time for one request"""
+
+    __slots__ = ("statements", "rows", "db_time", "started")
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.started = time.perf_counter()
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000.0
+        return (
+            f'db;dur={self.db_time * 1000.0:.1f};desc="{self.statements} queries, '
+            f'{self.rows} rows", app;dur={total:.1f}'
+        )
+
+
+class _CountingCursor:
+    """DBAPI cursor proxy adding the rows fetched through it to ``stats``
+
+    ``cursor.rowcount`` is -1 for a SELECT on SQLite, so rows are counted
+    as the result reads them.
+    """
+
+    def __init__(self, cursor, stats: RequestStats) -> None:
+        self._cursor = cursor
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._stats.rows += 1
+            yield row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+
+def current_stats() -> RequestStats | None:
+    """Return the statistics for the active request, if profiling is on"""
+    if not has_request_context():
+        return None
+    return g.get("sql_stats")
+
+
+class SqlProfiler:
+    """Attach cursor hooks to an engine and report per request
+
+    :param slow_ms: statements taking at least this many milliseconds are
+        written to the slow-query log
+    """
+
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS) -> None:
+        self.slow_ms = slow_ms
+
+    def install(self, app: Flask, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    @staticmethod
+    def _start_request() -> None:
+        g.sql_stats = RequestStats()
+
+    @staticmethod
+    def _finish_request(response):
+        stats = current_stats()
+        if stats is not None:
+            response.headers.add("Server-Timing", stats.server_timing())
+        return response
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start", []).append((cursor, time.perf_counter()))
+
+    @staticmethod
+    def _handle_error(exception_context) -> None:
+        # a statement that raised never reaches after_cursor_execute
+        conn = exception_context.connection
+        context = exception_context.execution_context
+        if conn is None or context is None:
+            return
+        starts = conn.info.get("query_start")
+        if starts and starts[-1][0] is context.cursor:
+            starts.pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()[1]
+        stats = current_stats()
+        if stats is None:
+            return
+        stats.statements += 1
+        stats.db_time += elapsed
+        if cursor.description is not None and context is not None:
+            context.cursor = _CountingCursor(cursor, stats)
+        elif cursor.rowcount is not None and cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+        if elapsed * 1000.0 >= self.slow_ms:
+            params = repr(parameters)
+            if len(params) > _MAX_PARAM_CHARS:
+                params = params[:_MAX_PARAM_CHARS] + "..."
+            SLOW_LOG.warning(
+                "slow query %.1fms route=%s args=%s statement=%s parameters=%s",
+                elapsed * 1000.0,
+                request.endpoint or request.path,
+                request.query_string.decode("latin-1"),
+                " ".join(statement.split()),
+                params,
+            )
+
+
+def init_sql_profiling(app: Flask, engine: Engine) -> SqlProfiler | None:
+    """Install SQL profiling on ``app`` if ``CH_SQL_PROFILE`` is set
+
+    :return: the installed :class:`SqlProfiler` or ``None`` when disabled
+    """
+    if not _enabled(os.environ.get(ENV_VAR)):
+        return None
+    try:
+        slow_ms = float(os.environ.get(SLOW_ENV_VAR, DEFAULT_SLOW_MS))
+    except ValueError:
+        slow_ms = DEFAULT_SLOW_MS
+    log_file = os.environ.get(SLOW_LOG_ENV_VAR)
+    if log_file and not any(
+        isinstance(h, logging.FileHandler)
+        and h.baseFilename == os.path.abspath(log_file)
+        for h in SLOW_LOG.handlers
+    ):
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        SLOW_LOG.addHandler(handler)
+    profiler = SqlProfiler(slow_ms=slow_ms)
+    profiler.install(app, engine)
+    app.logger.info("SQL profiling enabled (slow query threshold %.0fms)", slow_ms)
+    return profiler
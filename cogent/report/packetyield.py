@@ -1,9 +1,9 @@
 from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import and_, func, or_
+from sqlalchemy import or_
 
-from cogent.base.model import House, LastReport, Location, Node, NodeState, Room
-from cogent.sip.calc_yield import calc_missed_and_yield
+from cogent.base.model import House, LastReport, Location, Node, Room
+from cogent.base.model.hourlyyield import window_yields
 
 
 def table_with_nodes(session, html, node_set):
@@ -45,80 +45,11 @@ def packetYield(
     else:
         last_lost_nodes_set = set()
 
-    # next get the count per node
-    seqcnt_q = (
-        session.query(
-            NodeState.nodeId.label("nodeId"), func.count(NodeState.seq_num).label("cnt")
-        )
-        .filter(and_(NodeState.time >= start_t, NodeState.time <= end_t))
-        .group_by(NodeState.nodeId)
-        .subquery(name="seqcnt")
-    )
-
-    # next get the first occurring sequence number per node
-    selmint_q = (
-        session.query(
-            NodeState.nodeId.label("nodeId"), func.min(NodeState.time).label("mint")
-        )
-        .filter(NodeState.time >= start_t)
-        .group_by(NodeState.nodeId)
-        .subquery(name="selmint")
-    )
-
-    minseq_q = (
-        session.query(
-            NodeState.nodeId.label("nodeId"), NodeState.seq_num.label("seq_num")
-        )
-        .join(
-            selmint_q,
-            and_(
-                NodeState.time == selmint_q.c.mint,
-                NodeState.nodeId == selmint_q.c.nodeId,
-            ),
-        )
-        .subquery(name="minseq")
-    )
-
-    # next get the last occurring sequence number per node
-    selmaxt_q = (
-        session.query(
-            NodeState.nodeId.label("nodeId"), func.max(NodeState.time).label("maxt")
-        )
-        .filter(NodeState.time >= start_t)
-        .group_by(NodeState.nodeId)
-        .subquery(name="selmaxt")
-    )
-
-    maxseq_q = (
-        session.query(
-            NodeState.nodeId.label("nodeId"),
-            NodeState.seq_num.label("seq_num"),
-            NodeState.time.label("time"),
-        )
-        .join(
-            selmaxt_q,
-            and_(
-                NodeState.time == selmaxt_q.c.maxt,
-                NodeState.nodeId == selmaxt_q.c.nodeId,
-            ),
-        )
-        .subquery(name="maxseq")
-    )
-
+    # per-node yield combined from the hourly summary
+    yields = window_yields(session, start_t, end_t)
     yield_q = (
-        session.query(
-            maxseq_q.c.nodeId,
-            maxseq_q.c.seq_num,
-            minseq_q.c.seq_num,
-            seqcnt_q.c.cnt,
-            maxseq_q.c.time,
-            House.address,
-            Room.name,
-        )
-        .select_from(maxseq_q)
-        .join(minseq_q, minseq_q.c.nodeId == maxseq_q.c.nodeId)
-        .join(seqcnt_q, maxseq_q.c.nodeId == seqcnt_q.c.nodeId)
-        .join(Node, Node.id == maxseq_q.c.nodeId)
+        session.query(Node.id, House.address, Room.name)
+        .filter(Node.id.in_(yields))
         .join(Node.location)
         .join(Location.house)
         .join(Location.room)
@@ -130,21 +61,21 @@ def packetYield(
     ok_nodes = set()
     low_nodes_report = []
 
-    for (
-        node_id,
-        maxseq,
-        minseq,
-        seqcnt,
-        last_heard,
-        house_name,
-        room_name,
-    ) in yield_q.all():
-        (missed, yld) = calc_missed_and_yield(seqcnt, minseq, maxseq)
+    for node_id, house_name, room_name in yield_q.all():
+        node_yield = yields[node_id]
+        missed, yld = node_yield.missed, node_yield.yld
 
         if missed > missed_thresh:
             low_nodes.add(node_id)
             low_nodes_report.append(
-                [node_id, house_name, room_name, seqcnt, last_heard, yld]
+                [
+                    node_id,
+                    house_name,
+                    room_name,
+                    node_yield.packets,
+                    node_yield.last,
+                    yld,
+                ]
             )
         else:
             ok_nodes.add(node_id)
@@ -1,27 +1,41 @@
 """Server is likely to be down if no nodes have responded in last X hours
 
-Assume X to be 4 hours
+Assume X to be 4 hours.  The NodeLastSeen table answers this directly unless
+nodes have reported since the end of the window.
 """
 
 from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import and_, select
+from sqlalchemy import and_, func, select
 
-from cogent.base.model import NodeState
+from cogent.base.model import NodeLastSeen, NodeState
 
 
 def server_down(
     session, end_t=datetime.now(UTC), start_t=(datetime.now(UTC) - timedelta(hours=4))
 ):
     html = []
-    stmt = (
-        select(NodeState.nodeId)
-        .where(and_(NodeState.time >= start_t, NodeState.time <= end_t))
-        .limit(1)
-    )
-    node_state = session.execute(stmt).scalar_one_or_none()
-
-    if node_state is None:
+    start = start_t.replace(tzinfo=None)
+    end = end_t.replace(tzinfo=None)
+    last = session.execute(
+        select(func.max(NodeLastSeen.time)).where(NodeLastSeen.time <= end)
+    ).scalar_one_or_none()
+    reported = last is not None and last >= start
+    if (
+        not reported
+        and session.execute(
+            select(NodeLastSeen.nodeId).where(NodeLastSeen.time > end).limit(1)
+        ).first()
+    ):
+        # nodes have reported since the window, so look back over NodeState
+        stmt = (
+            select(NodeState.nodeId)
+            .where(and_(NodeState.time >= start_t, NodeState.time <= end_t))
+            .limit(1)
+        )
+        reported = session.execute(stmt).scalar_one_or_none() is not None
+
+    if not reported:
         html.append(
             "<p><b>No nodes have reported between {} and {}</b></p>".format(
                 start_t, end_t
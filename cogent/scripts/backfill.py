@@ -0,0 +1,64 @@
+"""
+Rebuild the summary tables that LogFromFlat maintains at ingest.
+
+The tables are kept up to date as readings arrive, so this only needs to
+run once after upgrading (or after data has been loaded some other way)::
+
+    python -m cogent.scripts.backfill --database mysql://chuser@localhost/ch
+    python -m cogent.scripts.backfill availability
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+import sqlalchemy
+
+from cogent.base.model import initialise_sql, meta
+from cogent.base.model.dailyusage import backfill_usage
+from cogent.base.model.hourlylink import backfill_links
+from cogent.base.model.hourlyyield import backfill_yield
+from cogent.base.model.nodeavailability import backfill_availability
+from cogent.base.model.nodelastseen import backfill_last_seen
+
+DBFILE = os.environ.get("CH_DBURL", "mysql://chuser@localhost/ch?connect_timeout=1")
+
+# name -> function(session) returning the number of rows written
+BACKFILLS = {
+    "availability": backfill_availability,
+    "lastseen": backfill_last_seen,
+    "links": backfill_links,
+    "usage": backfill_usage,
+    "yield": backfill_yield,
+}
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description="Rebuild the summary tables maintained at ingest"
+    )
+    parser.add_argument("--database", help="database URL", default=DBFILE)
+    parser.add_argument(
+        "tables",
+        nargs="*",
+        help="summary tables to rebuild: %s (default: all)" % ", ".join(BACKFILLS),
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.tables) - set(BACKFILLS)
+    if unknown:
+        parser.error("unknown table(s): " + ", ".join(sorted(unknown)))
+
+    logging.basicConfig(level=logging.INFO)
+    engine = sqlalchemy.create_engine(args.database, echo=False)
+    initialise_sql(engine)
+
+    for name in args.tables or sorted(BACKFILLS):
+        with meta.Session() as session:
+            count = BACKFILLS[name](session)
+            session.commit()
+        logging.info("%s: %d rows", name, count)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
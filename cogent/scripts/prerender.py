@@ -0,0 +1,131 @@
+"""
+Render the most viewed graphs into the shared plot cache ahead of time.
+
+Run this after each ingest cycle (for example from the same cron job as
+LogFromFlat) so that ``/allGraphs``, ``/plot`` and ``/nodeGraph`` are served
+from the cache rather than rendering on demand::
+
+    python -m cogent.scripts.prerender --database mysql://chuser@localhost/ch
+    python -m cogent.scripts.prerender --periods day --types 0 --jobs 2
+
+Entries that are already cached for the latest readings are skipped, so a
+run after a quiet ingest cycle does very little work.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import sqlalchemy
+
+from cogent.base.model import init_model, meta
+from cogent.views.graph.constants import _periods
+from cogent.views.graph.graph import (
+    _available_nodes,
+    _series_window,
+    prerender,
+    prerender_all_graphs,
+)
+from cogent.views.graph.plotcache import CACHE_DIR_ENV_VAR
+
+DBFILE = os.environ.get("CH_DBURL", "mysql://chuser@localhost/ch?connect_timeout=1")
+
+# temperature, humidity and battery voltage
+DEFAULT_TYPES = [0, 2, 6]
+DEFAULT_PERIODS = ["day", "week"]
+
+LOG = logging.getLogger(__name__)
+
+
+def _init_worker(database):
+    init_model(sqlalchemy.create_engine(database, echo=False))
+
+
+def _render(task):
+    """Render one task in a worker process
+
+    :param task: ``(type_id, mins, node_id)``, with ``node_id`` None for the
+        ``/allGraphs`` image of the type
+    :return: number of cache entries written
+    """
+    type_id, mins, node_id = task
+    try:
+        with meta.Session() as session:
+            if node_id is None:
+                return prerender_all_graphs(session, type_id, mins)
+            return prerender(session, node_id, type_id, mins)
+    except Exception:
+        LOG.exception("Unable to prerender %s", task)
+        return 0
+
+
+def tasks(session, type_ids, periods):
+    """List the rendering tasks for ``type_ids`` and ``periods``"""
+    result = []
+    for period in periods:
+        mins = _periods[period]
+        _, _, startts, _ = _series_window(mins, 0)
+        for type_id in type_ids:
+            result.append((type_id, mins, None))
+            result.extend(
+                (type_id, mins, g["node_id"])
+                for g in _available_nodes(session, type_id, startts)
+            )
+    return result
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description="Render common graphs into the plot cache"
+    )
+    parser.add_argument("--database", help="database URL", default=DBFILE)
+    parser.add_argument(
+        "--cache-dir",
+        help="plot cache directory (default: $%s)" % CACHE_DIR_ENV_VAR,
+    )
+    parser.add_argument(
+        "--types",
+        nargs="+",
+        type=int,
+        default=DEFAULT_TYPES,
+        help="sensor type ids (default: %s)" % " ".join(map(str, DEFAULT_TYPES)),
+    )
+    parser.add_argument(
+        "--periods",
+        nargs="+",
+        choices=sorted(_periods, key=_periods.get),
+        default=DEFAULT_PERIODS,
+        help="graph periods (default: %s)" % " ".join(DEFAULT_PERIODS),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.cache_dir:
+        # inherited by the worker processes
+        os.environ[CACHE_DIR_ENV_VAR] = args.cache_dir
+
+    init_model(sqlalchemy.create_engine(args.database, echo=False))
+    with meta.Session() as session:
+        todo = tasks(session, args.types, args.periods)
+
+    with ProcessPoolExecutor(
+        max_workers=max(args.jobs, 1),
+        initializer=_init_worker,
+        initargs=(args.database,),
+    ) as pool:
+        written = sum(pool.map(_render, todo, chunksize=4))
+    LOG.info("%d tasks, %d cache entries written", len(todo), written)
+    return written
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
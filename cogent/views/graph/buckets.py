@@ -0,0 +1,203 @@
+"""Time-bucket aggregation of readings inside the database.
+
+Long graph windows (months or years) can cover hundreds of thousands of
+readings, nearly all of which would be thrown away by downsampling.  Here
+readings are grouped into fixed-width buckets by integer division of the
+epoch seconds of their timestamp, and the minimum, maximum, average and last
+value of each bucket are computed by the database, so only one row per
+bucket is returned.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    and_,
+    cast,
+    func,
+    literal,
+    literal_column,
+    select,
+)
+
+from cogent.base.model import Reading
+
+from .constants import _EPOCH
+
+
+class Bucket(NamedTuple):
+    """Summary of the readings in one time bucket
+
+    :var start: start of the bucket
+    :var first: time of the first reading in the bucket
+    :var last_time: time of the last reading in the bucket
+    :var minimum: smallest value
+    :var maximum: largest value
+    :var mean: average value
+    :var last: value of the last reading
+    :var samples: number of readings
+    """
+
+    start: datetime
+    first: datetime
+    last_time: datetime
+    minimum: float
+    maximum: float
+    mean: float
+    last: float
+    samples: int
+
+
+def epoch_bucket(column, seconds: int, dialect: str):
+    """SQL expression for ``floor(epoch seconds of column / seconds)``
+
+    :param column: a DateTime column holding naive UTC times
+    :param seconds: bucket width
+    :param dialect: name of the database dialect, e.g. ``"mysql"``
+    """
+    if dialect == "sqlite":
+        return cast(func.strftime("%s", column), Integer) // seconds
+    if dialect in ("mysql", "mariadb"):
+        # TIMESTAMPDIFF does not depend on the session time zone, unlike
+        # UNIX_TIMESTAMP
+        epoch = func.timestampdiff(
+            literal_column("SECOND"), literal("1970-01-01 00:00:00"), column
+        )
+        return epoch.op("DIV")(seconds)
+    return cast(func.floor(func.extract("epoch", column) / seconds), Integer)
+
+
+def bucketed_readings(
+    session, node_id: int, type_id: int, start: datetime, end: datetime, seconds: int
+) -> list[Bucket]:
+    """Aggregate one node's readings of one type into ``seconds`` wide
+    buckets between ``start`` and ``end`` (inclusive)
+
+    :return: non-empty buckets in time order
+    """
+    by_node = bucketed_readings_by_node(
+        session, [node_id], type_id, start, end, seconds
+    )
+    return by_node.get(node_id, [])
+
+
+def bucketed_readings_by_node(
+    session,
+    node_ids: list[int],
+    type_id: int,
+    start: datetime,
+    end: datetime,
+    seconds: int,
+) -> dict[int, list[Bucket]]:
+    """Aggregate the readings of several nodes with a single query
+
+    :return: dict mapping each node id with data to its buckets in time
+        order
+    """
+    by_key = _bucketed(session, node_ids, [type_id], start, end, seconds)
+    return {node_id: buckets for (node_id, _), buckets in by_key.items()}
+
+
+def bucketed_readings_by_type(
+    session,
+    node_id: int,
+    type_ids: list[int],
+    start: datetime,
+    end: datetime,
+    seconds: int,
+) -> dict[int, list[Bucket]]:
+    """Aggregate the readings of several types of one node with a single
+    query
+
+    :return: dict mapping each type id with data to its buckets in time
+        order
+    """
+    by_key = _bucketed(session, [node_id], type_ids, start, end, seconds)
+    return {type_id: buckets for (_, type_id), buckets in by_key.items()}
+
+
+def _bucketed(
+    session,
+    node_ids: list[int],
+    type_ids: list[int],
+    start: datetime,
+    end: datetime,
+    seconds: int,
+) -> dict[tuple[int, int], list[Bucket]]:
+    # the model's columns are untyped, so name them with their SQL types
+    node: ColumnElement[int] = Reading.nodeId
+    typ: ColumnElement[int] = Reading.typeId
+    time: ColumnElement[datetime] = Reading.time
+    value: ColumnElement[float] = Reading.value
+    bucket = epoch_bucket(time, seconds, session.get_bind().dialect.name)
+    summary = (
+        select(
+            node.label("nodeId"),
+            typ.label("typeId"),
+            bucket.label("bucket"),
+            func.min(time).label("first"),
+            func.max(time).label("last_time"),
+            func.min(value).label("minimum"),
+            func.max(value).label("maximum"),
+            func.avg(value).label("mean"),
+            func.count().label("samples"),
+        )
+        .where(
+            and_(
+                node.in_(node_ids),
+                typ.in_(type_ids),
+                time >= start,
+                time <= end,
+            )
+        )
+        .group_by(node, typ, bucket)
+        .subquery()
+    )
+    # the last value is found by joining back on the primary key
+    query = (
+        select(summary, value)
+        .join(
+            Reading,
+            and_(
+                node == summary.c.nodeId,
+                typ == summary.c.typeId,
+                time == summary.c.last_time,
+            ),
+        )
+        .order_by(summary.c.nodeId, summary.c.typeId, summary.c.bucket)
+    )
+    result: dict[tuple[int, int], list[Bucket]] = {}
+    for row in session.execute(query):
+        result.setdefault((row.nodeId, row.typeId), []).append(
+            Bucket(
+                start=_EPOCH + timedelta(seconds=int(row.bucket) * seconds),
+                first=row.first,
+                last_time=row.last_time,
+                minimum=row.minimum,
+                maximum=row.maximum,
+                mean=float(row.mean) if row.mean is not None else None,  # type: ignore[arg-type]
+                last=row.value,
+                samples=row.samples,
+            )
+        )
+    return result
+
+
+def envelope(buckets: list[Bucket], seconds: int) -> list[tuple[datetime, float]]:
+    """Points tracing the minimum and maximum of each bucket
+
+    Both points of a bucket are placed at its middle so that a chart shows
+    a vertical bar covering the range of the readings in that bucket.
+    """
+    points = []
+    half = timedelta(seconds=seconds / 2)
+    for b in buckets:
+        middle = min(max(b.start + half, b.first), b.last_time)
+        points.append((middle, b.minimum))
+        if b.maximum != b.minimum:
+            points.append((middle, b.maximum))
+    return points
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+from datetime import datetime
+
 _CONTENT_TEXT = "text/plain"
 _CONTENT_PNG = "image/png"
+_CONTENT_SVG = "image/svg+xml"
+_CONTENT_JSON = "application/json"
 _SAVEFIG_ARGS = {"format": "png"}
 _CONTENT_PLOT = _CONTENT_PNG
 
+# naive UTC origin for aligning time buckets, grid cells and tiles
+_EPOCH = datetime(1970, 1, 1)
+
 thresholds: dict[int, float] = {0: 0.5, 2: 2.0, 8: 100.0, 6: 0.1, 40: 10.0}
 
 sensor_types: dict[int, int] = {0: 0, 2: 2, 8: 8, 6: 6}
@@ -29,8 +36,11 @@ _periods: dict[str, int] = {
 __all__ = [
     "_CONTENT_TEXT",
     "_CONTENT_PNG",
+    "_CONTENT_SVG",
+    "_CONTENT_JSON",
     "_SAVEFIG_ARGS",
     "_CONTENT_PLOT",
+    "_EPOCH",
     "thresholds",
     "sensor_types",
     "type_delta",
@@ -0,0 +1,213 @@
+"""Vectorised downsampling of time series for charts.
+
+Three modes are offered:
+
+``lttb``
+    Largest-Triangle-Three-Buckets over equal *time* buckets.  One point is
+    kept per bucket, chosen to preserve the visual shape of the line, so
+    short spikes survive.
+``m4``
+    Min/max-per-pixel: the first, last, minimum and maximum point of each
+    time bucket are kept, which preserves the envelope of the data exactly.
+``time``
+    The points nearest to evenly spaced times.  This is what is used when
+    no values are available.
+
+Event (priority) indices and the first and last points are always kept.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Iterable, Sequence, cast
+
+import numpy as np
+
+from .constants import _EPOCH
+
+MODES = ("lttb", "m4", "time")
+DEFAULT_MODE = "lttb"
+
+
+def as_seconds(timestamps: Sequence[datetime | float]) -> np.ndarray:
+    """Return ``timestamps`` as a float array
+
+    Datetimes become seconds since the epoch; numbers (such as matplotlib
+    date numbers) are used as they are.
+    """
+    if len(timestamps) == 0:
+        return np.empty(0)
+    first = timestamps[0]
+    if isinstance(first, datetime):
+        epoch = _EPOCH if first.tzinfo is None else _EPOCH.replace(tzinfo=timezone.utc)
+        datetimes = cast("Sequence[datetime]", timestamps)
+        return np.fromiter(
+            ((ts - epoch).total_seconds() for ts in datetimes),
+            dtype=float,
+            count=len(timestamps),
+        )
+    return np.asarray(timestamps, dtype=float)
+
+
+def _even(length: int, target: int) -> np.ndarray:
+    """``target`` distinct positions spread evenly over ``range(length)``"""
+    if target <= 0:
+        return np.empty(0, dtype=np.intp)
+    if target >= length:
+        return np.arange(length)
+    if target == 1:
+        return np.zeros(1, dtype=np.intp)
+    return np.floor(np.linspace(0, length - 1, target) + 0.5).astype(np.intp)
+
+
+def nearest_times(t: np.ndarray, target: int) -> np.ndarray:
+    """Indices of the points nearest to ``target`` evenly spaced times"""
+    length = len(t)
+    if length <= target:
+        return np.arange(length)
+    if t[-1] <= t[0]:
+        return _even(length, target)
+    desired = np.linspace(t[0], t[-1], target)
+    idx = np.minimum(np.searchsorted(t, desired), length - 1)
+    prev = np.maximum(idx - 1, 0)
+    idx = np.where(np.abs(t[prev] - desired) <= np.abs(t[idx] - desired), prev, idx)
+    return np.unique(np.concatenate(([0, length - 1], idx)))
+
+
+def lttb(t: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets using buckets of equal duration
+
+    Empty buckets are skipped, so fewer than ``target`` indices may be
+    returned when the data has gaps.
+    """
+    length = len(t)
+    if length <= target:
+        return np.arange(length)
+    if target < 3:
+        return np.array([0, length - 1][: max(target, 0)], dtype=np.intp)
+    t = t - t[0]
+    y_filled = np.nan_to_num(y)
+    edges = np.linspace(t[0], t[-1], target - 1)
+    bounds = np.searchsorted(t, edges)
+    starts = np.maximum(bounds[:-1], 1)
+    ends = np.minimum(bounds[1:], length - 1)
+    ends[-1] = length - 1
+    keep = starts < ends
+    starts, ends = starts[keep], ends[keep]
+
+    # bucket averages from cumulative sums
+    sum_t = np.concatenate(([0.0], np.cumsum(t)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y_filled)))
+    counts = ends - starts
+    avg_t = np.append((sum_t[ends] - sum_t[starts]) / counts, t[-1])
+    avg_y = np.append((sum_y[ends] - sum_y[starts]) / counts, y_filled[-1])
+
+    selected = np.empty(len(starts) + 2, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = length - 1
+    a = 0
+    for k, (s, e) in enumerate(zip(starts, ends)):
+        ta, ya = t[a], y_filled[a]
+        area = np.abs(
+            (ta - avg_t[k + 1]) * (y[s:e] - ya) - (ta - t[s:e]) * (avg_y[k + 1] - ya)
+        )
+        a = s + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        selected[k + 1] = a
+    return selected
+
+
+def _bucket_extremes(bucket: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Index of the minimum and maximum of ``y`` within each bucket"""
+    missing = np.isnan(y)
+    low = np.where(missing, np.inf, y)
+    high = np.where(missing, -np.inf, y)
+    result = []
+    for values, pick_last in ((low, False), (high, True)):
+        order = np.lexsort((values, bucket))
+        grouped = bucket[order]
+        change = grouped[1:] != grouped[:-1]
+        mask = np.append(change, True) if pick_last else np.insert(change, 0, True)
+        result.append(order[mask])
+    return np.concatenate(result)
+
+
+def m4(t: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """First, last, minimum and maximum point of ``target // 4`` time buckets"""
+    length = len(t)
+    if length <= target:
+        return np.arange(length)
+    buckets = max(target // 4, 1)
+    if t[-1] > t[0]:
+        edges = np.linspace(t[0], t[-1], buckets + 1)
+        bucket = np.clip(np.searchsorted(edges, t, side="right") - 1, 0, buckets - 1)
+    else:
+        bucket = np.arange(length) * buckets // length
+    change = np.flatnonzero(bucket[1:] != bucket[:-1])
+    firsts = np.insert(change + 1, 0, 0)
+    lasts = np.append(change, length - 1)
+    return np.unique(np.concatenate((firsts, lasts, _bucket_extremes(bucket, y))))
+
+
+def _top_up(keep: np.ndarray, target: int) -> np.ndarray:
+    """Indices set in ``keep`` plus evenly spread unset ones up to ``target``"""
+    short = target - int(keep.sum())
+    if short > 0:
+        unused = np.flatnonzero(~keep)
+        keep[unused[_even(len(unused), short)]] = True
+    return np.flatnonzero(keep)
+
+
+def select_indices(
+    timestamps: Sequence[datetime | float],
+    max_points: int,
+    priority_indices: Iterable[int] | None = None,
+    values: Sequence[float | None] | None = None,
+    mode: str = DEFAULT_MODE,
+) -> list[int]:
+    """Choose at most ``max_points`` indices of a time-ordered series
+
+    :param timestamps: times of the points in ascending order
+    :param max_points: point budget
+    :param priority_indices: indices that must be kept if the budget
+        allows (out of range values are ignored)
+    :param values: values of the points; without them ``mode`` is ignored
+        and points are chosen by time alone
+    :param mode: one of :data:`MODES`
+    :return: sorted indices
+    """
+    length = len(timestamps)
+    if max_points <= 0 or length == 0:
+        return []
+    if length <= max_points:
+        return list(range(length))
+    if mode not in MODES:
+        raise ValueError(f"unknown downsample mode {mode!r}")
+
+    t = as_seconds(timestamps)
+    forced = np.array(
+        [i for i in priority_indices or () if 0 <= i < length] + [0, length - 1],
+        dtype=np.intp,
+    )
+    forced = np.unique(forced)
+    if len(forced) > max_points:
+        keep = np.zeros(len(forced), dtype=bool)
+        keep[nearest_times(t[forced], max_points)] = True
+        return forced[_top_up(keep, max_points)].tolist()
+
+    # choose the other points within what the forced ones leave of the
+    # budget, so that the extremes the downsampler picks are all kept
+    remaining = max_points - len(forced)
+    if values is None or mode == "time":
+        candidates = nearest_times(t, remaining)
+    else:
+        y = np.array(values, dtype=float)
+        candidates = (lttb if mode == "lttb" else m4)(t, y, remaining)
+
+    keep = np.zeros(length, dtype=bool)
+    keep[forced] = True
+    extra = candidates[~keep[candidates]]
+    if len(extra) > remaining:
+        # only m4 with a budget under four points can overshoot
+        extra = extra[_even(len(extra), remaining)]
+    keep[extra] = True
+    return _top_up(keep, max_points).tolist()
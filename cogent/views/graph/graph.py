@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+import math
 from datetime import datetime, timedelta, timezone
 
 import matplotlib.dates as mdates
@@ -9,30 +11,125 @@ from sqlalchemy.orm import aliased
 from sqlalchemy.orm.exc import NoResultFound
 
 import cogent.base.model.meta as meta
-from cogent.base.model import House, Location, Node, Reading, Room, SensorType, Session
+from cogent.base.model import (
+    House,
+    Location,
+    Node,
+    NodeAvailability,
+    Reading,
+    Room,
+    SensorType,
+    Session,
+)
+from cogent.base.model.dataversion import REFERENCE, watermark
 from cogent.sip.sipsim import PartSplineReconstruct, SipPhenom
 
-from .constants import _CONTENT_TEXT, _periods, thresholds, type_delta
+from ..http import (
+    conditional_page,
+    not_modified,
+    not_modified_response,
+    set_validators,
+)
+from ..resultcache import cached_view
+from .buckets import (
+    bucketed_readings,
+    bucketed_readings_by_node,
+    bucketed_readings_by_type,
+    envelope,
+)
+from .constants import (
+    _CONTENT_JSON,
+    _CONTENT_PNG,
+    _CONTENT_SVG,
+    _CONTENT_TEXT,
+    _periods,
+    sensor_types,
+    thresholds,
+    type_delta,
+)
+from .downsample import DEFAULT_MODE, MODES
+from .gviz import gviz_json
+from .multiseries import grid_means, series_readings, time_grid
+from .plotcache import PlotCache, get_plot_cache
+from .render import Chart, render_png_grid
+from .renderpool import RenderUnavailable, render
+from .singleflight import coalesce
+from .svg import TILE_HEIGHT as SVG_TILE_HEIGHT
+from .svg import WIDTH as SVG_WIDTH
+from .svg import render_svg_grid
+from .tiles import TILE_SPANS, bucket_seconds, is_closed, tile_payload
 from .utils import (
     _adjust_deltas,
     _calibrate,
+    _calibrations,
     _get_value_and_delta,
+    _get_values_and_deltas,
     _get_y_label,
     _int,
     _mins,
+    _node_last_ingest,
     _plot,
     _plot_splines,
     _predict,
     _select_downsample_indices,
+    _spline_chart,
     _to_gviz_json,
 )
 
 graph_bp = Blueprint("graph", __name__)
 
 MAX_CHART_POINTS = 100
+# upper bound on the per-request ``points`` parameter
+MAX_POINTS_LIMIT = 2000
+# windows longer than this are aggregated into buckets by the database
+AGGREGATE_AFTER_MINS = _periods["month"]
+
+# seconds a browser may reuse a plot before revalidating it
+PLOT_MAX_AGE = 60
+# seconds a browser may keep a closed tile, which never changes
+TILE_MAX_AGE = 365 * 24 * 3600
+# seconds a client is asked to wait when the render pool is saturated
+RENDER_RETRY_AFTER = 5
+
+
+@graph_bp.errorhandler(RenderUnavailable)
+def render_unavailable(error):
+    """Ask the client to retry later rather than tie up a request thread
+    waiting for the render pool"""
+    response = Response(
+        "Graph rendering is busy, please retry shortly",
+        status=503,
+        mimetype="text/plain",
+    )
+    response.headers["Retry-After"] = str(RENDER_RETRY_AFTER)
+    return response
+
+
+def _available_nodes(session, typ, startts):
+    """Nodes that have reported type ``typ`` since ``startts`` as
+    ``{"node_id", "house", "room"}`` dicts ordered by house and room"""
+    return [
+        {"node_id": node_id, "house": house, "room": room}
+        for node_id, house, room in (
+            session.query(Node.id, House.address, Room.name)
+            .join(
+                NodeAvailability,
+                and_(
+                    NodeAvailability.nodeId == Node.id,
+                    NodeAvailability.typeId == typ,
+                ),
+            )
+            .join(Location, Node.locationId == Location.id)
+            .join(House, Location.houseId == House.id)
+            .join(Room, Location.roomId == Room.id)
+            .filter(NodeAvailability.lastSeen >= startts)
+            .order_by(House.address, Room.name)
+        )
+    ]
 
 
 @graph_bp.route("/allGraphs")
+@conditional_page
 def all_graphs():
     typ = int(request.args.get("typ", "0"))
     period = request.args.get("period", "day")
@@ -45,21 +142,8 @@ def all_graphs():
             .order_by(SensorType.name)
             .all()
         )
-        graphs = []
-        for node_id, house, room in (
-            session.query(Node.id, House.address, Room.name)
-            .join(Location, Node.locationId == Location.id)
-            .join(House, Location.houseId == House.id)
-            .join(Room, Location.roomId == Room.id)
-            .order_by(House.address, Room.name)
-        ):
-            first_reading = (
-                session.query(Reading)
-                .filter(and_(Reading.nodeId == node_id, Reading.typeId == typ))
-                .first()
-            )
-            if first_reading is not None:
-                graphs.append({"node_id": node_id, "house": house, "room": room})
+        _, _, startts, _ = _series_window(mins, 0)
+        graphs = _available_nodes(session, typ, startts)
         return render_template(
             "all_graphs.html",
             title="Time series graphs",
@@ -69,10 +153,197 @@ def all_graphs():
             periods=period_list,
             mins=mins,
             sensor_types=sensor_types,
+            tile_width=SVG_WIDTH,
+            tile_height=SVG_TILE_HEIGHT,
+        )
+
+
+def _node_charts(
+    session,
+    node_ids,
+    type_id,
+    startts,
+    endts,
+    fmt,
+    max_points=MAX_CHART_POINTS,
+    mode=DEFAULT_MODE,
+):
+    """Build a :class:`Chart` for each of ``node_ids``
+
+    The readings of all the nodes are fetched together, so the number of
+    queries does not grow with the number of nodes.
+    """
+    y_label = _get_y_label(type_id, session)
+    start, end = mdates.date2num(startts), mdates.date2num(endts)
+    seconds = _aggregate_seconds(startts, endts, max_points)
+    if seconds is None and type_id in type_delta:
+        rows = _get_values_and_deltas(
+            session, node_ids, type_id, type_delta[type_id], startts, endts
+        )
+        charts = {}
+        for node_id in node_ids:
+            chart = _spline_chart(
+                node_id,
+                type_id,
+                type_delta[type_id],
+                startts,
+                endts,
+                y_label,
+                fmt,
+                rows=rows.get(node_id, []),
+            )
+            charts[node_id] = chart or Chart(start, end, y_label, fmt)
+        return charts
+
+    series: dict[int, list] = {node_id: [] for node_id in node_ids}
+    if seconds is None:
+        qry = (
+            session.query(Reading.nodeId, Reading.time, Reading.value)
+            .filter(
+                and_(
+                    Reading.nodeId.in_(node_ids),
+                    Reading.typeId == type_id,
+                    Reading.time >= startts,
+                    Reading.time <= endts,
+                )
+            )
+            .order_by(Reading.nodeId, Reading.time)
         )
+        for node_id, t, v in qry:
+            series[node_id].append((t, v))
+    else:
+        buckets = bucketed_readings_by_node(
+            session, node_ids, type_id, startts, endts, seconds
+        )
+        for node_id, node_buckets in buckets.items():
+            series[node_id] = envelope(node_buckets, seconds)
+    calibration = {}
+    if type_id not in type_delta:
+        calibration = _calibrations(session, node_ids, type_id)
+    charts = {}
+    for node_id, points in series.items():
+        t = [mdates.date2num(pt) for (pt, _) in points]
+        v = [pv for (_, pv) in points]
+        if node_id in calibration:
+            mult, offs = calibration[node_id]
+            v = [x * mult + offs for x in v]
+        if len(t) > max_points:
+            indices = _select_downsample_indices(t, max_points, values=v, mode=mode)
+            t = [t[i] for i in indices]
+            v = [v[i] for i in indices]
+        charts[node_id] = Chart(start, end, y_label, fmt, points_x=t, points_y=v)
+    return charts
+
+
+def _nodes_last_ingest(session, node_ids):
+    """Time of the latest reading from any of ``node_ids``"""
+    if not node_ids:
+        return None
+    return (
+        session.query(func.max(NodeAvailability.lastSeen))
+        .filter(NodeAvailability.nodeId.in_(node_ids))
+        .scalar()
+    )
+
+
+def _all_graphs_key(typ, mins, startts, node_ids, fmt, svg, points, mode):
+    """Plot cache key of an ``/allGraphsImage`` image"""
+    return PlotCache.key(
+        "allgraphs",
+        typ,
+        mins,
+        startts.isoformat(),
+        tuple(node_ids),
+        fmt,
+        svg,
+        points,
+        mode,
+    )
+
+
+def _render_all_graphs(session, graphs, typ, startts, endts, fmt, svg, points, mode):
+    """Render the charts of ``graphs`` (see :func:`_available_nodes`) as
+    ``[mimetype, bytes]``"""
+    node_ids = [g["node_id"] for g in graphs]
+    charts = _node_charts(session, node_ids, typ, startts, endts, fmt, points, mode)
+    titles = [f"{g['house']}: {g['room']} ({g['node_id']})" for g in graphs]
+    ordered = [charts[node_id] for node_id in node_ids]
+    if svg:
+        return [_CONTENT_SVG, render_svg_grid(ordered, titles)]
+    return [_CONTENT_PNG, render(render_png_grid, ordered, titles)]
+
+
+def _cached_body(key, version, build):
+    """Return ``(mimetype, data)`` for ``key`` from the plot cache, calling
+    ``build`` to render and store it if needed
+
+    Concurrent requests for the same image or document, in this worker or
+    another, are coalesced so that it is built once.
+    """
+    cache = get_plot_cache()
+
+    def lookup():
+        entry = cache.get(key, version)
+        return None if entry is None else (entry.mimetype, entry.data)
+
+    def compute():
+        mimetype, data = build()
+        cache.put(key, version, mimetype, data)
+        return mimetype, data
+
+    return lookup() or coalesce(PlotCache.key(key, version), compute, lookup)
+
+
+def _cached_response(key, version, last_modified, build, max_age=PLOT_MAX_AGE):
+    """Response for ``key`` at ``version`` with its validators
+
+    A 304 if the client's copy is current, otherwise the body from
+    :func:`_cached_body`.
+    """
+    etag = PlotCache.key(key, version)
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified, max_age)
+    mimetype, data = _cached_body(key, version, build)
+    response = Response(data, mimetype=mimetype)
+    return set_validators(response, etag, last_modified, max_age)
+
+
+@graph_bp.route("/allGraphsImage")
+def all_graphs_image():
+    """Every graph shown on ``/allGraphs`` as one tall image
+
+    The charts are stacked in bands of ``SVG_TILE_HEIGHT`` pixels in the
+    same order as the nodes on ``/allGraphs``, which overlays an image map.
+    """
+    typ = _int(request.args.get("typ", "0"))
+    period = request.args.get("period", "day")
+    fmt = request.args.get("fmt", "bo")
+    svg = _wants_svg()
+    points, mode = _downsample_args()
+    mins = _mins(period, 1440)
+    bucket, now, startts, endts = _series_window(mins, 0, points)
+    with Session() as session:
+        graphs = _available_nodes(session, typ, startts)
+        node_ids = [g["node_id"] for g in graphs]
+        version, last_modified = _validators(
+            session, _nodes_last_ingest(session, node_ids), now, bucket
+        )
+        key = _all_graphs_key(typ, mins, startts, node_ids, fmt, svg, points, mode)
+        response = _cached_response(
+            key,
+            version,
+            last_modified,
+            lambda: _render_all_graphs(
+                session, graphs, typ, startts, endts, fmt, svg, points, mode
+            ),
+        )
+    response.vary.add("Accept")
+    return response
 
 
 @graph_bp.route("/currentValues")
+@conditional_page
+@cached_view()
 def current_values():
     typ = int(request.args.get("typ", "0"))
     with Session(meta.engine) as session:
@@ -134,6 +405,180 @@ def current_values():
         )
 
 
+def _downsample_args() -> tuple[int, str]:
+    """Point budget and downsampling mode from the ``points`` and
+    ``downsample`` request parameters"""
+    points = request.args.get("points", MAX_CHART_POINTS, type=int)
+    points = min(max(points, 2), MAX_POINTS_LIMIT)
+    mode = request.args.get("downsample", DEFAULT_MODE)
+    if mode not in MODES:
+        mode = DEFAULT_MODE
+    return points, mode
+
+
+def _aggregate_seconds(startts, endts, max_points=MAX_CHART_POINTS):
+    """Bucket width in seconds if the window from ``startts`` to ``endts``
+    should be aggregated in the database, otherwise None"""
+    window = endts - startts
+    if window <= timedelta(minutes=AGGREGATE_AFTER_MINS):
+        return None
+    return max(60, math.ceil(window.total_seconds() / max(max_points // 2, 1)))
+
+
+def _bucket_series(buckets, seconds, max_points=MAX_CHART_POINTS):
+    """Series tuples, as returned by :func:`_node_series`, tracing the
+    range of each bucket"""
+    data = [(t, v, True, v) for (t, v) in envelope(buckets, seconds)]
+    if len(data) > max_points:
+        times = [t for (t, _, _, _) in data]
+        data = [data[i] for i in _select_downsample_indices(times, max_points)]
+    return data
+
+
+def _node_series(
+    session,
+    node_id,
+    type_id,
+    startts,
+    endts,
+    predict,
+    max_points=MAX_CHART_POINTS,
+    mode=DEFAULT_MODE,
+):
+    """Return the readings of one node and type between ``startts`` and
+    ``endts`` as ``(time, value, certain, event)`` tuples
+
+    Types with a delta type are reconstructed from their SIP events, with
+    the line extended to ``endts`` if ``predict`` is set; the result is
+    downsampled to at most ``max_points`` points with ``mode``, keeping
+    events.  Long windows are instead aggregated by the database and each
+    bucket contributes its minimum and maximum.
+    """
+    seconds = _aggregate_seconds(startts, endts, max_points)
+    if seconds is not None:
+        buckets = bucketed_readings(session, node_id, type_id, startts, endts, seconds)
+        return _bucket_series(buckets, seconds, max_points)
+    if type_id not in type_delta:
+        rows = (
+            session.query(Reading.time, Reading.value)
+            .filter(
+                and_(
+                    Reading.nodeId == node_id,
+                    Reading.typeId == type_id,
+                    Reading.time >= startts,
+                    Reading.time <= endts,
+                )
+            )
+            .order_by(Reading.time)
+            .all()
+        )
+    else:
+        rows = _get_value_and_delta(
+            node_id, type_id, type_delta[type_id], startts, endts
+        )
+    return _series_from_rows(type_id, rows, startts, endts, predict, max_points, mode)
+
+
+def _series_from_rows(
+    type_id,
+    rows,
+    startts,
+    endts,
+    predict,
+    max_points=MAX_CHART_POINTS,
+    mode=DEFAULT_MODE,
+):
+    """Series tuples, as returned by :func:`_node_series`, from ``(time,
+    value)`` readings or, for types with a delta type, SIP rows
+
+    The series is not downsampled if ``max_points`` is None.
+    """
+    if type_id not in type_delta:
+        data = [(t, v, True, v) for (t, v) in rows]
+    else:
+        sip_data = list(rows)
+        if len(sip_data) > 0 and predict:
+            sip_data.append(_predict(sip_data[-1], endts))
+        data = list(
+            PartSplineReconstruct(
+                threshold=thresholds[type_id],
+                src=SipPhenom(src=_adjust_deltas(sip_data)),
+            )
+        )
+        data = [pt for pt in data if pt.dt >= startts and pt.dt < endts]
+        data = [(pt.dt, pt.sp, not pt.dashed, pt.sp if pt.ev else None) for pt in data]
+    if max_points is not None and len(data) > max_points:
+        priority = [i for i, (_, _, _, ev) in enumerate(data) if ev is not None]
+        times = [t for (t, _, _, _) in data]
+        values = [v for (_, v, _, _) in data]
+        indices = _select_downsample_indices(times, max_points, priority, values, mode)
+        data = [data[i] for i in indices]
+    return data
+
+
+def _series_options(y_label, startts, endts, data, max_points=MAX_CHART_POINTS):
+    """Google chart options for a series returned by :func:`_node_series`"""
+    options = {
+        "vAxis": {"title": y_label},
+        "hAxis": {
+            "title": "Time",
+            "viewWindow": {
+                "min": int(startts.timestamp() * 1000),
+                "max": int(endts.timestamp() * 1000),
+            },
+            "viewWindowMode": "explicit",
+        },
+        "curveType": "function",
+        "legend": {"position": "none"},
+    }
+    ev_count = sum(1 for (_, _, _, ev) in data if ev is not None)
+    if ev_count < max_points:
+        options["series"] = {
+            0: {"pointSize": 0},
+            1: {"pointSize": 5, "color": "blue"},
+        }
+    return options
+
+
+_SERIES_DESCRIPTION = [
+    ("Time", "datetime"),
+    ("Interpolated", "number"),
+    ("", "boolean", "", {"role": "certainty"}),
+    ("Event", "number"),
+]
+
+
+def _series_window(mins, ago, points=MAX_CHART_POINTS):
+    """Return ``(bucket, now, startts, endts)`` for a series request
+
+    ``now`` and the start of the window are aligned up to the chart
+    resolution so that requests made within the same bucket share a
+    response, but ``endts`` never passes the current time, so that neither
+    the readings nor the SIP prediction extend into the future.
+    """
+    bucket = max(60, mins * 60 // points)
+    current = datetime.now(timezone.utc)
+    now = _align_up(current, bucket)
+    startts = (now - timedelta(minutes=(ago + 1) * mins)).replace(tzinfo=None)
+    return bucket, now, startts, _clamp_end(startts + timedelta(minutes=mins), current)
+
+
+def _node_place(session, node_id):
+    """Return ``(house address, room name)`` of a node, aborting with 404 if
+    it has no location"""
+    try:
+        return (
+            session.query(House.address, Room.name)
+            .join(Location, House.id == Location.houseId)
+            .join(Room, Room.id == Location.roomId)
+            .join(Node, Node.locationId == Location.id)
+            .filter(Node.id == node_id)
+            .one()
+        )
+    except NoResultFound:
+        abort(404)
+
+
 @graph_bp.route("/nodeGraph")
 def node_graph():
     node = request.args.get("node")
@@ -143,172 +588,728 @@ def node_graph():
     period = request.args.get("period", "day")
     ago = _int(request.args.get("ago", "0"))
     debug = request.args.get("debug", "n") != "n"
+    points, mode = _downsample_args()
     with Session() as session:
-        try:
-            mins = _mins(period, 1440)
-            house, room = (
-                session.query(House.address, Room.name)
-                .join(Location, House.id == Location.houseId)
-                .join(Room, Room.id == Location.roomId)
-                .join(Node, Node.locationId == Location.id)
-                .filter(Node.id == int(node))
-                .one()
+        house, room = _node_place(session, int(node))
+        if debug:
+            _, _, startts, endts = _series_window(_mins(period, 1440), ago, points)
+            data = _node_series(
+                session, int(node), typ, startts, endts, ago == 0, points, mode
             )
-            startts = datetime.now(timezone.utc) - timedelta(minutes=(ago + 1) * mins)
-            startts = startts.replace(tzinfo=None)
-            endts = startts + timedelta(minutes=mins)
-            type_id = int(typ)
-            node_id = int(node)
-            y_label = _get_y_label(type_id, session)
-            if type_id not in type_delta:
-                data = (
-                    session.query(Reading.time, Reading.value)
-                    .filter(
-                        and_(
-                            Reading.nodeId == node_id,
-                            Reading.typeId == type_id,
-                            Reading.time >= startts,
-                            Reading.time <= endts,
+            return Response(f"data={data!r}", mimetype=_CONTENT_TEXT)
+        period_list = sorted(_periods, key=lambda k: _periods[k])
+        sensor_types = (
+            session.query(SensorType)
+            .filter(SensorType.active.is_(True))
+            .order_by(SensorType.name)
+            .all()
+        )
+        return render_template(
+            "node_graph.html",
+            title="Time series graph",
+            heading=f"{house}: {room} ({node})",
+            periods=period_list,
+            period=period,
+            typ=typ,
+            node_id=node,
+            ago=ago,
+            sensor_types=sensor_types,
+            series_args={
+                k: request.args[k]
+                for k in ("points", "downsample")
+                if k in request.args
+            },
+        )
+
+
+def _series_key(node_id, type_id, mins, startts, points, mode):
+    """Plot cache key of an ``/api/series`` response"""
+    return PlotCache.key(
+        "series", node_id, type_id, mins, startts.isoformat(), points, mode
+    )
+
+
+def _series_payload(
+    session, node_id, type_id, mins, startts, endts, predict, points, mode
+):
+    """JSON body of an ``/api/series`` response as bytes"""
+    y_label = _get_y_label(type_id, session)
+    seconds = _aggregate_seconds(startts, endts, points)
+    if seconds is None:
+        buckets = None
+        data = _node_series(
+            session, node_id, type_id, startts, endts, predict, points, mode
+        )
+    else:
+        buckets = bucketed_readings(session, node_id, type_id, startts, endts, seconds)
+        data = _bucket_series(buckets, seconds, points)
+    head = {
+        "node": node_id,
+        "type": type_id,
+        "label": y_label,
+        "start": startts.isoformat(),
+        "end": endts.isoformat(),
+        "points": [[t.isoformat(), v, c, ev] for (t, v, c, ev) in data],
+    }
+    tail = {"options": _series_options(y_label, startts, endts, data, points)}
+    if buckets is not None:
+        tail["bucket_seconds"] = seconds
+        tail["buckets"] = [
+            [b.start.isoformat(), b.minimum, b.maximum, b.mean, b.last, b.samples]
+            for b in buckets
+        ]
+    return _with_table(head, _to_gviz_json(_SERIES_DESCRIPTION, data), tail).encode()
+
+
+def _with_table(head, table, tail):
+    """JSON object with the keys of ``head``, then ``table`` (which is
+    already JSON text, so is spliced in rather than parsed and re-dumped)
+    and then the keys of ``tail``"""
+    return f'{json.dumps(head)[:-1]}, "table": {table}, {json.dumps(tail)[1:]}'
+
+
+@graph_bp.route("/api/series")
+def series():
+    """Reconstructed and downsampled series for one node and type as JSON
+
+    Takes the same ``node``, ``typ``, ``period`` and ``ago`` parameters as
+    ``/nodeGraph``.  The response holds the points as
+    ``[time, value, certain, event]`` lists with ISO 8601 times, the same
+    data as a Google visualisation table and the chart options.  For long
+    windows, which are aggregated by the database, ``buckets`` also lists
+    ``[start, min, max, mean, last, count]`` for every ``bucket_seconds``
+    wide bucket.
+    """
+    node = request.args.get("node")
+    if node is None:
+        abort(404)
+    node_id = _int(node, 0)
+    type_id = _int(request.args.get("typ", "0"))
+    period = request.args.get("period", "day")
+    ago = _int(request.args.get("ago", "0"))
+    mins = _mins(period, 1440)
+    points, mode = _downsample_args()
+    bucket, now, startts, endts = _series_window(mins, ago, points)
+    with Session() as session:
+        version, last_modified = _validators(
+            session, _node_last_ingest(session, node_id), now, bucket
+        )
+        key = _series_key(node_id, type_id, mins, startts, points, mode)
+
+        def build():
+            data = _series_payload(
+                session, node_id, type_id, mins, startts, endts, ago == 0, points, mode
+            )
+            return _CONTENT_JSON, data
+
+        return _cached_response(key, version, last_modified, build)
+
+
+@graph_bp.route("/api/tile")
+def tile():
+    """One fixed time tile of bucketed readings as JSON
+
+    Takes ``node``, ``typ``, ``zoom`` (0 to ``len(TILE_SPANS) - 1``, from
+    coarsest to finest) and ``index`` (tiles since the epoch) parameters;
+    see :mod:`cogent.views.graph.tiles`.  Closed tiles are served as
+    immutable, while the current tile is revalidated like ``/api/series``.
+    Both are cached on the server against the node's last ingest, so that
+    readings replayed into a closed tile replace the cached copy.
+    """
+    node = request.args.get("node")
+    zoom = _int(request.args.get("zoom"), -1)
+    index = request.args.get("index")
+    if node is None or index is None or not 0 <= zoom < len(TILE_SPANS):
+        abort(404)
+    node_id = _int(node, 0)
+    type_id = _int(request.args.get("typ", "0"))
+    index = _int(index)
+    aware_now = datetime.now(timezone.utc)
+    now = aware_now.replace(tzinfo=None)
+    closed = is_closed(zoom, index, now)
+    key = PlotCache.key("tile", node_id, type_id, zoom, index)
+    with Session() as session:
+        version, last_modified = _validators(
+            session,
+            _node_last_ingest(session, node_id),
+            aware_now,
+            bucket_seconds(zoom),
+        )
+        response = _cached_response(
+            key,
+            version,
+            last_modified,
+            lambda: (
+                _CONTENT_JSON,
+                tile_payload(session, node_id, type_id, zoom, index, now),
+            ),
+            TILE_MAX_AGE if closed else PLOT_MAX_AGE,
+        )
+    if closed:
+        response.cache_control.must_revalidate = False
+        response.cache_control.immutable = True
+    return response
+
+
+def _dashboard_types():
+    """Sensor types requested with repeated ``typ`` parameters, defaulting
+    to temperature, humidity, CO2 and battery voltage"""
+    type_ids = request.args.getlist("typ", type=int)
+    return list(dict.fromkeys(type_ids)) or sorted(sensor_types)
+
+
+def _type_labels(session, type_ids):
+    """Axis label of each of ``type_ids``, as :func:`_get_y_label` gives"""
+    labels = {
+        type_id: f"{name} ({units})"
+        for type_id, name, units in session.query(
+            SensorType.id, SensorType.name, SensorType.units
+        ).filter(SensorType.id.in_(type_ids))
+    }
+    return {type_id: labels.get(type_id, "unknown") for type_id in type_ids}
+
+
+def _dashboard_series(
+    session, node_id, type_ids, startts, endts, predict, points, mode
+):
+    """Series of several types of one node
+
+    The readings of all the types are fetched with one query (or, for long
+    windows, one aggregating query) and only the types in ``type_delta``
+    are reconstructed from their SIP events.
+
+    :return: ``(bucket seconds or None, {type id: series tuples})``
+    """
+    seconds = _aggregate_seconds(startts, endts, points)
+    if seconds is not None:
+        buckets = bucketed_readings_by_type(
+            session, node_id, type_ids, startts, endts, seconds
+        )
+        return seconds, {
+            t: _bucket_series(buckets.get(t, []), seconds, points) for t in type_ids
+        }
+    readings = series_readings(session, [node_id], type_ids, startts, endts)
+    return None, {
+        t: _series_from_rows(
+            t, readings.get((node_id, t), []), startts, endts, predict, points, mode
+        )
+        for t in type_ids
+    }
+
+
+def _dashboard_key(node_id, type_ids, mins, startts, points, mode, *image):
+    """Plot cache key of a node dashboard; ``image`` holds the ``fmt`` and
+    ``svg`` arguments of the image form"""
+    return PlotCache.key(
+        "dashboard",
+        node_id,
+        tuple(type_ids),
+        mins,
+        startts.isoformat(),
+        points,
+        mode,
+        *image,
+    )
+
+
+def _dashboard_request():
+    """Parse a node dashboard request
+
+    :return: ``(node id, type ids, mins, ago, points, mode, bucket, now,
+        startts, endts)``
+    """
+    node = request.args.get("node")
+    if node is None:
+        abort(404)
+    period = request.args.get("period", "day")
+    ago = _int(request.args.get("ago", "0"))
+    mins = _mins(period, 1440)
+    points, mode = _downsample_args()
+    window = _series_window(mins, ago, points)
+    return (_int(node, 0), _dashboard_types(), mins, ago, points, mode, *window)
+
+
+@graph_bp.route("/api/nodeDashboard")
+def node_dashboard():
+    """Several sensor types of one node as one JSON document
+
+    Takes ``node``, ``period`` and ``ago`` like ``/api/series`` and one
+    ``typ`` parameter per type.  ``series`` holds an ``/api/series`` style
+    entry (``type``, ``label``, ``points``, ``table`` and ``options``) for
+    each type, in the order requested, all over the same time window.
+    """
+    (node_id, type_ids, mins, ago, points, mode, bucket, now, startts, endts) = (
+        _dashboard_request()
+    )
+    with Session() as session:
+        house, room = _node_place(session, node_id)
+        version, last_modified = _validators(
+            session, _node_last_ingest(session, node_id), now, bucket
+        )
+        key = _dashboard_key(node_id, type_ids, mins, startts, points, mode)
+
+        def build():
+            labels = _type_labels(session, type_ids)
+            _, series = _dashboard_series(
+                session, node_id, type_ids, startts, endts, ago == 0, points, mode
+            )
+            head = {
+                "node": node_id,
+                "house": house,
+                "room": room,
+                "start": startts.isoformat(),
+                "end": endts.isoformat(),
+            }
+            entries = [
+                _with_table(
+                    {
+                        "type": type_id,
+                        "label": labels[type_id],
+                        "points": [
+                            [t.isoformat(), v, c, ev]
+                            for (t, v, c, ev) in series[type_id]
+                        ],
+                    },
+                    _to_gviz_json(_SERIES_DESCRIPTION, series[type_id]),
+                    {
+                        "options": _series_options(
+                            labels[type_id], startts, endts, series[type_id], points
                         )
-                    )
-                    .order_by(Reading.time)
-                    .all()
-                )
-                data = [(t, v, True, v) for (t, v) in data]
-            else:
-                sip_data = list(
-                    _get_value_and_delta(
-                        node_id, type_id, type_delta[type_id], startts, endts
-                    )
-                )
-                if len(sip_data) > 0 and ago == 0:
-                    sip_data.append(_predict(sip_data[-1], endts))
-                data = list(
-                    PartSplineReconstruct(
-                        threshold=thresholds[type_id],
-                        src=SipPhenom(src=_adjust_deltas(sip_data)),
-                    )
-                )
-                data = [pt for pt in data if pt.dt >= startts and pt.dt < endts]
-                data = [
-                    (pt.dt, pt.sp, not pt.dashed, pt.sp if pt.ev else None)
-                    for pt in data
-                ]
-            if len(data) > MAX_CHART_POINTS:
-                priority = [i for i, (_, _, _, ev) in enumerate(data) if ev is not None]
-                times = [t for (t, _, _, _) in data]
-                indices = _select_downsample_indices(times, MAX_CHART_POINTS, priority)
-                data = [data[i] for i in indices]
-            if debug:
-                return Response(f"data={data!r}", mimetype=_CONTENT_TEXT)
-            options = {
-                "vAxis": {"title": y_label},
-                "hAxis": {
-                    "title": "Time",
-                    "viewWindow": {
-                        "min": int(startts.timestamp() * 1000),
-                        "max": int(endts.timestamp() * 1000),
                     },
-                    "viewWindowMode": "explicit",
-                },
-                "curveType": "function",
-                "legend": {"position": "none"},
-            }
-            ev_count = sum(1 for (_, _, _, ev) in data if ev is not None)
-            if ev_count < MAX_CHART_POINTS:
-                options["series"] = {
-                    0: {"pointSize": 0},
-                    1: {"pointSize": 5, "color": "blue"},
-                }
-            description = [
-                ("Time", "datetime"),
-                ("Interpolated", "number"),
-                ("", "boolean", "", {"role": "certainty"}),
-                ("Event", "number"),
+                )
+                for type_id in type_ids
             ]
-            json_data = _to_gviz_json(description, data)
-            period_list = sorted(_periods, key=lambda k: _periods[k])
-            sensor_types = (
-                session.query(SensorType)
-                .filter(SensorType.active.is_(True))
-                .order_by(SensorType.name)
-                .all()
-            )
-            return render_template(
-                "node_graph.html",
-                title="Time series graph",
-                heading=f"{house}: {room} ({node})",
-                json_data=json_data,
-                options=options,
-                periods=period_list,
-                period=period,
-                typ=typ,
-                node_id=node,
-                ago=ago,
-                sensor_types=sensor_types,
+            data = f'{json.dumps(head)[:-1]}, "series": [{", ".join(entries)}]}}'
+            return _CONTENT_JSON, data.encode()
+
+        return _cached_response(key, version, last_modified, build)
+
+
+def _series_chart(type_id, data, startts, endts, y_label, fmt, aggregated):
+    """:class:`Chart` of series tuples: events (or readings) as markers and,
+    for reconstructed types, the spline as a line"""
+    x = [mdates.date2num(t) for (t, _, _, _) in data]
+    events = [(tx, ev) for tx, (_, _, _, ev) in zip(x, data) if ev is not None]
+    line_x: list = []
+    line_y: list = []
+    if type_id in type_delta and not aggregated:
+        line_x, line_y = x, [v for (_, v, _, _) in data]
+    return Chart(
+        mdates.date2num(startts),
+        mdates.date2num(endts),
+        y_label,
+        fmt,
+        points_x=[tx for (tx, _) in events],
+        points_y=[ev for (_, ev) in events],
+        line_x=line_x,
+        line_y=line_y,
+    )
+
+
+@graph_bp.route("/nodeDashboardImage")
+def node_dashboard_image():
+    """The types of ``/api/nodeDashboard`` as one image with a panel per
+    type (PNG, or SVG with ``format=svg``)"""
+    (node_id, type_ids, mins, ago, points, mode, bucket, now, startts, endts) = (
+        _dashboard_request()
+    )
+    fmt = request.args.get("fmt", "bo")
+    svg = _wants_svg()
+    with Session() as session:
+        _node_place(session, node_id)
+        version, last_modified = _validators(
+            session, _node_last_ingest(session, node_id), now, bucket
+        )
+        key = _dashboard_key(node_id, type_ids, mins, startts, points, mode, fmt, svg)
+
+        def draw():
+            labels = _type_labels(session, type_ids)
+            seconds, series = _dashboard_series(
+                session, node_id, type_ids, startts, endts, ago == 0, points, mode
             )
-        except NoResultFound:
+            charts = [
+                _series_chart(
+                    t, series[t], startts, endts, labels[t], fmt, seconds is not None
+                )
+                for t in type_ids
+            ]
+            titles = [labels[t] for t in type_ids]
+            if svg:
+                return _CONTENT_SVG, render_svg_grid(charts, titles)
+            return _CONTENT_PNG, render(render_png_grid, charts, titles)
+
+        response = _cached_response(key, version, last_modified, draw)
+    response.vary.add("Accept")
+    return response
+
+
+def _compare_nodes(session):
+    """``{"node_id", "house", "room"}`` dicts for the nodes of a comparison,
+    given either a ``house`` id or repeated ``node`` parameters"""
+    qry = (
+        session.query(Node.id, House.address, Room.name)
+        .join(Location, Node.locationId == Location.id)
+        .join(House, Location.houseId == House.id)
+        .join(Room, Location.roomId == Room.id)
+    )
+    house = request.args.get("house")
+    if house is not None:
+        qry = qry.filter(House.id == _int(house)).order_by(Room.name, Node.id)
+    else:
+        node_ids = request.args.getlist("node", type=int)
+        if not node_ids:
             abort(404)
+        qry = qry.filter(Node.id.in_(node_ids)).order_by(Node.id)
+    return [
+        {"node_id": node_id, "house": address, "room": room}
+        for node_id, address, room in qry
+    ]
 
 
-@graph_bp.route("/plot")
-def graph_image():
-    node = request.args.get("node", "64")
-    minsago = request.args.get("minsago", "1440")
-    duration = request.args.get("duration", "1440")
-    debug = request.args.get("debug")
-    fmt = request.args.get("fmt", "bo")
-    typ = request.args.get("typ", "0")
+def _compare_values(session, node_ids, type_id, startts, endts, predict, points):
+    """Mean value of ``type_id`` for each node in each cell of a common time
+    grid
+
+    All the readings come from one range query over the nodes (or, for long
+    windows, one aggregating query), so the cost depends on the number of
+    readings rather than the number of nodes.
+
+    :return: ``(cell seconds, cell start times, {node id: cell values})``
+    """
+    step, grid = time_grid(startts, endts, points)
+    if _aggregate_seconds(startts, endts, points) is not None:
+        buckets = bucketed_readings_by_node(
+            session, node_ids, type_id, grid[0], endts, step
+        )
+        cells = {t: i for i, t in enumerate(grid)}
+        values = {}
+        for node_id in node_ids:
+            row: list[float | None] = [None] * len(grid)
+            for b in buckets.get(node_id, []):
+                if b.start in cells:
+                    row[cells[b.start]] = b.mean
+            values[node_id] = row
+        return step, grid, values
+    readings = series_readings(session, node_ids, [type_id], startts, endts)
+    values = {}
+    for node_id in node_ids:
+        data = _series_from_rows(
+            type_id,
+            readings.get((node_id, type_id), []),
+            startts,
+            endts,
+            predict,
+            max_points=None,
+        )
+        values[node_id] = grid_means(
+            [t for (t, _, _, _) in data], [v for (_, v, _, _) in data], grid, step
+        )
+    return step, grid, values
+
+
+@graph_bp.route("/api/compare")
+def compare():
+    """One sensor type from several nodes on a common time grid as JSON
+
+    Takes either ``house`` (every node in the house) or one ``node``
+    parameter per node, plus ``typ``, ``period``, ``ago`` and ``points``
+    (the number of grid cells).  ``values`` holds a list per node with the
+    mean of each cell (null where there is no data), and ``table`` the same
+    data as a Google visualisation table with a column per node.
+    """
+    type_id = _int(request.args.get("typ", "0"))
+    period = request.args.get("period", "day")
+    ago = _int(request.args.get("ago", "0"))
+    mins = _mins(period, 1440)
+    points, _ = _downsample_args()
+    bucket, now, startts, endts = _series_window(mins, ago, points)
     with Session() as session:
-        minsago_i = _int(minsago, 60)
-        duration_i = _int(duration, 60)
-        debug_f = debug is not None
-        startts = datetime.now(timezone.utc) - timedelta(minutes=minsago_i)
-        startts = startts.replace(tzinfo=None)
-        endts = startts + timedelta(minutes=duration_i)
-        type_id = int(typ)
-        if type_id not in type_delta:
+        nodes = _compare_nodes(session)
+        node_ids = [n["node_id"] for n in nodes]
+        version, last_modified = _validators(
+            session, _nodes_last_ingest(session, node_ids), now, bucket
+        )
+        key = PlotCache.key(
+            "compare", tuple(node_ids), type_id, mins, startts.isoformat(), points
+        )
+
+        def build():
+            y_label = _get_y_label(type_id, session)
+            step, grid, values = _compare_values(
+                session, node_ids, type_id, startts, endts, ago == 0, points
+            )
+            titles = [f"{n['house']}: {n['room']} ({n['node_id']})" for n in nodes]
+            description = [("Time", "datetime")] + [
+                (title, "number") for title in titles
+            ]
+            head = {
+                "type": type_id,
+                "label": y_label,
+                "start": startts.isoformat(),
+                "end": endts.isoformat(),
+                "step_seconds": step,
+                "nodes": nodes,
+                "times": [t.isoformat() for t in grid],
+                "values": [values[node_id] for node_id in node_ids],
+            }
+            table = gviz_json(
+                description, [grid] + [values[node_id] for node_id in node_ids]
+            )
+            options = _series_options(y_label, startts, endts, [], points)
+            # one line per node rather than a line and its events
+            del options["series"]
+            options.update(legend={"position": "bottom"}, interpolateNulls=True)
+            data = _with_table(head, table, {"options": options})
+            return _CONTENT_JSON, data.encode()
+
+        return _cached_response(key, version, last_modified, build)
+
+
+def _version(session, last_ingest, reference=None):
+    """Plot cache version for data last ingested at ``last_ingest``
+
+    The reference watermark is included so that editing calibrations,
+    sensor types or house and room names invalidates cached responses.
+    """
+    if reference is None:
+        reference = watermark(session, REFERENCE)[0]
+    ingest = last_ingest.isoformat() if last_ingest is not None else "none"
+    return f"{ingest}/{reference}"
+
+
+def _validators(session, last_ingest, now, bucket):
+    """Return the cache version and Last-Modified time of a response for a
+    window ending at ``now`` with resolution ``bucket`` seconds"""
+    reference, edited = watermark(session, REFERENCE)
+    version = _version(session, last_ingest, reference)
+    window_start = now - timedelta(seconds=bucket)
+    last_modified = max(
+        window_start,
+        *(
+            when.replace(tzinfo=timezone.utc)
+            for when in (last_ingest, edited)
+            if when is not None
+        ),
+    )
+    return version, last_modified
+
+
+def _clamp_end(endts: datetime, current: datetime) -> datetime:
+    """The naive end of a window, no later than the aware time ``current``"""
+    return min(endts, current.replace(tzinfo=None))
+
+
+def _align_up(ts: datetime, seconds: int) -> datetime:
+    """Round an aware datetime up to the next multiple of ``seconds``"""
+    epoch = math.ceil(ts.timestamp() / seconds) * seconds
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def _wants_svg() -> bool:
+    """True if the client asked for SVG with ``format=svg`` or an Accept
+    header that prefers SVG to PNG"""
+    output = request.args.get("format")
+    if output is not None:
+        return output.lower() == "svg"
+    accept = request.accept_mimetypes
+    return accept["image/svg+xml"] > accept["image/png"]
+
+
+def _render_graph_image(
+    session,
+    node_id,
+    type_id,
+    startts,
+    endts,
+    debug_f,
+    fmt,
+    svg=False,
+    max_points=MAX_CHART_POINTS,
+    mode=DEFAULT_MODE,
+):
+    seconds = _aggregate_seconds(startts, endts, max_points)
+    if seconds is not None or type_id not in type_delta:
+        if seconds is None:
             qry = (
                 session.query(Reading.time, Reading.value)
                 .filter(
                     and_(
-                        Reading.nodeId == int(node),
-                        Reading.typeId == int(typ),
+                        Reading.nodeId == node_id,
+                        Reading.typeId == type_id,
                         Reading.time >= startts,
                         Reading.time <= endts,
                     )
                 )
                 .order_by(Reading.time)
             )
-            t = []
-            v = []
-            for qt, qv in qry:
-                t.append(mdates.date2num(qt))
-                v.append(qv)
-            v = _calibrate(session, v, int(node), int(typ))
-            if len(t) > MAX_CHART_POINTS:
-                indices = _select_downsample_indices(t, MAX_CHART_POINTS)
-                t = [t[i] for i in indices]
-                v = [v[i] for i in indices]
-            res = _plot(
-                typ,
-                t,
-                v,
+        else:
+            buckets = bucketed_readings(
+                session, node_id, type_id, startts, endts, seconds
+            )
+            qry = envelope(buckets, seconds)
+        t = []
+        v = []
+        for qt, qv in qry:
+            t.append(mdates.date2num(qt))
+            v.append(qv)
+        if type_id not in type_delta:
+            v = _calibrate(session, v, node_id, type_id)
+        if len(t) > max_points:
+            indices = _select_downsample_indices(t, max_points, values=v, mode=mode)
+            t = [t[i] for i in indices]
+            v = [v[i] for i in indices]
+        return _plot(
+            type_id,
+            t,
+            v,
+            startts,
+            endts,
+            debug_f,
+            fmt,
+            type_label=_get_y_label(type_id, session),
+            svg=svg,
+        )
+    return _plot_splines(
+        node_id,
+        type_id,
+        type_delta[type_id],
+        startts,
+        endts,
+        debug_f,
+        _get_y_label(type_id, session),
+        fmt,
+        svg=svg,
+    )
+
+
+def _plot_key(node_id, type_id, minsago, duration, startts, fmt, svg, points, mode):
+    """Plot cache key of a ``/plot`` image"""
+    return PlotCache.key(
+        "plot",
+        node_id,
+        type_id,
+        minsago,
+        duration,
+        startts.isoformat(),
+        fmt,
+        svg,
+        points,
+        mode,
+    )
+
+
+@graph_bp.route("/plot")
+def graph_image():
+    node = request.args.get("node", "64")
+    minsago = request.args.get("minsago", "1440")
+    duration = request.args.get("duration", "1440")
+    debug = request.args.get("debug")
+    fmt = request.args.get("fmt", "bo")
+    typ = request.args.get("typ", "0")
+    minsago_i = _int(minsago, 60)
+    duration_i = _int(duration, 60)
+    debug_f = debug is not None
+    svg = _wants_svg()
+    points, mode = _downsample_args()
+    node_id = int(node)
+    type_id = int(typ)
+    # align the window so that requests within the same bucket share an image
+    bucket = max(60, duration_i * 60 // points)
+    current = datetime.now(timezone.utc)
+    now = _align_up(current, bucket)
+    startts = (now - timedelta(minutes=minsago_i)).replace(tzinfo=None)
+    endts = _clamp_end(startts + timedelta(minutes=duration_i), current)
+    with Session() as session:
+        if debug_f:
+            res = _render_graph_image(
+                session,
+                node_id,
+                type_id,
                 startts,
                 endts,
                 debug_f,
                 fmt,
-                type_label=_get_y_label(typ, session),
+                max_points=points,
+                mode=mode,
             )
-        else:
-            res = _plot_splines(
-                int(node),
+            return Response(res[1], mimetype=res[0])
+
+        version, last_modified = _validators(
+            session, _node_last_ingest(session, node_id), now, bucket
+        )
+        key = _plot_key(
+            node_id, type_id, minsago_i, duration_i, startts, fmt, svg, points, mode
+        )
+        response = _cached_response(
+            key,
+            version,
+            last_modified,
+            lambda: _render_graph_image(
+                session,
+                node_id,
                 type_id,
-                type_delta[type_id],
                 startts,
                 endts,
                 debug_f,
-                _get_y_label(type_id, session),
                 fmt,
-            )
-        return Response(res[1], mimetype=res[0])
+                svg,
+                max_points=points,
+                mode=mode,
+            ),
+        )
+    response.vary.add("Accept")
+    return response
+
+
+def prerender(session, node_id, type_id, mins, cache=None):
+    """Fill the plot cache for one node, type and period
+
+    Renders the ``/plot`` image and the ``/api/series`` payload (used by
+    ``/nodeGraph``) for the window of ``mins`` minutes ending now, with
+    default parameters, unless the cache already holds them for the node's
+    latest readings.
+
+    :return: number of cache entries written
+    """
+    cache = cache or get_plot_cache()
+    points, mode = MAX_CHART_POINTS, DEFAULT_MODE
+    _, _, startts, endts = _series_window(mins, 0, points)
+    version = _version(session, _node_last_ingest(session, node_id))
+    written = 0
+    key = _plot_key(node_id, type_id, mins, mins, startts, "bo", False, points, mode)
+    if cache.get(key, version) is None:
+        mimetype, data = _render_graph_image(
+            session, node_id, type_id, startts, endts, False, "bo"
+        )
+        cache.put(key, version, mimetype, data)
+        written += 1
+    key = _series_key(node_id, type_id, mins, startts, points, mode)
+    if cache.get(key, version) is None:
+        data = _series_payload(
+            session, node_id, type_id, mins, startts, endts, True, points, mode
+        )
+        cache.put(key, version, _CONTENT_JSON, data)
+        written += 1
+    return written
+
+
+def prerender_all_graphs(session, type_id, mins, cache=None):
+    """Fill the plot cache with the ``/allGraphsImage`` PNG for one type and
+    period
+
+    :return: number of cache entries written
+    """
+    cache = cache or get_plot_cache()
+    points, mode = MAX_CHART_POINTS, DEFAULT_MODE
+    _, _, startts, endts = _series_window(mins, 0, points)
+    graphs = _available_nodes(session, type_id, startts)
+    node_ids = [g["node_id"] for g in graphs]
+    version = _version(session, _nodes_last_ingest(session, node_ids))
+    key = _all_graphs_key(type_id, mins, startts, node_ids, "bo", False, points, mode)
+    if cache.get(key, version) is not None:
+        return 0
+    mimetype, data = _render_all_graphs(
+        session, graphs, type_id, startts, endts, "bo", False, points, mode
+    )
+    cache.put(key, version, mimetype, data)
+    return 1
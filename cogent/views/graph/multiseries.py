@@ -0,0 +1,210 @@
+"""Readings of several series fetched with one range query.
+
+A node dashboard needs several types of one node and a comparison chart
+needs one type from several nodes.  Rather than query each series
+separately, all the readings are fetched ordered by series and time, and
+the result is split into series (and SIP value readings are paired with
+their delta readings) with numpy.  :func:`grid_means` then puts series on
+a common time grid so that they can share one chart.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import ColumnElement, and_, func, or_
+
+from cogent.base.model import NodeState, Reading
+
+from .constants import _EPOCH, type_delta
+from .downsample import as_seconds
+
+
+def _runs(keys: np.ndarray) -> list[tuple[int, int]]:
+    """``(start, stop)`` of each run of equal values in ``keys``"""
+    if len(keys) == 0:
+        return []
+    edges = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], edges))
+    stops = np.concatenate((edges, [len(keys)]))
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def node_time_ranges(node, time, node_ids, sd, ed, before, after):
+    """Condition selecting each node's readings from ``before[node]`` (or
+    ``sd``) to ``after[node]`` (or ``ed``)
+
+    Nodes are grouped by their range, so a node whose previous reading is
+    months old widens the scan for that node only.
+    """
+    ranges: dict[tuple[datetime, datetime], list[int]] = {}
+    for node_id in node_ids:
+        span = (before.get(node_id, sd), after.get(node_id, ed))
+        ranges.setdefault(span, []).append(node_id)
+    return or_(
+        *(
+            and_(node.in_(nodes), time >= lo, time <= hi)
+            for (lo, hi), nodes in ranges.items()
+        )
+    )
+
+
+def _bounds(session, node_ids, type_ids, sd, ed):
+    """Time of the last reading before ``sd`` and the first after ``ed`` for
+    each ``(node, type)``, which SIP reconstruction needs to interpolate to
+    the edges of the window"""
+    key = (Reading.nodeId, Reading.typeId)
+    where = and_(Reading.nodeId.in_(node_ids), Reading.typeId.in_(type_ids))
+    before = {
+        (n, t): time
+        for n, t, time in session.query(*key, func.max(Reading.time))
+        .filter(where, Reading.time < sd)
+        .group_by(*key)
+    }
+    after = {
+        (n, t): time
+        for n, t, time in session.query(*key, func.min(Reading.time))
+        .filter(where, Reading.time > ed)
+        .group_by(*key)
+    }
+    return before, after
+
+
+def series_readings(
+    session,
+    node_ids: list[int],
+    type_ids: list[int],
+    sd: datetime,
+    ed: datetime,
+) -> dict[tuple[int, int], list[tuple]]:
+    """Readings of every ``(node, type)`` pair between ``sd`` and ``ed``
+
+    For types in ``type_delta`` the rows are ``(time, value, delta, seq)``
+    as returned by :func:`~cogent.views.graph.utils._get_values_and_deltas`
+    (including the readings either side of the window); for other types
+    they are ``(time, value)``.
+
+    :return: dict mapping ``(node id, type id)`` to rows in time order,
+        for the pairs that have data
+    """
+    sip_types = [t for t in type_ids if t in type_delta]
+    wanted = sorted(set(type_ids) | {type_delta[t] for t in sip_types})
+    before: dict = {}
+    after: dict = {}
+    if sip_types:
+        before, after = _bounds(session, node_ids, sip_types, sd, ed)
+    first: dict[int, datetime] = {}
+    last: dict[int, datetime] = {}
+    for (node_id, _), when in before.items():
+        first[node_id] = min(when, first.get(node_id, when))
+    for (node_id, _), when in after.items():
+        last[node_id] = max(when, last.get(node_id, when))
+    # the model's columns are untyped, so name them with their SQL types
+    node: ColumnElement[int] = Reading.nodeId
+    typ: ColumnElement[int] = Reading.typeId
+    time: ColumnElement[datetime] = Reading.time
+    qry = (
+        session.query(node, typ, time, Reading.value, NodeState.seq_num)
+        .outerjoin(
+            NodeState,
+            and_(
+                time == NodeState.time,
+                node == NodeState.nodeId,
+                typ.in_(sip_types),
+            ),
+        )
+        .filter(
+            and_(
+                typ.in_(wanted),
+                node_time_ranges(node, time, node_ids, sd, ed, first, last),
+            )
+        )
+        .order_by(node, typ, time)
+    )
+    rows = qry.all()
+    if not rows:
+        return {}
+    node_col, type_col, times, values, seqs = zip(*rows)
+    nodes = np.array(node_col)
+    types = np.array(type_col)
+    stamps = np.array(times, dtype="datetime64[us]")
+    keys = nodes * (max(wanted) + 1) + types
+
+    spans = {
+        (int(nodes[start]), int(types[start])): (start, stop)
+        for start, stop in _runs(keys)
+    }
+    result: dict[tuple[int, int], list[tuple]] = {}
+    for node_id in node_ids:
+        for type_id in type_ids:
+            span = spans.get((node_id, type_id))
+            if span is None:
+                continue
+            start, stop = span
+            series: list[tuple]
+            if type_id not in type_delta:
+                t = stamps[start:stop]
+                lo = start + int(np.searchsorted(t, np.datetime64(sd)))
+                hi = start + int(np.searchsorted(t, np.datetime64(ed), side="right"))
+                series = [(times[i], values[i]) for i in range(lo, hi)]
+            else:
+                delta_span = spans.get((node_id, type_delta[type_id]))
+                if delta_span is None:
+                    continue
+                dstart, dstop = delta_span
+                _, mine, theirs = np.intersect1d(
+                    stamps[start:stop], stamps[dstart:dstop], return_indices=True
+                )
+                mine += start
+                theirs += dstart
+                keep = (
+                    (stamps[mine] >= np.datetime64(before.get((node_id, type_id), sd)))
+                    & (stamps[mine] <= np.datetime64(after.get((node_id, type_id), ed)))
+                    & np.array([seqs[i] is not None for i in mine.tolist()], dtype=bool)
+                )
+                series = [
+                    (times[i], values[i], values[j], seqs[i])
+                    for i, j in zip(mine[keep].tolist(), theirs[keep].tolist())
+                ]
+            if series:
+                result[(node_id, type_id)] = series
+    return result
+
+
+def time_grid(start: datetime, end: datetime, cells: int) -> tuple[int, list[datetime]]:
+    """Common time grid of about ``cells`` cells covering ``start`` to ``end``
+
+    Cells are at least a minute wide and aligned to multiples of their width
+    since the epoch, as the buckets of
+    :func:`~cogent.views.graph.buckets.bucketed_readings_by_node` are.
+
+    :return: ``(cell width in seconds, start time of each cell)``
+    """
+    step = max(60, math.ceil((end - start).total_seconds() / max(cells, 1)))
+    first = math.floor((start - _EPOCH).total_seconds() / step)
+    last = math.floor((end - _EPOCH).total_seconds() / step)
+    return step, [
+        _EPOCH + timedelta(seconds=cell * step) for cell in range(first, last + 1)
+    ]
+
+
+def grid_means(times, values, grid: list[datetime], step: int) -> list[float | None]:
+    """Mean of ``values`` in each cell of ``grid``, or None for empty cells
+
+    :param times: times of the values in any order
+    :param values: numbers or None (which are ignored)
+    :param grid: cell start times from :func:`time_grid`
+    :param step: cell width in seconds
+    """
+    if not grid:
+        return []
+    t = as_seconds(times)
+    v = np.array(values, dtype=float)
+    cell = np.floor((t - as_seconds(grid[:1])[0]) / step).astype(np.intp)
+    keep = (cell >= 0) & (cell < len(grid)) & ~np.isnan(v)
+    counts = np.bincount(cell[keep], minlength=len(grid))
+    sums = np.bincount(cell[keep], weights=v[keep], minlength=len(grid))
+    means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return [None if math.isnan(x) else x for x in means.tolist()]
@@ -0,0 +1,130 @@
+"""Rendered-image cache shared between gunicorn workers.
+
+Entries are plain files in a directory (``/dev/shm`` by default, so they
+live in memory) written atomically with :func:`os.replace`, which lets every
+worker process on the host read what another has rendered.  Each entry
+records the data version it was rendered from; a lookup with a newer
+version is a miss, so new readings invalidate old images without any
+explicit purge.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+from typing import NamedTuple
+
+LOG = logging.getLogger(__name__)
+
+CACHE_DIR_ENV_VAR = "CH_PLOT_CACHE_DIR"
+CACHE_ENTRIES_ENV_VAR = "CH_PLOT_CACHE_ENTRIES"
+
+DEFAULT_MAX_ENTRIES = 5000
+# prune the directory on roughly one write in this many
+_PRUNE_EVERY = 50
+
+
+def _default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "cogent-plots")
+
+
+class CacheEntry(NamedTuple):
+    mimetype: str
+    data: bytes
+    version: str
+
+
+class PlotCache:
+    """Directory of rendered images keyed by request parameters
+
+    :param directory: where entries are stored (created if missing)
+    :param max_entries: approximate bound on the number of files kept
+    """
+
+    def __init__(
+        self, directory: str | None = None, max_entries: int = DEFAULT_MAX_ENTRIES
+    ) -> None:
+        self.directory = directory or _default_directory()
+        self.max_entries = max_entries
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts: object) -> str:
+        """Return a file-name safe key for the given parameters"""
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str, version: str) -> CacheEntry | None:
+        """Return the entry for ``key`` if it was stored at ``version``"""
+        try:
+            with open(self._path(key), "rb") as entry:
+                header = json.loads(entry.readline())
+                if header.get("version") != version:
+                    return None
+                return CacheEntry(header["mimetype"], entry.read(), version)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, version: str, mimetype: str, data: bytes) -> None:
+        header = json.dumps({"version": version, "mimetype": mimetype})
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp")
+            with os.fdopen(fd, "wb") as entry:
+                entry.write(header.encode() + b"\n")
+                entry.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            LOG.exception("Unable to write plot cache entry %s", key)
+            return
+        if random.randrange(_PRUNE_EVERY) == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        """Remove the least recently written entries beyond ``max_entries``
+
+        :return: number of entries removed
+        """
+        try:
+            entries = [
+                e for e in os.scandir(self.directory) if not e.name.startswith(".")
+            ]
+        except OSError:
+            return 0
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        removed = 0
+        for entry in entries[:excess]:
+            try:
+                os.unlink(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+_CACHE: PlotCache | None = None
+
+
+def get_plot_cache() -> PlotCache:
+    """Return the process-wide :class:`PlotCache` configured from the
+    environment"""
+    global _CACHE
+    directory = os.environ.get(CACHE_DIR_ENV_VAR) or None
+    if _CACHE is None or (directory and _CACHE.directory != directory):
+        try:
+            max_entries = int(
+                os.environ.get(CACHE_ENTRIES_ENV_VAR, DEFAULT_MAX_ENTRIES)
+            )
+        except ValueError:
+            max_entries = DEFAULT_MAX_ENTRIES
+        _CACHE = PlotCache(directory, max_entries=max_entries)
+    return _CACHE
@@ -0,0 +1,179 @@
+"""PNG rendering of time-series charts without pyplot.
+
+The renderer uses the object-oriented :class:`~matplotlib.figure.Figure` /
+:class:`~matplotlib.backends.backend_agg.FigureCanvasAgg` API so there is no
+global pyplot state shared between threads and nothing is registered with a
+figure manager that would keep old figures alive.  Each thread keeps one
+figure as a template; it is cleared before and after every render so the
+data of a chart is released as soon as its PNG has been written.
+"""
+
+from __future__ import annotations
+
+import io
+import threading
+from typing import NamedTuple, Sequence
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure, SubplotParams
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+
+from .constants import _SAVEFIG_ARGS
+
+FIGSIZE = (7, 4)
+# height in inches of each chart in a grid of small multiples
+TILE_HEIGHT = 2.5
+
+Point = tuple[float, float]
+
+
+class Chart(NamedTuple):
+    """Everything needed to draw one chart
+
+    Times are matplotlib date numbers (see :func:`matplotlib.dates.date2num`)
+    so that the tuple is compact and cheap to pass to another process.
+
+    :var start: left edge of the time axis
+    :var end: right edge of the time axis
+    :var y_label: label for the value axis
+    :var fmt: matplotlib format string used for ``points``
+    :var points_x: times of the markers
+    :var points_y: values of the markers
+    :var line_x: times of the solid (spline) line, if any
+    :var line_y: values of the solid line
+    :var prediction: dashed segment from the last event to the end of the
+        window, drawn with a red marker at its end
+    """
+
+    start: float
+    end: float
+    y_label: str
+    fmt: str = "bo"
+    points_x: Sequence[float] = ()
+    points_y: Sequence[float] = ()
+    line_x: Sequence[float] = ()
+    line_y: Sequence[float] = ()
+    prediction: tuple[Point, Point] | None = None
+
+
+_local = threading.local()
+
+
+def _subplot_defaults() -> dict[str, float]:
+    # SubplotParams() takes its values from the figure.subplot.* rcParams
+    params = SubplotParams()
+    return {
+        key: getattr(params, key)
+        for key in ("left", "right", "bottom", "top", "wspace", "hspace")
+    }
+
+
+def _figure() -> Figure:
+    """Return this thread's template figure, cleared and ready to draw on"""
+    fig = getattr(_local, "figure", None)
+    if fig is None:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        fig.set_size_inches(*FIGSIZE)
+        _local.figure = fig
+    # autofmt_xdate adjusts the margins, so restore them for every chart
+    fig.subplots_adjust(**_subplot_defaults())
+    return fig
+
+
+def _save(fig: Figure) -> bytes:
+    image = io.BytesIO()
+    try:
+        fig.savefig(image, format=_SAVEFIG_ARGS["format"])
+    finally:
+        fig.clear()
+    return image.getvalue()
+
+
+def render_no_data() -> bytes:
+    """Render the placeholder shown when there is nothing to plot"""
+    fig = _figure()
+    ax = fig.add_subplot(111)
+    ax.text(0.5, 0.5, "No data", transform=ax.transAxes, ha="center", va="center")
+    return _save(fig)
+
+
+def _is_empty(chart: Chart) -> bool:
+    return len(chart.points_x) == 0 and len(chart.line_x) == 0
+
+
+def _draw(ax, chart: Chart) -> None:
+    """Draw the lines and markers of ``chart`` on ``ax``"""
+    ax.set_autoscalex_on(False)
+    ax.set_xlim((chart.start, chart.end))
+    if len(chart.line_x) > 0:
+        coords = list(zip(chart.line_x, chart.line_y))
+        codes = [Path.MOVETO] + [Path.LINETO] * (len(coords) - 1)
+        ax.add_patch(PathPatch(Path(coords, codes), facecolor="none", lw=2))
+    if chart.prediction is not None:
+        (x0, y0), (x1, y1) = chart.prediction
+        ax.plot([x1], [y1], "ro")
+        ax.xaxis_date()
+        ax.add_patch(
+            PathPatch(
+                Path([(x0, y0), (x1, y1)], [Path.MOVETO, Path.LINETO]),
+                linestyle="dashed",
+                facecolor="none",
+                lw=2,
+            )
+        )
+    ax.plot(chart.points_x, chart.points_y, chart.fmt)
+    ax.xaxis_date()
+
+
+def render_png(chart: Chart) -> bytes:
+    """Render ``chart`` as a PNG image"""
+    if _is_empty(chart):
+        return render_no_data()
+    fig = _figure()
+    try:
+        ax = fig.add_subplot(111)
+        _draw(ax, chart)
+        fig.autofmt_xdate()
+        ax.set_xlabel("Date")
+        ax.set_ylabel(chart.y_label)
+    except Exception:
+        fig.clear()
+        raise
+    return _save(fig)
+
+
+def render_png_grid(charts: Sequence[Chart], titles: Sequence[str]) -> bytes:
+    """Render ``charts`` one above another as a single PNG image
+
+    Each chart takes a :data:`TILE_HEIGHT` inch high band of the image (at
+    the default 100 dpi), which lets pages overlay an image map.
+    """
+    rows = max(len(charts), 1)
+    height = TILE_HEIGHT * rows
+    fig = Figure(figsize=(FIGSIZE[0], height))
+    FigureCanvasAgg(fig)
+    # fixed margins in inches: 0.3 above each chart for its title and 0.6
+    # below for the tick labels, leaving TILE_HEIGHT - 0.9 for the axes
+    fig.subplots_adjust(
+        left=0.12, right=0.97, top=1 - 0.3 / height, bottom=0.6 / height
+    )
+    grid = fig.add_gridspec(rows, 1, hspace=0.9 / (TILE_HEIGHT - 0.9))
+    for i, (chart, title) in enumerate(zip(charts, titles)):
+        ax = fig.add_subplot(grid[i])
+        ax.set_title(title, fontsize=9)
+        if _is_empty(chart):
+            ax.text(
+                0.5, 0.5, "No data", transform=ax.transAxes, ha="center", va="center"
+            )
+            ax.set_xticks([])
+            ax.set_yticks([])
+            continue
+        _draw(ax, chart)
+        ax.set_ylabel(chart.y_label, fontsize=8)
+        ax.tick_params(labelsize=7)
+        for label in ax.get_xticklabels():
+            label.set_rotation(20)
+            label.set_horizontalalignment("right")
+    return _save(fig)
@@ -0,0 +1,227 @@
+"""Process pool for chart rendering.
+
+Rendering a chart with matplotlib is CPU bound and holds the GIL, so in a
+threaded gunicorn worker one slow chart stalls every other request thread.
+When ``CH_RENDER_WORKERS`` is set, charts are instead rendered by a small
+pool of worker processes: the request thread sends the chart's arrays,
+waits for the image bytes and is otherwise free.
+
+The pool is bounded.  At most ``CH_RENDER_QUEUE`` renders may be queued or
+running at once and a further request fails immediately with
+:class:`RenderBusy`; a render that takes longer than ``CH_RENDER_TIMEOUT``
+seconds fails with :class:`RenderTimeout` and the workers are restarted.
+Both are reported to the client as ``503 Service Unavailable``.  Other
+renders that lose their worker to the restart are run again, once, in the
+new workers.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from .render import Chart
+
+LOG = logging.getLogger(__name__)
+
+WORKERS_ENV_VAR = "CH_RENDER_WORKERS"
+TIMEOUT_ENV_VAR = "CH_RENDER_TIMEOUT"
+QUEUE_ENV_VAR = "CH_RENDER_QUEUE"
+
+DEFAULT_TIMEOUT = 20.0
+
+
+class RenderUnavailable(Exception):
+    """The render pool could not produce an image"""
+
+
+class RenderBusy(RenderUnavailable):
+    """Too many renders are already queued"""
+
+
+class RenderTimeout(RenderUnavailable):
+    """A render took longer than the pool's timeout"""
+
+
+def _compact(value):
+    """Send charts as float arrays, which pickle far smaller than lists"""
+    if isinstance(value, Chart):
+        return value._replace(
+            points_x=np.asarray(value.points_x, dtype=float),
+            points_y=np.asarray(value.points_y, dtype=float),
+            line_x=np.asarray(value.line_x, dtype=float),
+            line_y=np.asarray(value.line_y, dtype=float),
+        )
+    if isinstance(value, list) and value and isinstance(value[0], Chart):
+        return [_compact(chart) for chart in value]
+    return value
+
+
+def _warm_up():
+    # import matplotlib and build the template figure before the first job
+    from .render import render_no_data
+
+    render_no_data()
+
+
+class RenderPool:
+    """Bounded pool of rendering processes
+
+    :param workers: number of worker processes
+    :param timeout: seconds to wait for one render
+    :param max_pending: renders allowed to be queued or running at once
+        (default twice ``workers``)
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_pending: int | None = None,
+    ) -> None:
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending or 2 * workers
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._closed = False
+
+    def _submit(self, fn, args) -> tuple[ProcessPoolExecutor, Future]:
+        """Submit ``fn(*args)`` to the current executor, starting one if
+        needed
+
+        Submitting holds the lock that :meth:`_restart` takes to retire an
+        executor, so a render is never sent to workers already killed.
+        """
+        with self._lock:
+            if self._closed:
+                raise RenderUnavailable("render pool is shut down")
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+            executor = self._executor
+            try:
+                return executor, executor.submit(fn, *args)
+            except BrokenProcessPool as exc:
+                # a worker died and no render has restarted the pool yet
+                future: Future = Future()
+                future.set_exception(exc)
+                return executor, future
+
+    def _restart(self, executor: ProcessPoolExecutor) -> bool:
+        """Kill the workers of ``executor`` (which may be stuck on a render)
+        so that the next render starts a fresh pool
+
+        :return: False if another render had already restarted it
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return False
+            self._executor = None
+        # the executor has no public way to stop a running task
+        processes = getattr(executor, "_processes", None) or {}
+        for process in list(processes.values()):
+            process.kill()
+        executor.shutdown(wait=False)
+        return True
+
+    def run(self, fn, *args):
+        """Return ``fn(*args)`` computed in a worker process
+
+        A render whose workers were killed because another render timed out
+        or crashed is submitted again, with a fresh ``timeout``.
+
+        :raises RenderBusy: if ``max_pending`` renders are already pending
+        :raises RenderTimeout: if the render takes longer than ``timeout``
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RenderBusy(f"{self.max_pending} renders already pending")
+        try:
+            compact = [_compact(arg) for arg in args]
+            retried = False
+            while True:
+                executor, future = self._submit(fn, compact)
+                try:
+                    return future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    LOG.warning(
+                        "Render %s timed out after %.1fs", fn.__name__, self.timeout
+                    )
+                    self._restart(executor)
+                    raise RenderTimeout(f"render took more than {self.timeout}s")
+                except BrokenProcessPool:
+                    if self._restart(executor) or retried:
+                        LOG.exception("Render pool failed")
+                        raise RenderUnavailable("render pool failed")
+                    LOG.warning(
+                        "Render %s lost its worker to a restart, retrying",
+                        fn.__name__,
+                    )
+                    retried = True
+                except CancelledError:
+                    raise RenderUnavailable("render pool is shut down")
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers
+
+        :param wait: wait for running renders and cancel queued ones; if
+            False, return at once and let the workers finish what they have
+        """
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=wait)
+
+
+_POOL: RenderPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def _env_number(name, default, kind=int):
+    try:
+        return kind(os.environ.get(name, default))
+    except ValueError:
+        LOG.warning("Ignoring invalid %s=%r", name, os.environ.get(name))
+        return default
+
+
+def get_render_pool() -> RenderPool | None:
+    """Return the process-wide pool, or None if ``CH_RENDER_WORKERS`` is
+    unset or zero"""
+    global _POOL
+    workers = _env_number(WORKERS_ENV_VAR, 0)
+    if workers <= 0:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.workers != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            _POOL = RenderPool(
+                workers,
+                timeout=_env_number(TIMEOUT_ENV_VAR, DEFAULT_TIMEOUT, float),
+                max_pending=_env_number(QUEUE_ENV_VAR, 0) or None,
+            )
+        return _POOL
+
+
+def render(fn, *args):
+    """Call the rendering function ``fn`` in the render pool if there is one,
+    otherwise in this thread"""
+    pool = get_render_pool()
+    if pool is None:
+        return fn(*args)
+    return pool.run(fn, *args)
@@ -0,0 +1,176 @@
+"""Coalescing of identical concurrent renders.
+
+When ``/allGraphs`` is opened on a wall display and by several users at the
+same moment, the same ``/plot`` images are requested concurrently and each
+request would otherwise redo the query and the render.  :func:`coalesce`
+lets the first request for a key compute the result while duplicates wait
+for it:
+
+* within a worker process, followers wait on the leader's call and share
+  its result (or its exception);
+* across gunicorn workers, the leader holds an exclusive ``flock`` on a
+  lock file in ``CH_SINGLEFLIGHT_DIR`` (``/dev/shm/cogent-locks`` by
+  default) and followers poll for it, then look the result up in the shared
+  plot cache before computing it themselves.
+
+Followers never wait longer than ``CH_SINGLEFLIGHT_TIMEOUT`` seconds
+(default 30): after that they compute the result themselves, so a stuck
+leader cannot hold them up.  Locks held by a worker that dies are released
+by the kernel.  Keys are hashed onto a fixed number of lock files, so two
+different keys occasionally share one; the follower then finds nothing in
+the cache and computes its own result.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on POSIX
+    fcntl = None  # type: ignore[assignment]
+
+LOG = logging.getLogger(__name__)
+
+DIR_ENV_VAR = "CH_SINGLEFLIGHT_DIR"
+TIMEOUT_ENV_VAR = "CH_SINGLEFLIGHT_TIMEOUT"
+
+DEFAULT_TIMEOUT = 30.0
+# number of lock files keys are spread over
+LOCK_STRIPES = 256
+# how often followers in other processes check the lock
+_POLL = 0.05
+
+
+def _default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "cogent-locks")
+
+
+class _Call:
+    """A computation in progress in this process"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time
+
+    :param directory: where the lock files shared between processes live
+        (created if missing); None coalesces within the process only
+    :param timeout: seconds a follower waits before computing itself
+    """
+
+    def __init__(
+        self, directory: str | None = None, timeout: float = DEFAULT_TIMEOUT
+    ) -> None:
+        self.configured = self.directory = directory
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        if directory is not None and fcntl is not None:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                LOG.exception("Unable to create lock directory %s", directory)
+                self.directory = None
+
+    def do(self, key: str, compute, lookup=None):
+        """Return ``compute()``, sharing it with concurrent calls for ``key``
+
+        :param lookup: optional callable returning the result stored by a
+            leader in another process, or None if there is none
+        """
+        with self._lock:
+            running = self._calls.get(key)
+            if running is None:
+                call = self._calls[key] = _Call()
+        if running is not None:
+            return self._follow(key, running, compute)
+        try:
+            call.result = self._across_processes(key, compute, lookup)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _follow(self, key: str, call: _Call, compute):
+        """Wait for the leader's ``call``, computing after the timeout"""
+        if call.done.wait(self.timeout):
+            if call.error is not None:
+                raise call.error
+            return call.result
+        LOG.warning("Gave up waiting for %s after %.0f s", key, self.timeout)
+        return compute()
+
+    def _lock_path(self, directory: str, key: str) -> str:
+        stripe = int(hashlib.sha1(key.encode()).hexdigest(), 16) % LOCK_STRIPES
+        return os.path.join(directory, f"{stripe:03d}.lock")
+
+    def _across_processes(self, key, compute, lookup):
+        if self.directory is None or fcntl is None:
+            return compute()
+        try:
+            fd = os.open(
+                self._lock_path(self.directory, key), os.O_RDWR | os.O_CREAT, 0o666
+            )
+        except OSError:
+            LOG.exception("Unable to open lock file for %s", key)
+            return compute()
+        try:
+            deadline = time.monotonic() + self.timeout
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        LOG.warning(
+                            "Gave up waiting for %s after %.0f s", key, self.timeout
+                        )
+                        return compute()
+                    waited = True
+                    time.sleep(_POLL)
+            # another worker held the lock, so it may have stored the result
+            if waited and lookup is not None:
+                result = lookup()
+                if result is not None:
+                    return result
+            return compute()
+        finally:
+            os.close(fd)
+
+
+_FLIGHT: SingleFlight | None = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide :class:`SingleFlight` configured from the
+    environment"""
+    global _FLIGHT
+    directory = os.environ.get(DIR_ENV_VAR) or _default_directory()
+    if _FLIGHT is None or _FLIGHT.configured != directory:
+        try:
+            timeout = float(os.environ.get(TIMEOUT_ENV_VAR, DEFAULT_TIMEOUT))
+        except ValueError:
+            timeout = DEFAULT_TIMEOUT
+        _FLIGHT = SingleFlight(directory, timeout=timeout)
+    return _FLIGHT
+
+
+def coalesce(key: str, compute, lookup=None):
+    """Return ``compute()`` through the process-wide :class:`SingleFlight`"""
+    return get_single_flight().do(key, compute, lookup)
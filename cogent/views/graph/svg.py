@@ -0,0 +1,276 @@
+"""Compact SVG rendering of time-series charts.
+
+This draws the same elements as :func:`cogent.views.graph.render.render_png`
+(axes, date ticks, the spline line, event markers and the dashed prediction
+segment) by writing SVG markup directly.  It avoids matplotlib's figure
+setup and rasterisation entirely, so a chart of ``MAX_CHART_POINTS`` points
+renders in about a millisecond and is typically only a few kilobytes.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+from .constants import _EPOCH
+from .render import Chart
+
+WIDTH = 700
+HEIGHT = 400
+LEFT = 70
+RIGHT = 20
+TOP = 20
+BOTTOM = 70
+# height of each chart, including its title, in a grid of small multiples
+TILE_HEIGHT = 250
+TITLE_HEIGHT = 20
+
+# matplotlib colour codes used in ``fmt`` strings
+_COLOURS = {
+    "b": "#1f77b4",
+    "g": "#2ca02c",
+    "r": "#d62728",
+    "c": "#17becf",
+    "m": "#9467bd",
+    "y": "#bcbd22",
+    "k": "#000000",
+    "w": "#ffffff",
+}
+
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+
+# candidate spacing of date ticks with the strftime format used for each
+_DATE_STEPS = [
+    (timedelta(minutes=5), "%H:%M"),
+    (timedelta(minutes=10), "%H:%M"),
+    (timedelta(minutes=15), "%H:%M"),
+    (timedelta(minutes=30), "%H:%M"),
+    (timedelta(hours=1), "%H:%M"),
+    (timedelta(hours=2), "%H:%M"),
+    (timedelta(hours=3), "%d %H:%M"),
+    (timedelta(hours=6), "%d %H:%M"),
+    (timedelta(hours=12), "%d %H:%M"),
+    (timedelta(days=1), "%Y-%m-%d"),
+    (timedelta(days=2), "%Y-%m-%d"),
+    (timedelta(days=7), "%Y-%m-%d"),
+    (timedelta(days=14), "%Y-%m-%d"),
+    (timedelta(days=30), "%Y-%m"),
+    (timedelta(days=61), "%Y-%m"),
+    (timedelta(days=91), "%Y-%m"),
+    (timedelta(days=182), "%Y-%m"),
+    (timedelta(days=365), "%Y"),
+]
+_MAX_X_TICKS = 8
+_Y_TICKS = 6
+
+
+def _num2date(num: float) -> datetime:
+    """Convert a matplotlib date number (days since 1970) to a datetime"""
+    return _EPOCH_UTC + timedelta(days=num)
+
+
+def parse_fmt(fmt: str) -> tuple[str, str | None, str | None]:
+    """Split a matplotlib style ``fmt`` into (colour, marker, line style)
+
+    Only the subset used by the site is understood: a colour letter,
+    ``o`` or ``.`` markers and ``-`` / ``--`` lines.
+    """
+    colour = _COLOURS["b"]
+    for ch in fmt:
+        if ch in _COLOURS:
+            colour = _COLOURS[ch]
+            break
+    marker = "o" if "o" in fmt else ("." if "." in fmt else None)
+    if "--" in fmt:
+        line = "--"
+    elif "-" in fmt:
+        line = "-"
+    else:
+        line = None
+    if marker is None and line is None:
+        marker = "o"
+    return colour, marker, line
+
+
+def _nice_ticks(lo: float, hi: float, count: int = _Y_TICKS) -> list[float]:
+    if hi <= lo:
+        lo, hi = lo - 1.0, hi + 1.0
+    raw = (hi - lo) / max(count - 1, 1)
+    mag = 10 ** math.floor(math.log10(raw))
+    step = next(m * mag for m in (1, 2, 2.5, 5, 10) if m * mag >= raw)
+    first = math.ceil(lo / step) * step
+    ticks = []
+    value = first
+    while value <= hi + step * 1e-9:
+        ticks.append(round(value, 10))
+        value += step
+    return ticks
+
+
+def _date_ticks(start: float, end: float) -> list[tuple[float, str]]:
+    span = timedelta(days=end - start)
+    for step, label in _DATE_STEPS:
+        if span / step <= _MAX_X_TICKS:
+            break
+    secs = step.total_seconds()
+    first = math.ceil((start * 86400.0) / secs) * secs
+    ticks = []
+    t = first
+    while t <= end * 86400.0:
+        ticks.append((t / 86400.0, _num2date(t / 86400.0).strftime(label)))
+        t += secs
+    return ticks
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def _label(value: float) -> str:
+    return f"{value:.6g}"
+
+
+def render_svg(chart: Chart, width: int = WIDTH, height: int = HEIGHT) -> bytes:
+    """Render ``chart`` as a standalone SVG document"""
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+        f'height="{height}" viewBox="0 0 {width} {height}" '
+        'font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="#fff"/>',
+    ]
+    x0, x1 = LEFT, width - RIGHT
+    y0, y1 = TOP, height - BOTTOM
+    if len(chart.points_x) == 0 and len(chart.line_x) == 0:
+        out.append(
+            f'<text x="{width / 2}" y="{height / 2}" text-anchor="middle" '
+            'font-size="14">No data</text></svg>'
+        )
+        return "".join(out).encode()
+
+    values = [v for v in list(chart.points_y) + list(chart.line_y) if v is not None]
+    if chart.prediction is not None:
+        values.extend(p[1] for p in chart.prediction)
+    lo, hi = (min(values), max(values)) if values else (0.0, 1.0)
+    yticks = _nice_ticks(lo, hi)
+    lo, hi = min(lo, yticks[0]), max(hi, yticks[-1])
+    if hi == lo:
+        hi = lo + 1.0
+    tspan = chart.end - chart.start or 1.0
+
+    def sx(t: float) -> float:
+        return x0 + (t - chart.start) * (x1 - x0) / tspan
+
+    def sy(v: float) -> float:
+        return y1 - (v - lo) * (y1 - y0) / (hi - lo)
+
+    # grid, ticks and labels
+    out.append('<g stroke="#ddd">')
+    for v in yticks:
+        out.append(f'<path d="M{x0},{_fmt(sy(v))}H{x1}"/>')
+    xticks = _date_ticks(chart.start, chart.end)
+    for t, _ in xticks:
+        out.append(f'<path d="M{_fmt(sx(t))},{y0}V{y1}"/>')
+    out.append("</g>")
+    out.append('<g text-anchor="end">')
+    for v in yticks:
+        out.append(
+            f'<text x="{x0 - 5}" y="{_fmt(sy(v) + 4)}">{escape(_label(v))}</text>'
+        )
+    for t, label in xticks:
+        x, y = _fmt(sx(t)), y1 + 12
+        out.append(
+            f'<text x="{x}" y="{y}" transform="rotate(-30 {x} {y})">'
+            f"{escape(label)}</text>"
+        )
+    out.append("</g>")
+    out.append(
+        f'<rect x="{x0}" y="{y0}" width="{x1 - x0}" height="{y1 - y0}" '
+        'fill="none" stroke="#000"/>'
+    )
+    out.append(
+        f'<text x="{(x0 + x1) / 2}" y="{height - 8}" text-anchor="middle">Date</text>'
+    )
+    ymid = (y0 + y1) / 2
+    out.append(
+        f'<text x="14" y="{ymid}" text-anchor="middle" '
+        f'transform="rotate(-90 14 {ymid})">{escape(chart.y_label)}</text>'
+    )
+
+    out.append(
+        f'<svg x="{x0}" y="{y0}" width="{x1 - x0}" height="{y1 - y0}" '
+        f'viewBox="{x0} {y0} {x1 - x0} {y1 - y0}" overflow="hidden">'
+    )
+    colour, marker, line = parse_fmt(chart.fmt)
+    if len(chart.line_x) > 0:
+        out.append(_path(chart.line_x, chart.line_y, sx, sy, "#000", 2))
+    if chart.prediction is not None:
+        (px0, py0), (px1, py1) = chart.prediction
+        out.append(
+            f'<path d="M{_fmt(sx(px0))},{_fmt(sy(py0))}L{_fmt(sx(px1))},'
+            f'{_fmt(sy(py1))}" stroke="#000" stroke-width="2" '
+            'stroke-dasharray="7,3" fill="none"/>'
+        )
+        out.append(
+            f'<circle cx="{_fmt(sx(px1))}" cy="{_fmt(sy(py1))}" r="3" '
+            f'fill="{_COLOURS["r"]}"/>'
+        )
+    if line is not None and len(chart.points_x) > 0:
+        path = _path(chart.points_x, chart.points_y, sx, sy, colour, 1.5)
+        if line == "--":
+            path = path.replace("/>", ' stroke-dasharray="6,3"/>')
+        out.append(path)
+    if marker is not None and len(chart.points_x) > 0:
+        radius = 3 if marker == "o" else 1.5
+        out.append(f'<g fill="{colour}">')
+        out.extend(
+            f'<circle cx="{_fmt(sx(t))}" cy="{_fmt(sy(v))}" r="{radius}"/>'
+            for t, v in zip(chart.points_x, chart.points_y)
+            if v is not None
+        )
+        out.append("</g>")
+    out.append("</svg></svg>")
+    return "".join(out).encode()
+
+
+def render_svg_grid(
+    charts: list[Chart], titles: list[str], width: int = WIDTH
+) -> bytes:
+    """Render ``charts`` one above another in a single SVG document
+
+    Chart ``i`` occupies the band from ``i * TILE_HEIGHT`` to
+    ``(i + 1) * TILE_HEIGHT`` with its title at the top of the band.
+    """
+    height = TILE_HEIGHT * max(len(charts), 1)
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+        f'height="{height}" viewBox="0 0 {width} {height}" '
+        'font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="#fff"/>',
+    ]
+    for i, (chart, title) in enumerate(zip(charts, titles)):
+        top = i * TILE_HEIGHT
+        out.append(
+            f'<text x="{width / 2}" y="{top + TITLE_HEIGHT - 5}" '
+            f'text-anchor="middle" font-size="12">{escape(title)}</text>'
+        )
+        out.append(f'<g transform="translate(0,{top + TITLE_HEIGHT})">')
+        out.append(render_svg(chart, width, TILE_HEIGHT - TITLE_HEIGHT).decode())
+        out.append("</g>")
+    out.append("</svg>")
+    return "".join(out).encode()
+
+
+def _path(xs, ys, sx, sy, colour: str, width: float) -> str:
+    parts = []
+    cmd = "M"
+    for t, v in zip(xs, ys):
+        if v is None:
+            cmd = "M"
+            continue
+        parts.append(f"{cmd}{_fmt(sx(t))},{_fmt(sy(v))}")
+        cmd = "L"
+    return (
+        f'<path d="{"".join(parts)}" stroke="{colour}" '
+        f'stroke-width="{width}" fill="none"/>'
+    )
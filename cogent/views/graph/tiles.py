@@ -0,0 +1,80 @@
+"""Fixed time tiles of aggregated readings for zoomable charts.
+
+Time is cut into tiles in the manner of map tiles: at zoom level ``z`` each
+tile spans :data:`TILE_SPANS` ``[z]`` seconds, tile ``i`` starts ``i`` spans
+after the epoch, and its readings are summarised into :data:`TILE_BUCKETS`
+buckets by the database.  A tile that ended more than :data:`SETTLE`
+ago is not expected to change, so the browser caches it forever.  The
+server still keys it on the node's last ingest, so a log replayed late
+refreshes its copy.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+
+from .buckets import bucketed_readings
+from .constants import _EPOCH
+
+DAY = 86400
+# seconds covered by one tile at each zoom level, coarsest first
+TILE_SPANS = [1024 * DAY, 256 * DAY, 64 * DAY, 16 * DAY, 4 * DAY, DAY, DAY // 4]
+# buckets per tile; every span is a multiple of this
+TILE_BUCKETS = 240
+# readings are assumed to arrive within this long of being taken
+SETTLE = timedelta(hours=1)
+
+
+def tile_bounds(zoom: int, index: int) -> tuple[datetime, datetime]:
+    """Return the naive UTC start and end of a tile"""
+    span = TILE_SPANS[zoom]
+    start = _EPOCH + timedelta(seconds=index * span)
+    return start, start + timedelta(seconds=span)
+
+
+def tile_index(zoom: int, when: datetime) -> int:
+    """Index of the tile at ``zoom`` containing the naive UTC time ``when``"""
+    return int((when - _EPOCH).total_seconds() // TILE_SPANS[zoom])
+
+
+def bucket_seconds(zoom: int) -> int:
+    """Width of the buckets of a tile at ``zoom``"""
+    return TILE_SPANS[zoom] // TILE_BUCKETS
+
+
+def is_closed(zoom: int, index: int, now: datetime) -> bool:
+    """True if the tile ended long enough before ``now`` that no further
+    readings are expected for it"""
+    return tile_bounds(zoom, index)[1] + SETTLE <= now
+
+
+def tile_payload(session, node_id: int, type_id: int, zoom: int, index: int, now):
+    """JSON body of a tile as bytes
+
+    ``buckets`` lists ``[start, min, max, mean, last, count]`` for each
+    non-empty bucket of the tile.
+    """
+    start, end = tile_bounds(zoom, index)
+    seconds = bucket_seconds(zoom)
+    buckets = []
+    if start <= now:
+        # the tile excludes its end, which is the start of the next tile
+        buckets = bucketed_readings(
+            session, node_id, type_id, start, end - timedelta(microseconds=1), seconds
+        )
+    body = {
+        "node": node_id,
+        "type": type_id,
+        "zoom": zoom,
+        "index": index,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "closed": is_closed(zoom, index, now),
+        "bucket_seconds": seconds,
+        "buckets": [
+            [b.start.isoformat(), b.minimum, b.maximum, b.mean, b.last, b.samples]
+            for b in buckets
+        ],
+    }
+    return json.dumps(body).encode()
@@ -0,0 +1,104 @@
+"""Helpers for HTTP validators (ETag / Last-Modified) and 304 responses."""
+
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, g, make_response, request
+
+from cogent.base.model import Session
+from cogent.base.model.dataversion import data_version
+
+# pages that depend on the current time as well as the data (such as
+# /missing) are treated as changed at least this often, in seconds
+PAGE_BUCKET = 60
+
+
+def _http_time(value: datetime) -> datetime:
+    """Return ``value`` as an aware UTC datetime with second precision"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def not_modified(etag: str, last_modified: datetime | None = None) -> bool:
+    """Return True if the client's cached copy matches the validators
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since`` as
+    required by RFC 9110.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return _http_time(last_modified) <= _http_time(request.if_modified_since)
+    return False
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: datetime | None = None,
+    max_age: int = 0,
+) -> Response:
+    """Attach ETag, Last-Modified and Cache-Control headers to ``response``"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_time(last_modified)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.must_revalidate = True
+    return response
+
+
+def not_modified_response(
+    etag: str, last_modified: datetime | None = None, max_age: int = 0
+) -> Response:
+    """Return an empty 304 response carrying the same validators"""
+    return set_validators(Response(status=304), etag, last_modified, max_age)
+
+
+def request_data_version() -> tuple[str, datetime | None]:
+    """Return the data version and time of the latest change, read at
+    most once per request"""
+    if "data_version" not in g:
+        with Session() as session:
+            g.data_version = data_version(session)
+    return g.data_version
+
+
+def page_validators(now: datetime | None = None) -> tuple[str, datetime]:
+    """Return the ETag and Last-Modified time of the requested page
+
+    They are derived from the data watermark (see
+    :mod:`cogent.base.model.dataversion`), the request and the current
+    ``PAGE_BUCKET``, so they change when new data arrives, reference data
+    is edited or time moves on.
+    """
+    version, changed = request_data_version()
+    now = now or datetime.now(timezone.utc)
+    tick = int(now.timestamp()) // PAGE_BUCKET
+    etag = hashlib.sha1(repr((request.full_path, version, tick)).encode()).hexdigest()
+    last_modified = datetime.fromtimestamp(tick * PAGE_BUCKET, timezone.utc)
+    if changed is not None:
+        last_modified = max(last_modified, _http_time(changed))
+    return etag, last_modified
+
+
+def conditional_page(view):
+    """Decorate a view to answer conditional requests from the data
+    watermark, returning 304 without running the view when nothing has
+    changed"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag, last_modified = page_validators()
+        if not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
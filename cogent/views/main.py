@@ -1,20 +1,25 @@
-from datetime import UTC, datetime, time, timedelta
+from datetime import UTC, datetime, timedelta
 
 from flask import Blueprint, render_template, request, url_for
-from sqlalchemy import and_, distinct, func
+from sqlalchemy import and_, func
 from sqlalchemy.orm import aliased
 
+from cogent.base.counters import COUNTER_TYPES, bucket_usage, counter_usage
 from cogent.base.model import (
+    DailyUsage,
     House,
     Location,
     Node,
-    NodeState,
+    NodeLastSeen,
     Reading,
     Room,
     SensorType,
     Session,
 )
-from cogent.sip.calc_yield import calc_yield
+from cogent.base.model.hourlyyield import window_yields
+
+from .http import conditional_page
+from .resultcache import cached_view
 
 main_bp = Blueprint("main", __name__)
 
@@ -27,6 +32,13 @@ _PERIOD_DEFINITIONS = [
     ("2-years", "Last 24 months", 730),
 ]
 _PERIOD_LOOKUP = {key: days for key, _, days in _PERIOD_DEFINITIONS}
+_RESOLUTION_DEFINITIONS = [
+    ("hour", "Hourly", "%Y-%m-%d %H:00"),
+    ("day", "Daily", "%Y-%m-%d"),
+    ("week", "Weekly", "%Y-%m-%d"),
+]
+# hourly charts read raw readings, so they are limited to short periods
+_HOURLY_MAX_DAYS = 31
 
 
 @main_bp.route("/")
@@ -35,277 +47,221 @@ def index():
 
 
 @main_bp.route("/missing")
+@conditional_page
 def missing():
-    """Report nodes missing in the last eight hours and extra nodes."""
-    t = datetime.now(UTC) - timedelta(hours=8)
+    """Report nodes missing in the last ``hours`` hours (default eight) and
+    extra nodes."""
+    hours_arg = request.args.get("hours", "8")
+    try:
+        hours = float(hours_arg)
+    except (TypeError, ValueError):
+        hours = 8.0
+    if not hours > 0:
+        hours = 8.0
+    t = (datetime.now(UTC) - timedelta(hours=hours)).replace(tzinfo=None)
     with Session() as session:
-        report_set = {
-            int(x)
-            for (x,) in session.query(distinct(NodeState.nodeId))
-            .filter(NodeState.time > t)
-            .all()
-        }
-        all_set = {
-            int(x)
-            for (x,) in session.query(Node.id)
+        last_seen = dict(session.query(NodeLastSeen.nodeId, NodeLastSeen.time).all())
+        registered = (
+            session.query(Node.id, House.address, Room.name)
             .join(Location, Node.locationId == Location.id)
             .join(House, Location.houseId == House.id)
             .join(Room, Location.roomId == Room.id)
+            .order_by(House.address, Room.name)
             .all()
-        }
-        missing_set = all_set - report_set
-        extra_set = report_set - all_set
-
-        missing_nodes = []
-        if missing_set:
-            qry = (
-                session.query(
-                    func.max(NodeState.time),
-                    NodeState.nodeId,
-                    House.address,
-                    Room.name,
-                )
-                .filter(NodeState.nodeId.in_(missing_set))
-                .group_by(NodeState.nodeId)
-                .join(Node, NodeState.nodeId == Node.id)
-                .join(Location, Node.locationId == Location.id)
-                .join(House, Location.houseId == House.id)
-                .join(Room, Location.roomId == Room.id)
-                .order_by(House.address, Room.name)
-                .all()
-            )
-            for maxtime, node_id, house, room in qry:
-                missing_nodes.append(
-                    {
-                        "node": node_id,
-                        "house": house,
-                        "room": room,
-                        "last": maxtime,
-                    }
-                )
-
-        extra_nodes = []
-        if extra_set:
-            for node_id in sorted(extra_set):
-                extra_nodes.append(
-                    {
-                        "node": node_id,
-                        "register_url": f"/registerNode?node={node_id}",
-                    }
-                )
+        )
+
+    report_set = {node_id for node_id, when in last_seen.items() if when > t}
+    all_set = {node_id for node_id, _, _ in registered}
+    missing_nodes = [
+        {"node": node_id, "house": house, "room": room, "last": last_seen[node_id]}
+        for node_id, house, room in registered
+        if node_id in last_seen and node_id not in report_set
+    ]
+    extra_nodes = [
+        {"node": node_id, "register_url": f"/registerNode?node={node_id}"}
+        for node_id in sorted(report_set - all_set)
+    ]
 
     return render_template(
-        "missing.html", title="Missing nodes", missing=missing_nodes, extra=extra_nodes
+        "missing.html",
+        title="Missing nodes",
+        missing=missing_nodes,
+        extra=extra_nodes,
+        hours=f"{hours:g}",
     )
 
 
+_YIELD_SORT_KEYS = {
+    "id": lambda r: r["node"],
+    "room": lambda r: r["room"] or "",
+    "msgcnt": lambda r: r["msgcnt"],
+    "minseq": lambda r: r["minseq"],
+    "maxseq": lambda r: r["maxseq"],
+    "last": lambda r: r["last"],
+}
+_YIELD_MAX_DAYS = 366
+
+
 @main_bp.route("/yield24")
+@conditional_page
+@cached_view()
 def yield24():
-    """Display packet yield for each node over the last 24 hours."""
+    """Display packet yield for each node over the last 24 hours.
+
+    ``days`` widens the window; yields are combined from HourlyYield rows.
+    """
     sort = request.args.get("sort", "house")
-    start_t = datetime.now(UTC) - timedelta(days=1)
+    days = min(max(request.args.get("days", 1, type=int), 1), _YIELD_MAX_DAYS)
+    start_t = datetime.now(UTC) - timedelta(days=days)
     with Session() as session:
-        seqcnt_q = (
-            session.query(
-                NodeState.nodeId.label("nodeId"),
-                func.count(NodeState.seq_num).label("cnt"),
-            )
-            .filter(NodeState.time >= start_t)
-            .group_by(NodeState.nodeId)
-            .subquery()
-        )
-
-        selmint_q = (
-            session.query(
-                NodeState.nodeId.label("nodeId"),
-                func.min(NodeState.time).label("mint"),
-            )
-            .filter(NodeState.time >= start_t)
-            .group_by(NodeState.nodeId)
-            .subquery()
+        yields = window_yields(session, start_t)
+        places = (
+            session.query(Node.id, House.address, Room.name)
+            .join(Location, Node.locationId == Location.id)
+            .join(House, Location.houseId == House.id)
+            .join(Room, Location.roomId == Room.id)
+            .filter(Node.id.in_(yields))
+            .all()
         )
 
-        minseq_q = (
-            session.query(
-                NodeState.nodeId.label("nodeId"),
-                NodeState.seq_num.label("seq_num"),
-            )
-            .join(
-                selmint_q,
-                and_(
-                    NodeState.time == selmint_q.c.mint,
-                    NodeState.nodeId == selmint_q.c.nodeId,
+    records = []
+    for node_id, house_name, room_name in places:
+        node_yield = yields[node_id]
+        records.append(
+            {
+                "node": node_id,
+                "house": house_name,
+                "room": room_name,
+                "msgcnt": node_yield.packets,
+                "minseq": node_yield.minseq,
+                "maxseq": node_yield.maxseq,
+                "last": node_yield.last,
+                "yield": node_yield.yld,
+                "node_url": url_for(
+                    "graph.node_graph", node=node_id, typ=6, period="day"
                 ),
-            )
-            .subquery()
+            }
         )
+    records.sort(
+        key=_YIELD_SORT_KEYS.get(sort, lambda r: (r["house"] or "", r["room"] or ""))
+    )
 
-        selmaxt_q = (
-            session.query(
-                NodeState.nodeId.label("nodeId"),
-                func.max(NodeState.time).label("maxt"),
-            )
-            .filter(NodeState.time >= start_t)
-            .group_by(NodeState.nodeId)
-            .subquery()
-        )
+    title = "Yield for last day" if days == 1 else f"Yield for last {days} days"
+    return render_template(
+        "yield24.html", title=title, records=records, sort=sort, days=days
+    )
 
-        maxseq_q = (
-            session.query(
-                NodeState.nodeId.label("nodeId"),
-                NodeState.seq_num.label("seq_num"),
-                NodeState.time.label("time"),
-            )
-            .join(
-                selmaxt_q,
-                and_(
-                    NodeState.time == selmaxt_q.c.maxt,
-                    NodeState.nodeId == selmaxt_q.c.nodeId,
-                ),
-            )
-            .subquery()
-        )
 
-        qry = (
-            session.query(
-                maxseq_q.c.nodeId,
-                maxseq_q.c.seq_num.label("maxseq"),
-                minseq_q.c.seq_num.label("minseq"),
-                seqcnt_q.c.cnt,
-                maxseq_q.c.time,
-                House.address,
-                Room.name,
+def _counter_breakdown(session, type_id, start_date, end_date, resolution):
+    """Consumption of counter type ``type_id`` per node between two days"""
+    if resolution != "hour":
+        # daily totals are maintained at ingest (see DailyUsage)
+        rows = (
+            session.query(DailyUsage.nodeId, DailyUsage.day, DailyUsage.used)
+            .filter(
+                DailyUsage.typeId == type_id,
+                DailyUsage.day >= start_date,
+                DailyUsage.day <= end_date,
             )
-            .select_from(maxseq_q)
-            .join(minseq_q, minseq_q.c.nodeId == maxseq_q.c.nodeId)
-            .join(seqcnt_q, seqcnt_q.c.nodeId == maxseq_q.c.nodeId)
-            .join(Node, Node.id == maxseq_q.c.nodeId)
-            .join(Location, Node.locationId == Location.id)
-            .join(House, Location.houseId == House.id)
-            .join(Room, Location.roomId == Room.id)
+            .all()
         )
-
-        if sort == "id":
-            qry = qry.order_by(Node.id)
-        elif sort == "room":
-            qry = qry.order_by(Room.name)
-        elif sort == "msgcnt":
-            qry = qry.order_by(seqcnt_q.c.cnt)
-        elif sort == "minseq":
-            qry = qry.order_by(minseq_q.c.seq_num)
-        elif sort == "maxseq":
-            qry = qry.order_by(maxseq_q.c.seq_num)
-        elif sort == "last":
-            qry = qry.order_by(maxseq_q.c.time)
-        else:
-            qry = qry.order_by(House.address, Room.name)
-
-        records = []
-        for (
-            node_id,
-            maxseq,
-            minseq,
-            seqcnt,
-            last_heard,
-            house_name,
-            room_name,
-        ) in qry.all():
-            records.append(
-                {
-                    "node": node_id,
-                    "house": house_name,
-                    "room": room_name,
-                    "msgcnt": seqcnt,
-                    "minseq": minseq,
-                    "maxseq": maxseq,
-                    "last": last_heard,
-                    "yield": calc_yield(seqcnt, minseq, maxseq),
-                    "node_url": url_for(
-                        "graph.node_graph", node=node_id, typ=6, period="day"
-                    ),
-                }
-            )
-
-    return render_template(
-        "yield24.html", title="Yield for last day", records=records, sort=sort
+        nodes, days, used = zip(*rows) if rows else ((), (), ())
+        return bucket_usage(nodes, days, used, start_date, end_date, resolution)
+
+    # the last total of each node before the window is its baseline
+    last_day = (
+        session.query(DailyUsage.nodeId, func.max(DailyUsage.day).label("day"))
+        .filter(DailyUsage.typeId == type_id, DailyUsage.day < start_date)
+        .group_by(DailyUsage.nodeId)
+        .subquery()
+    )
+    baseline = dict(
+        session.query(DailyUsage.nodeId, DailyUsage.lastValue)
+        .join(
+            last_day,
+            and_(
+                DailyUsage.nodeId == last_day.c.nodeId,
+                DailyUsage.day == last_day.c.day,
+            ),
+        )
+        .filter(DailyUsage.typeId == type_id)
+        .all()
     )
+    start = datetime.combine(start_date, datetime.min.time())
+    end = datetime.combine(end_date, datetime.max.time())
+    rows = (
+        session.query(Reading.nodeId, Reading.time, Reading.value)
+        .filter(
+            Reading.typeId == type_id,
+            Reading.time >= start,
+            Reading.time <= end,
+        )
+        .all()
+    )
+    nodes, times, values = zip(*rows) if rows else ((), (), ())
+    return counter_usage(nodes, times, values, start, end, "hour", baseline)
 
 
 @main_bp.route("/electricity-usage")
+@conditional_page
+@cached_view()
 def electricity_usage():
+    """Consumption measured by a cumulative meter (electricity by default)
+
+    Query parameters: ``typ`` (a counter sensor type), ``period`` and
+    ``by`` (hour, day or week).
+    """
     period = request.args.get("period", "week")
     if period not in _PERIOD_LOOKUP:
         period = "week"
     total_days = _PERIOD_LOOKUP[period]
+    type_id = request.args.get("typ", _ELECTRICITY_SENSOR_TYPE, type=int)
+    if type_id not in COUNTER_TYPES:
+        type_id = _ELECTRICITY_SENSOR_TYPE
+    formats = {key: fmt for key, _, fmt in _RESOLUTION_DEFINITIONS}
+    resolution = request.args.get("by", "day")
+    if resolution not in formats or (
+        resolution == "hour" and total_days > _HOURLY_MAX_DAYS
+    ):
+        resolution = "day"
 
     now = datetime.now(UTC)
     end_date = now.date()
     start_date = end_date - timedelta(days=total_days - 1)
-    start_dt = datetime.combine(start_date, time.min).replace(tzinfo=None)
-    end_dt = datetime.combine(end_date, time.max).replace(tzinfo=None)
 
     with Session() as session:
-        sensor_info = (
-            session.query(SensorType.name, SensorType.units)
-            .filter(SensorType.id == _ELECTRICITY_SENSOR_TYPE)
-            .one_or_none()
-        )
-        rows = (
-            session.query(Reading.time, Reading.nodeId, Reading.value)
-            .filter(
-                Reading.typeId == _ELECTRICITY_SENSOR_TYPE,
-                Reading.time >= start_dt,
-                Reading.time <= end_dt,
-            )
-            .order_by(Reading.nodeId, Reading.time)
+        counter_types = (
+            session.query(SensorType.id, SensorType.name, SensorType.units)
+            .filter(SensorType.id.in_(COUNTER_TYPES))
+            .order_by(SensorType.id)
             .all()
         )
+        usage = _counter_breakdown(session, type_id, start_date, end_date, resolution)
+        places = {
+            node_id: (house, room)
+            for node_id, house, room in session.query(Node.id, House.address, Room.name)
+            .outerjoin(Location, Node.locationId == Location.id)
+            .outerjoin(House, Location.houseId == House.id)
+            .outerjoin(Room, Location.roomId == Room.id)
+            .filter(Node.id.in_(usage.nodes))
+        }
 
-    date_list = [start_date + timedelta(days=i) for i in range(total_days)]
-    usage_by_day = {date: 0.0 for date in date_list}
-    last_value_by_node = {}
-    for reading_time, node_id, value in rows:
-        if reading_time is None or value is None:
-            continue
-        if isinstance(reading_time, str):
-            try:
-                reading_dt = datetime.fromisoformat(reading_time)
-            except ValueError:
-                continue
-        elif hasattr(reading_time, "date"):
-            reading_dt = reading_time
-        else:
-            continue
-
-        day_key = reading_dt.date()
-        if day_key not in usage_by_day:
-            usage_by_day[day_key] = 0.0
-
-        try:
-            current_value = float(value)
-        except (TypeError, ValueError):
-            continue
-
-        previous_value = last_value_by_node.get(node_id)
-        if previous_value is None:
-            last_value_by_node[node_id] = current_value
-            continue
-
-        delta = current_value - previous_value
-        if delta < 0:
-            usage = current_value if current_value >= 0 else 0.0
-        else:
-            usage = delta
-
-        usage_by_day[day_key] = usage_by_day.get(day_key, 0.0) + usage
-        last_value_by_node[node_id] = current_value
-
-    chart_labels = [d.strftime("%Y-%m-%d") for d in date_list]
-    chart_values = [round(usage_by_day.get(d, 0.0), 3) for d in date_list]
+    sensor_info = {t: (name, units) for t, name, units in counter_types}.get(type_id)
+    chart_labels = [s.strftime(formats[resolution]) for s in usage.starts]
+    chart_values = [round(v, 3) for v in usage.total.tolist()]
     total_usage = round(sum(chart_values), 3)
     sensor_name = sensor_info[0] if sensor_info else "Opti Smart Count"
     sensor_units = sensor_info[1] if sensor_info and sensor_info[1] else "units"
     has_data = any(value > 0 for value in chart_values)
+    node_usage = [
+        {
+            "node": node_id,
+            "house": places.get(node_id, (None, None))[0],
+            "room": places.get(node_id, (None, None))[1],
+            "usage": f"{used:.2f}",
+        }
+        for node_id, used in usage.node_totals().items()
+    ]
 
     period_labels = {key: label for key, label, _ in _PERIOD_DEFINITIONS}
 
@@ -315,9 +271,14 @@ def electricity_usage():
         period=period,
         period_label=period_labels[period],
         period_definitions=_PERIOD_DEFINITIONS,
+        resolution=resolution,
+        resolution_definitions=_RESOLUTION_DEFINITIONS,
+        type_id=type_id,
+        counter_types=counter_types,
         chart_labels=chart_labels,
         chart_values=chart_values,
         total_usage=f"{total_usage:.2f}",
+        node_usage=node_usage,
         sensor_name=sensor_name,
         sensor_units=sensor_units,
         has_data=has_data,
@@ -327,6 +288,8 @@ def electricity_usage():
 
 
 @main_bp.route("/lowbat")
+@conditional_page
+@cached_view()
 def lowbat():
     """List nodes with low battery voltage."""
     batlvl = request.args.get("bat", "2.6")
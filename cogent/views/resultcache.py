@@ -0,0 +1,277 @@
+"""Result cache shared between gunicorn workers.
+
+Expensive pages such as ``/yield24`` and ``/currentValues`` are computed
+once and shared by every worker on the host.  Entries live in a SQLite file
+(in ``/dev/shm`` by default, so in memory) and are keyed by the route, the
+normalised query arguments and the data version (see
+:mod:`cogent.base.model.dataversion`), so new data invalidates them without
+any explicit purge.  Each entry also has a time to live, and the least
+recently used entries are evicted beyond ``CH_RESULT_CACHE_ENTRIES``.
+
+Population is single-flight: the first worker to miss an entry takes a
+lease on it and computes it while other workers poll for the result.  If
+the lease holder takes longer than its lease another worker takes the lease
+over, so a stuck or killed worker cannot hold up the page.
+
+A view opts in with :func:`cached_view`.  The cache is only an
+optimisation; any error reading or writing it is logged and the result
+computed as normal.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from cogent.base.model import meta
+
+from .http import request_data_version
+
+LOG = logging.getLogger(__name__)
+
+PATH_ENV_VAR = "CH_RESULT_CACHE"
+ENTRIES_ENV_VAR = "CH_RESULT_CACHE_ENTRIES"
+
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_TTL = 60.0
+# longest a worker may hold the lease on an entry it is computing
+DEFAULT_LEASE = 30.0
+# how often workers waiting for an entry check for it
+_POLL = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+);
+"""
+
+
+def _default_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "cogent-results.sqlite")
+
+
+class _Miss:
+    def __repr__(self):
+        return "MISS"
+
+
+#: returned by :meth:`ResultCache.get` when there is no usable entry
+MISS = _Miss()
+
+
+class ResultCache:
+    """SQLite file of pickled results keyed by request parameters
+
+    :param path: the SQLite file (created if missing)
+    :param max_entries: approximate bound on the number of entries kept
+    :param lease: seconds a worker may spend computing an entry before
+        others stop waiting for it
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        lease: float = DEFAULT_LEASE,
+    ) -> None:
+        self.path = path or _default_path()
+        self.max_entries = max_entries
+        self.lease = lease
+        try:
+            with closing(self._connect()) as db:
+                db.executescript(_SCHEMA)
+        except sqlite3.Error:
+            LOG.exception("Unable to create result cache %s", self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # a connection per call keeps the cache safe across threads and forks
+        db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=OFF")
+        return db
+
+    @staticmethod
+    def key(*parts: object) -> str:
+        """Return a key for the given parameters"""
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def get(self, key: str, version: str):
+        """Return the value stored for ``key`` at ``version``, or
+        :data:`MISS` if there is none or it has expired"""
+        now = time.time()
+        try:
+            with closing(self._connect()) as db:
+                row = db.execute(
+                    "SELECT value FROM entries"
+                    " WHERE key = ? AND version = ? AND expires > ?",
+                    (key, version, now),
+                ).fetchone()
+                if row is None:
+                    return MISS
+                db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            return pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError):
+            LOG.exception("Unable to read result cache entry %s", key)
+            return MISS
+
+    def put(self, key: str, version: str, value, ttl: float = DEFAULT_TTL) -> None:
+        """Store ``value`` for ``key`` at ``version`` for ``ttl`` seconds,
+        evicting expired and least recently used entries"""
+        now = time.time()
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            with closing(self._connect()) as db:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (key, version, now + ttl, now, data),
+                )
+                db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+                db.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    " SELECT key FROM entries ORDER BY accessed DESC"
+                    " LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                db.execute("COMMIT")
+        except (sqlite3.Error, pickle.PicklingError):
+            LOG.exception("Unable to write result cache entry %s", key)
+
+    def _acquire(self, key: str) -> bool:
+        """Take the lease on ``key`` unless another worker holds it"""
+        now = time.time()
+        try:
+            with closing(self._connect()) as db:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute(
+                    "DELETE FROM leases WHERE key = ? AND expires <= ?", (key, now)
+                )
+                taken = db.execute(
+                    "INSERT OR IGNORE INTO leases VALUES (?, ?)",
+                    (key, now + self.lease),
+                ).rowcount
+                db.execute("COMMIT")
+            return taken == 1
+        except sqlite3.Error:
+            LOG.exception("Unable to take result cache lease %s", key)
+            return True
+
+    def _release(self, key: str) -> None:
+        try:
+            with closing(self._connect()) as db:
+                db.execute("DELETE FROM leases WHERE key = ?", (key,))
+        except sqlite3.Error:
+            LOG.exception("Unable to release result cache lease %s", key)
+
+    def get_or_compute(self, key: str, version: str, compute, ttl: float = DEFAULT_TTL):
+        """Return the value for ``key`` at ``version``, calling ``compute``
+        to produce and store it if needed
+
+        Only one caller at a time computes a given key; the others wait for
+        its result, taking over once its lease lapses, and compute it
+        themselves if they have waited for twice the lease.
+        """
+        value = self.get(key, version)
+        if value is not MISS:
+            return value
+        # a stuck holder's lease lapses after self.lease and is taken over;
+        # only give up if other workers keep winning it
+        deadline = time.monotonic() + 2 * self.lease
+        while not self._acquire(key):
+            time.sleep(_POLL)
+            value = self.get(key, version)
+            if value is not MISS:
+                return value
+            if time.monotonic() > deadline:
+                LOG.warning("Gave up waiting for result cache entry %s", key)
+                return compute()
+        try:
+            # another worker may have stored it while we took the lease
+            value = self.get(key, version)
+            if value is MISS:
+                value = compute()
+                self.put(key, version, value, ttl)
+            return value
+        finally:
+            self._release(key)
+
+
+_CACHE: ResultCache | None = None
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide :class:`ResultCache` configured from the
+    environment"""
+    global _CACHE
+    path = os.environ.get(PATH_ENV_VAR) or None
+    if _CACHE is None or (path and _CACHE.path != path):
+        try:
+            max_entries = int(os.environ.get(ENTRIES_ENV_VAR, DEFAULT_MAX_ENTRIES))
+        except ValueError:
+            max_entries = DEFAULT_MAX_ENTRIES
+        _CACHE = ResultCache(path, max_entries=max_entries)
+    return _CACHE
+
+
+def cached_view(ttl: float = DEFAULT_TTL):
+    """Decorate a view to share its successful responses between workers
+
+    Responses are keyed by the database, the endpoint, the query arguments
+    in sorted order and the data version, and kept for at most ``ttl``
+    seconds (pages that depend on the current time need a short one).
+    """
+
+    def decorate(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = ResultCache.key(
+                str(meta.engine.url),
+                request.endpoint,
+                sorted(kwargs.items()),
+                sorted(request.args.items(multi=True)),
+            )
+
+            def compute():
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    raise _Uncacheable(response)
+                return response.mimetype, response.get_data()
+
+            try:
+                mimetype, data = get_result_cache().get_or_compute(
+                    key, request_data_version()[0], compute, ttl
+                )
+            except _Uncacheable as exc:
+                return exc.response
+            return Response(data, mimetype=mimetype)
+
+        return wrapper
+
+    return decorate
+
+
+class _Uncacheable(Exception):
+    """Raised to pass a response that must not be cached back to the view"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
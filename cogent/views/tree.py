@@ -1,12 +1,15 @@
+import hashlib
 from datetime import UTC, datetime, timedelta
 
 from flask import Blueprint, Response, render_template, request
-from sqlalchemy import and_, func
+from sqlalchemy import func
 
-from cogent.base.model import Location, Node, NodeState, Room, Session
+from cogent.base.model import HourlyLink, Location, Node, Room, Session
 
 from .graph.constants import _periods
+from .graph.plotcache import PlotCache, get_plot_cache
 from .graph.utils import _mins
+from .http import not_modified, not_modified_response, set_validators
 
 try:
     from graphviz import Digraph
@@ -19,8 +22,40 @@ _CONTENT_TEXT = "text/plain"
 tree_bp = Blueprint("tree", __name__)
 
 
+def _links(session, since):
+    """RSSI statistics of each (node, parent) link since the start of the
+    hour containing ``since``"""
+    hour = since.replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    return (
+        session.query(
+            HourlyLink.nodeId,
+            Location.houseId,
+            Room.name,
+            HourlyLink.parent,
+            func.sum(HourlyLink.rssiSum),
+            func.sum(HourlyLink.rssiCount),
+            func.min(HourlyLink.rssiMin),
+            func.max(HourlyLink.rssiMax),
+        )
+        .join(Node, HourlyLink.nodeId == Node.id)
+        .join(Location, Node.locationId == Location.id)
+        .join(Room, Location.roomId == Room.id)
+        .filter(HourlyLink.hour >= hour, HourlyLink.parent != 65535)
+        .group_by(HourlyLink.nodeId, Location.houseId, Room.name, HourlyLink.parent)
+        .order_by(HourlyLink.nodeId, HourlyLink.parent)
+        .all()
+    )
+
+
 @tree_bp.route("/tree")
 def tree():
+    """Network tree as SVG, labelling each link with its mean RSSI
+
+    The SVG is cached per period and only re-rendered by ``dot`` when the
+    graph source changes: the topology, a mean RSSI to one decimal place or
+    an RSSI range.  Packet counts change with every packet, so they are
+    left out of the source.
+    """
     if Digraph is None:  # pragma: no cover
         raise RuntimeError("graphviz is required to render network tree")
 
@@ -30,37 +65,40 @@ def tree():
     t = datetime.now(UTC) - timedelta(minutes=mins)
 
     with Session() as session:
-        dot = Digraph(format="svg")
-        dot.attr(rankdir="LR")
-        seen_nodes = set()
-        qry = (
-            session.query(
-                NodeState.nodeId,
-                Location.houseId,
-                Room.name,
-                NodeState.parent,
-                func.avg(NodeState.rssi),
+        links = _links(session, t)
+
+    dot = Digraph(format="svg")
+    dot.attr(rankdir="LR")
+    seen_nodes = set()
+    for ni, hi, rm, pa, rssi_sum, rssi_count, rssi_min, rssi_max in links:
+        if rssi_count:
+            dot.edge(
+                str(ni),
+                str(pa),
+                label=f"{rssi_sum / rssi_count:.1f}",
+                tooltip=f"RSSI {rssi_min} to {rssi_max}",
             )
-            .join(Node, NodeState.nodeId == Node.id)
-            .join(Location, Node.locationId == Location.id)
-            .join(Room, Location.roomId == Room.id)
-            .group_by(NodeState.nodeId, NodeState.parent)
-            .filter(and_(NodeState.time > t, NodeState.parent != 65535))
-        )
-        for ni, hi, rm, pa, rssi in qry:
-            dot.edge(str(ni), str(pa), label=f"{float(rssi)}")
-            if ni not in seen_nodes:
-                seen_nodes.add(ni)
-                dot.node(str(ni), label=f"{ni}:{hi}:{rm}")
+        else:
+            dot.edge(str(ni), str(pa))
+        if ni not in seen_nodes:
+            seen_nodes.add(ni)
+            dot.node(str(ni), label=f"{ni}:{hi}:{rm}")
 
-    if debug != "y":
+    if debug == "y":
+        return Response(dot.source.encode(), mimetype=_CONTENT_TEXT)
+
+    version = hashlib.sha1(dot.source.encode()).hexdigest()
+    if not_modified(version):
+        return not_modified_response(version)
+    cache = get_plot_cache()
+    key = PlotCache.key("tree", period)
+    entry = cache.get(key, version)
+    if entry is None:
         output = dot.pipe(format="svg")
-        mimetype = _CONTENT_SVG
+        cache.put(key, version, _CONTENT_SVG, output)
     else:
-        output = dot.source.encode()
-        mimetype = _CONTENT_TEXT
-
-    return Response(output, mimetype=mimetype)
+        output = entry.data
+    return set_validators(Response(output, mimetype=_CONTENT_SVG), version)
 
 
 @tree_bp.route("/treePage")
@@ -0,0 +1,48 @@
+"""Fixtures shared by the tests that run the web application.
+
+``db_engine`` is an empty database in the test's temporary directory which
+the application created by :func:`cogent.create_app` connects to, with the
+plot cache alongside it.  ``house_engine`` adds the house, room and location
+(all id 400) that most view tests hang their nodes on.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+
+from cogent.base.model import (
+    Base,
+    House,
+    Location,
+    Room,
+    Session,
+    init_data,
+    init_model,
+)
+
+HOUSE = 400
+
+
+@pytest.fixture
+def db_engine(monkeypatch, tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(db_url)
+    init_model(engine)
+    Base.metadata.create_all(engine)
+    init_data()
+    monkeypatch.setenv("CH_DBURL", db_url)
+    monkeypatch.setenv("CH_PLOT_CACHE_DIR", str(tmp_path / "plots"))
+    return engine
+
+
+@pytest.fixture
+def house_engine(db_engine):
+    with Session(db_engine) as session:
+        session.add_all(
+            [
+                House(id=HOUSE, address="House A"),
+                Room(id=HOUSE, name="Kitchen"),
+                Location(id=HOUSE, houseId=HOUSE, roomId=HOUSE),
+            ]
+        )
+        session.commit()
+    return db_engine
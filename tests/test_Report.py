@@ -17,6 +17,7 @@ from cogent.base.model import (
     Session,
     init_model,
 )
+from cogent.base.model.hourlyyield import backfill_yield
 from cogent.report import ccYield, lowBat, packetYield
 
 from . import base
@@ -38,6 +39,7 @@ class TestReport(base.BaseTestCase):
         session = cls.Session()
         session.execute(text("DELETE FROM Node"))
         session.execute(text("DELETE FROM NodeState"))
+        session.execute(text("DELETE FROM HourlyYield"))
         session.execute(text("DELETE FROM House"))
         session.execute(text("DELETE FROM Room"))
         session.execute(text("DELETE FROM Location"))
@@ -52,6 +54,7 @@ class TestReport(base.BaseTestCase):
         session = cls.Session()
         session.execute(text("DELETE FROM Node"))
         session.execute(text("DELETE FROM NodeState"))
+        session.execute(text("DELETE FROM HourlyYield"))
         session.execute(text("DELETE FROM House"))
         session.execute(text("DELETE FROM Room"))
         session.execute(text("DELETE FROM Location"))
@@ -175,6 +178,7 @@ def initDb():
                 s.add(NodeState(time=t, nodeId=24, parent=0, localtime=0, seq_num=i))
             t = t + datetime.timedelta(minutes=5)
 
+        backfill_yield(s)
         s.commit()
         # print "Object Creation Successfull"
     finally:
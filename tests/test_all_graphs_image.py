@@ -0,0 +1,88 @@
+import xml.etree.ElementTree as ET
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import event
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    NodeState,
+    Reading,
+    SensorType,
+    Session,
+)
+from cogent.base.model.nodeavailability import record_availability
+from cogent.views.graph.graph import _node_charts, _spline_chart
+
+SVG = "{http://www.w3.org/2000/svg}"
+NODES = (41, 42, 43)
+
+
+def _setup(engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(engine) as session:
+        session.add_all([])
+        session.add_all(Node(id=n, locationId=400) for n in NODES)
+        session.get(SensorType, 0).active = True
+        for n in NODES:
+            for i in range(1, 30):
+                t = now - timedelta(minutes=30 * i)
+                session.add_all(
+                    [
+                        Reading(time=t, nodeId=n, typeId=4, value=n + i),
+                        Reading(time=t, nodeId=n, typeId=0, value=20.0 + i % 3),
+                        Reading(time=t, nodeId=n, typeId=1, value=0.001),
+                        NodeState(time=t, nodeId=n, parent=0, localtime=0, seq_num=i),
+                    ]
+                )
+            record_availability(session, n, [0, 4], now - timedelta(minutes=30))
+        session.commit()
+    return engine
+
+
+def test_node_charts_batch_queries(house_engine):
+    engine = _setup(house_engine)
+    end = datetime.now(UTC).replace(tzinfo=None)
+    start = end - timedelta(days=1)
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as session:
+        charts = _node_charts(session, list(NODES), 4, start, end, "bo")
+        assert [len(charts[n].points_x) for n in NODES] == [29, 29, 29]
+        assert charts[42].points_y[0] == 42 + 29
+        raw_queries = len(statements)
+
+        statements.clear()
+        splines = _node_charts(session, list(NODES), 0, start, end, "bo")
+    assert raw_queries <= 3
+    assert len(statements) <= 4
+    # the batch reconstruction matches the per-node one
+    expected = _spline_chart(41, 0, 1, start, end, splines[41].y_label, "bo")
+    assert splines[41] == expected
+
+
+def test_all_graphs_image(house_engine):
+    _setup(house_engine)
+    client = create_app().test_client()
+
+    page = client.get("/allGraphs?typ=0&period=day")
+    assert page.data.count(b"<area ") == 3
+    assert b"/allGraphsImage?typ=0" in page.data
+
+    svg = client.get("/allGraphsImage?typ=0&period=day&format=svg")
+    assert svg.mimetype == "image/svg+xml"
+    root = ET.fromstring(svg.data)
+    assert root.get("height") == "750"
+    texts = [e.text for e in root.iter(SVG + "text")]
+    assert "House A: Kitchen (41)" in texts
+
+    png = client.get("/allGraphsImage?typ=4&period=day")
+    assert png.mimetype == "image/png"
+    assert png.data.startswith(b"\x89PNG")
+    revalidate = client.get(
+        "/allGraphsImage?typ=4&period=day",
+        headers={"If-None-Match": png.headers["ETag"]},
+    )
+    assert revalidate.status_code == 304
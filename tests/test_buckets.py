@@ -0,0 +1,77 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+
+from cogent import create_app
+from cogent.base.model import Reading, Session
+from cogent.base.model.nodeavailability import record_availability
+from cogent.views.graph.buckets import bucketed_readings, envelope, epoch_bucket
+
+T0 = datetime(2024, 1, 1)
+
+
+def test_mysql_bucket_expression():
+    sql = str(
+        select(epoch_bucket(Reading.time, 3600, "mysql")).compile(
+            dialect=mysql.dialect()
+        )
+    )
+    assert "timestampdiff(SECOND" in sql
+    assert "DIV" in sql
+
+
+def test_bucketed_readings(db_engine):
+    with Session(db_engine) as session:
+        # readings every 5 minutes for 3 hours
+        session.add_all(
+            Reading(time=T0 + timedelta(minutes=5 * i), nodeId=7, typeId=4, value=i)
+            for i in range(36)
+        )
+        session.add(Reading(time=T0, nodeId=8, typeId=4, value=100.0))
+        session.commit()
+
+        buckets = bucketed_readings(
+            session, 7, 4, T0, T0 + timedelta(hours=3), seconds=3600
+        )
+        assert [b.start for b in buckets] == [T0 + timedelta(hours=h) for h in range(3)]
+        first = buckets[0]
+        assert first.samples == 12
+        assert (first.minimum, first.maximum, first.last) == (0, 11, 11)
+        assert first.mean == 5.5
+        assert first.last_time == T0 + timedelta(minutes=55)
+        assert buckets[2].last == 35
+
+        points = envelope(buckets, 3600)
+        assert len(points) == 6
+        assert points[0] == (T0 + timedelta(minutes=30), 0)
+        assert points[1] == (T0 + timedelta(minutes=30), 11)
+
+
+def test_long_period_is_aggregated(db_engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(db_engine) as session:
+        # hourly readings for most of a year, with a single spike
+        session.add_all(
+            Reading(
+                time=now - timedelta(hours=i),
+                nodeId=31,
+                typeId=4,
+                value=90.0 if i == 4000 else 20.0,
+            )
+            for i in range(1, 8000)
+        )
+        record_availability(session, 31, [4], now - timedelta(hours=1))
+        session.commit()
+    client = create_app().test_client()
+
+    body = client.get("/api/series?node=31&typ=4&period=year").get_json()
+    assert 0 < len(body["points"]) <= 100
+    assert len(body["buckets"]) <= 51
+    assert sum(b[5] for b in body["buckets"]) == 7999
+    assert max(p[1] for p in body["points"]) == 90.0
+
+    debug = client.get(
+        f"/plot?node=31&typ=4&minsago={365 * 1440}&duration=525600&debug=1"
+    )
+    assert b"90.0" in debug.data
@@ -0,0 +1,119 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import event
+
+from cogent import create_app
+from cogent.base.model import (
+    House,
+    Location,
+    Node,
+    NodeState,
+    Reading,
+    Room,
+    Session,
+)
+from cogent.base.model.nodeavailability import record_availability
+from cogent.views.graph.graph import _compare_values
+from cogent.views.graph.multiseries import grid_means, time_grid
+
+# node id -> room
+NODES = {71: "Kitchen", 72: "Bedroom", 73: "Attic"}
+
+
+def _setup(engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(engine) as session:
+        session.add(House(id=400, address="House A"))
+        for i, (node_id, room) in enumerate(NODES.items()):
+            session.add_all(
+                [
+                    Room(id=400 + i, name=room),
+                    Location(id=400 + i, houseId=400, roomId=400 + i),
+                    Node(id=node_id, locationId=400 + i),
+                ]
+            )
+        for node_id in NODES:
+            for i in range(1, 150):
+                t = now - timedelta(minutes=10 * i)
+                session.add_all(
+                    [
+                        Reading(time=t, nodeId=node_id, typeId=4, value=node_id),
+                        Reading(time=t, nodeId=node_id, typeId=0, value=20.0),
+                        Reading(time=t, nodeId=node_id, typeId=1, value=0.0),
+                        NodeState(
+                            time=t, nodeId=node_id, parent=0, localtime=0, seq_num=i
+                        ),
+                    ]
+                )
+            record_availability(session, node_id, [0, 4], now - timedelta(minutes=10))
+        session.commit()
+    return engine, now
+
+
+def test_grid_means():
+    start = datetime(2024, 1, 1)
+    step, grid = time_grid(start, start + timedelta(hours=1), 6)
+    assert step == 600
+    assert grid[0] == start and len(grid) == 7
+    times = [start + timedelta(minutes=m) for m in (1, 2, 25, 200)]
+    assert grid_means(times, [1.0, 3.0, None, 9.0], grid, step) == [
+        2.0,
+        None,
+        None,
+        None,
+        None,
+        None,
+        None,
+    ]
+
+
+def test_compare_values_one_query(db_engine):
+    engine, now = _setup(db_engine)
+    start, end = now - timedelta(hours=12), now
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as session:
+        step, grid, values = _compare_values(
+            session, list(NODES), 4, start, end, False, 24
+        )
+        assert len(statements) == 1
+        assert step == 1800
+        for node_id in NODES:
+            assert len(values[node_id]) == len(grid)
+            assert {v for v in values[node_id] if v is not None} == {node_id}
+
+        statements.clear()
+        _, _, sip = _compare_values(session, list(NODES), 0, start, end, False, 24)
+        assert len(statements) == 3
+        assert all(abs(v - 20.0) < 1e-6 for v in sip[72] if v is not None)
+        assert sum(v is not None for v in sip[72]) >= 20
+
+
+def test_compare_endpoint(db_engine):
+    _setup(db_engine)
+    client = create_app().test_client()
+    response = client.get("/api/compare?house=400&typ=4&period=day&points=48")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [n["room"] for n in body["nodes"]] == ["Attic", "Bedroom", "Kitchen"]
+    assert len(body["values"]) == 3
+    assert all(len(v) == len(body["times"]) for v in body["values"])
+    assert [c["label"] for c in body["table"]["cols"]][1:] == [
+        "House A: Attic (73)",
+        "House A: Bedroom (72)",
+        "House A: Kitchen (71)",
+    ]
+    assert len(body["table"]["rows"]) == len(body["times"])
+
+    chosen = client.get("/api/compare?node=72&node=71&typ=4").get_json()
+    assert [n["node_id"] for n in chosen["nodes"]] == [71, 72]
+    assert client.get("/api/compare?typ=4").status_code == 404
+
+    # long windows are aggregated by the database onto the same kind of grid
+    year = client.get("/api/compare?house=400&typ=4&period=year").get_json()
+    assert year["step_seconds"] > 86400
+    kitchen = year["values"][2]
+    assert len(kitchen) == len(year["times"])
+    assert {v for v in kitchen if v is not None} == {71}
@@ -0,0 +1,68 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from cogent.base.counters import (
+    bucket_usage,
+    counter_step,
+    counter_usage,
+    reading_usage,
+)
+
+T0 = datetime(2024, 1, 1)  # a Monday
+
+
+def test_reading_usage_sorts_and_handles_resets():
+    hours = [3, 0, 1, 2, 0, 1]
+    nodes, times, values, usage = reading_usage(
+        [1, 1, 1, 1, 2, 2],
+        [T0 + timedelta(hours=h) for h in hours],
+        [5.0, 100.0, 110.0, None, 7.0, 9.0],
+    )
+    assert nodes.tolist() == [1, 1, 1, 2, 2]
+    assert values.tolist() == [100.0, 110.0, 5.0, 7.0, 9.0]
+    # the reset counts in full, and each node starts from its first reading
+    assert usage.tolist() == [0.0, 10.0, 5.0, 0.0, 2.0]
+    assert usage.tolist()[2] == counter_step(110.0, 5.0)
+
+    _, _, _, usage = reading_usage([1, 2], [T0, T0], [104.0, 1.0], {1: 100.0})
+    assert usage.tolist() == [4.0, 0.0]
+
+
+def test_usage_per_hour_day_and_week():
+    # node 1 is silent for a day; what it used over the gap lands on the
+    # reading that ends it
+    readings = [
+        (1, T0, 0.0),
+        (1, T0 + timedelta(hours=1, minutes=30), 3.0),
+        (1, T0 + timedelta(days=1, hours=2), 10.0),
+        (2, T0 + timedelta(hours=1), 50.0),
+        (2, T0 + timedelta(days=7), 52.0),
+    ]
+    nodes, times, values = zip(*readings)
+    hourly = counter_usage(
+        nodes, times, values, T0, T0 + timedelta(hours=23, minutes=59), "hour"
+    )
+    assert len(hourly.starts) == 24
+    assert hourly.starts[1] == T0 + timedelta(hours=1)
+    assert hourly.nodes == [1, 2]
+    assert hourly.by_node[0].tolist()[:3] == [0.0, 3.0, 0.0]
+    assert hourly.total.sum() == 3.0
+
+    daily = counter_usage(nodes, times, values, date(2024, 1, 1), date(2024, 1, 3))
+    assert daily.starts == [T0, T0 + timedelta(days=1), T0 + timedelta(days=2)]
+    assert daily.total.tolist() == [3.0, 7.0, 0.0]
+
+    weekly = counter_usage(
+        nodes, times, values, date(2024, 1, 3), date(2024, 1, 10), "week"
+    )
+    assert weekly.starts == [T0, T0 + timedelta(weeks=1)]
+    assert weekly.node_totals() == {1: 10.0, 2: 2.0}
+    assert weekly.by_node.tolist() == [[10.0, 0.0], [0.0, 2.0]]
+
+
+def test_bucket_usage_of_daily_totals():
+    days = [date(2024, 1, 1), date(2024, 1, 2), date(2023, 12, 31)]
+    usage = bucket_usage([3, 3, 3], days, [1.0, 2.0, 4.0], T0, T0, "day")
+    assert usage.nodes == [3]
+    assert np.array_equal(usage.total, [1.0])
@@ -0,0 +1,57 @@
+from datetime import date, datetime, timedelta
+
+from cogent.base.model import (
+    DailyUsage,
+    Reading,
+    Session,
+)
+from cogent.base.model.dailyusage import backfill_usage, record_usage
+
+T0 = datetime(2024, 1, 2, 20)
+# hours after T0 and counter values, including a reset on the second day
+READINGS = [(0, 100.0), (3, 130.0), (5, 160.0), (26, 20.0), (30, 50.0), (52, 80.0)]
+
+
+def _log(session, hours, value):
+    when = T0 + timedelta(hours=hours)
+    session.add(Reading(time=when, nodeId=9, typeId=40, value=value))
+    session.flush()
+    record_usage(session, 9, {40: value, 0: 21.5}, when)
+    session.commit()
+
+
+def _usage(session):
+    return [
+        (row.day, row.used, row.readings)
+        for row in session.query(DailyUsage).order_by(DailyUsage.day)
+    ]
+
+
+def test_record_usage_matches_backfill(db_engine):
+    with Session(db_engine) as session:
+        for hours, value in READINGS:
+            _log(session, hours, value)
+        recorded = _usage(session)
+        assert backfill_usage(session) == len(recorded)
+        session.commit()
+        assert _usage(session) == recorded
+    # 100 is the baseline, and 20 after the reset counts in full
+    assert [(d, u) for (d, u, _) in recorded] == [
+        (date(2024, 1, 2), 30.0),
+        (date(2024, 1, 3), 50.0),
+        (date(2024, 1, 4), 30.0),
+        (date(2024, 1, 5), 30.0),
+    ]
+    assert [n for (_, _, n) in recorded] == [2, 2, 1, 1]
+
+
+def test_out_of_order_reading_rebuilds_days(db_engine):
+    with Session(db_engine) as session:
+        for hours, value in READINGS[:3] + READINGS[4:]:
+            _log(session, hours, value)
+        # the reset reading arrives late
+        _log(session, *READINGS[3])
+        late = _usage(session)
+        backfill_usage(session)
+        session.commit()
+        assert late == _usage(session)
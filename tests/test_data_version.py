@@ -0,0 +1,113 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    Room,
+    Sensor,
+    Session,
+)
+from cogent.base.model.dataversion import INGEST, bump_version, data_version
+
+
+def _setup(engine):
+    with Session(engine) as session:
+        session.add(Node(id=61, locationId=400))
+        session.commit()
+    return engine
+
+
+def test_reference_edits_bump_version(house_engine):
+    engine = _setup(house_engine)
+    with Session(engine) as session:
+        version, changed = data_version(session)
+        assert version.startswith("reference:")
+        assert changed is not None
+
+        # loading or touching reference data without changing it is not an edit
+        room = session.get(Room, 400)
+        room.name = "Kitchen"
+        session.commit()
+        assert data_version(session)[0] == version
+
+        room.name = "Scullery"
+        session.commit()
+        edited = data_version(session)[0]
+        assert edited != version
+
+        bump_version(session, INGEST)
+        session.commit()
+        assert data_version(session)[0] not in (version, edited)
+
+
+def test_pages_answer_conditional_requests(monkeypatch, house_engine):
+    engine = _setup(house_engine)
+    # keep the time component of the validators fixed during the test
+    monkeypatch.setattr("cogent.views.http.PAGE_BUCKET", 10**9)
+    client = create_app().test_client()
+    first = client.get("/missing")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "Last-Modified" in first.headers
+
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(Engine, "before_cursor_execute", count)
+    try:
+        cached = client.get("/missing", headers={"If-None-Match": etag})
+    finally:
+        event.remove(Engine, "before_cursor_execute", count)
+    assert cached.status_code == 304
+    # only the watermark is read
+    assert len(statements) == 1
+    assert "DataVersion" in statements[0]
+
+    # other pages have their own validators
+    assert client.get("/lowbat").headers["ETag"] != etag
+
+    with Session(engine) as session:
+        bump_version(session, INGEST)
+        session.commit()
+    fresh = client.get("/missing", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+
+
+def test_calibration_edit_invalidates_graphs(monkeypatch, house_engine):
+    engine = _setup(house_engine)
+    with Session(engine) as session:
+        session.add(
+            Sensor(
+                id=400,
+                sensorTypeId=0,
+                nodeId=61,
+                calibrationSlope=1.0,
+                calibrationOffset=0.0,
+            )
+        )
+        session.commit()
+    renders = []
+
+    def fake_render(session, node_id, *args, **kwargs):
+        renders.append(node_id)
+        return ["image/png", b"png-%d" % len(renders)]
+
+    monkeypatch.setattr("cogent.views.graph.graph._render_graph_image", fake_render)
+    client = create_app().test_client()
+    urls = ["/plot?node=61&typ=0", "/api/series?node=61&typ=0"]
+    etags = [client.get(url).headers["ETag"] for url in urls]
+    for url, etag in zip(urls, etags):
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    with Session(engine) as session:
+        session.get(Sensor, 400).calibrationOffset = 0.5
+        session.commit()
+    for url, etag in zip(urls, etags):
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+    assert client.get(urls[0]).data == b"png-2"
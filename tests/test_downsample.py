@@ -0,0 +1,91 @@
+import math
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from cogent.views.graph.downsample import as_seconds, lttb, m4, select_indices
+
+START = datetime(2023, 1, 1)
+
+
+def _series(n, spike=None):
+    times = [START + timedelta(seconds=30 * i) for i in range(n)]
+    values = [20.0 + math.sin(i / 50.0) for i in range(n)]
+    if spike is not None:
+        values[spike] = 60.0
+    return times, values
+
+
+def test_as_seconds():
+    times = [START, START + timedelta(minutes=1)]
+    assert list(as_seconds(times) - as_seconds(times)[0]) == [0.0, 60.0]
+    assert list(as_seconds([1.5, 2.5])) == [1.5, 2.5]
+
+
+@pytest.mark.parametrize("mode", ["lttb", "m4"])
+def test_spike_is_kept(mode):
+    times, values = _series(5000, spike=3137)
+    result = select_indices(times, 100, values=values, mode=mode)
+    assert 3137 in result
+    assert len(result) <= 100
+    assert result == sorted(set(result))
+
+
+def test_m4_keeps_envelope():
+    rng = np.random.default_rng(1)
+    t = np.arange(10000, dtype=float)
+    y = rng.normal(size=10000)
+    indices = m4(t, y, 100)
+    assert len(indices) <= 100
+    assert int(np.argmin(y)) in indices
+    assert int(np.argmax(y)) in indices
+
+
+def test_lttb_skips_empty_buckets():
+    t = np.concatenate((np.arange(100.0), np.arange(1000.0, 1100.0)))
+    y = np.ones(200)
+    indices = lttb(t, y, 50)
+    assert indices[0] == 0
+    assert indices[-1] == 199
+    assert len(set(indices.tolist())) == len(indices)
+
+
+def test_priority_indices_kept_with_values():
+    times, values = _series(1000)
+    result = select_indices(times, 20, [500, 501, 2000], values=values)
+    assert {0, 500, 501, 999} <= set(result)
+    assert len(result) == 20
+
+
+@pytest.mark.parametrize("mode", ["lttb", "m4"])
+@pytest.mark.parametrize("spike", range(37, 5000, 97))
+def test_spike_is_kept_with_priorities(mode, spike):
+    times, values = _series(5000, spike=spike)
+    events = list(range(50, 5000, 125))
+    result = select_indices(times, 100, events, values=values, mode=mode)
+    assert spike in result
+    assert set(events) <= set(result)
+    assert len(result) <= 100
+
+
+def test_missing_values():
+    times, values = _series(1000)
+    values[10:20] = [None] * 10
+    for mode in ("lttb", "m4"):
+        assert len(select_indices(times, 50, values=values, mode=mode)) == 50
+
+
+def test_unknown_mode():
+    times, values = _series(100)
+    with pytest.raises(ValueError):
+        select_indices(times, 10, values=values, mode="bogus")
+
+
+def test_large_series_is_fast():
+    times, values = _series(200_000, spike=123_457)
+    started = time.perf_counter()
+    result = select_indices(times, 100, values=values)
+    assert time.perf_counter() - started < 2.0
+    assert 123_457 in result
@@ -15,6 +15,7 @@ from cogent.base.model import (
     init_data,
     init_model,
 )
+from cogent.base.model.dailyusage import backfill_usage
 
 
 class _FixedDateTime(datetime):
@@ -73,6 +74,7 @@ def test_electricity_usage_view(monkeypatch, tmp_path):
             start + timedelta(days=1, hours=23),
             210.0,
         )
+        backfill_usage(session)
         session.commit()
 
     monkeypatch.setenv("CH_DBURL", db_url)
@@ -114,6 +116,7 @@ def test_electricity_usage_handles_reset(monkeypatch, tmp_path):
         _make_reading(session, node.id, location.id, start, 200000.0)
         _make_reading(session, node.id, location.id, start + timedelta(hours=12), 0.0)
         _make_reading(session, node.id, location.id, start + timedelta(hours=23, minutes=59), 10000.0)
+        backfill_usage(session)
         session.commit()
 
     monkeypatch.setenv("CH_DBURL", db_url)
@@ -127,3 +130,47 @@ def test_electricity_usage_handles_reset(monkeypatch, tmp_path):
     assert b"Opti Smart Count usage" in response.data
     assert b"Total usage: <strong>10000.00</strong>" in response.data
     assert b"2023-01-01" in response.data
+
+
+def test_gas_usage_per_hour_and_node(monkeypatch, house_engine):
+    start = datetime(2023, 1, 6, tzinfo=timezone.utc)
+
+    with Session(house_engine) as session:
+        session.add_all(
+            [
+                Room(id=401, name="Loft"),
+                Location(id=401, houseId=400, roomId=401),
+                Node(id=400, locationId=400),
+                Node(id=401, locationId=401),
+            ]
+        )
+        for node_id, values in ((400, [10.0, 12.0, 15.0]), (401, [1.0, 0.5, 2.5])):
+            for hours, value in zip((0, 1, 5), values):
+                session.add(
+                    Reading(
+                        time=start + timedelta(hours=hours),
+                        nodeId=node_id,
+                        typeId=43,
+                        value=value,
+                    )
+                )
+        backfill_usage(session)
+        session.commit()
+
+    monkeypatch.setattr("cogent.views.main.datetime", _FixedDateTime)
+
+    client = create_app().test_client()
+    response = client.get("/electricity-usage?typ=43&by=hour")
+    assert response.status_code == 200
+    assert b"Gas Pulse Count usage" in response.data
+    # 2 + 3 on node 400 and 0.5 (after the reset) + 2 on node 401
+    assert b"Total usage: <strong>7.50</strong>" in response.data
+    assert b"2023-01-06 05:00" in response.data
+    assert b"<td>Loft</td>" in response.data
+    assert b"<td>2.50</td>" in response.data
+
+    weekly = client.get("/electricity-usage?typ=43&by=week&period=month")
+    assert b"Total usage: <strong>7.50</strong>" in weekly.data
+    # hourly charts are not drawn for long periods
+    yearly = client.get("/electricity-usage?typ=43&by=hour&period=year")
+    assert b"2023-01-06 05:00" not in yearly.data
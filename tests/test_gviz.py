@@ -0,0 +1,79 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from cogent.views.graph.gviz import gviz_json, iter_gviz_json, rows_gviz_json
+
+DESCRIPTION = [
+    ("Time", "datetime"),
+    ("Interpolated", "number"),
+    ("", "boolean", "", {"role": "certainty"}),
+    ("Event", "number"),
+    ("Note", "string"),
+]
+
+
+def _reference(description, data):
+    """The original dict-per-cell serializer"""
+    cols = []
+    for desc in description:
+        col = {"label": desc[0], "type": desc[1]}
+        for extra in desc[2:]:
+            if isinstance(extra, dict):
+                col.update(extra)
+        cols.append(col)
+
+    def conv(value, typ):
+        if typ == "datetime" and isinstance(value, datetime):
+            return "Date(%d,%d,%d,%d,%d,%d)" % (
+                value.year,
+                value.month - 1,
+                value.day,
+                value.hour,
+                value.minute,
+                value.second,
+            )
+        return value
+
+    rows = [
+        {"c": [{"v": conv(v, d[1])} for v, d in zip(row, description)]} for row in data
+    ]
+    return json.dumps({"cols": cols, "rows": rows})
+
+
+def _rows(n):
+    start = datetime(2023, 12, 31, 23, 58, 1, 500000)
+    return [
+        (
+            start + timedelta(seconds=61 * i),
+            [1.5 * i, float("nan"), None, 7, -0.0, 1e17, float("-inf")][i % 7],
+            i % 3 == 0,
+            None if i % 2 else i / 7,
+            ['a "quoted" note', "café", ""][i % 3],
+        )
+        for i in range(n)
+    ]
+
+
+def test_rows_match_json_dumps():
+    for n in (0, 1, 7, 50):
+        rows = _rows(n)
+        assert rows_gviz_json(DESCRIPTION, rows) == _reference(DESCRIPTION, rows)
+
+
+def test_columns_with_epoch_times_match():
+    rows = _rows(30)
+    columns = [list(c) for c in zip(*rows)]
+    epoch = datetime(1970, 1, 1)
+    columns[0] = np.array([(t - epoch).total_seconds() for t in columns[0]])
+    columns[3] = np.array(columns[3], dtype=object)
+    assert gviz_json(DESCRIPTION, columns) == _reference(DESCRIPTION, rows)
+
+
+def test_streaming_chunks_join_to_the_whole():
+    rows = _rows(25)
+    columns = list(zip(*rows))
+    chunks = list(iter_gviz_json(DESCRIPTION, columns, chunk_rows=4))
+    assert len(chunks) == 9
+    assert "".join(chunks) == _reference(DESCRIPTION, rows)
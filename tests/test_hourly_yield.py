@@ -0,0 +1,97 @@
+from datetime import UTC, datetime, timedelta
+
+from cogent import create_app
+from cogent.base.model import (
+    HourlyYield,
+    Node,
+    NodeState,
+    Session,
+)
+from cogent.base.model.hourlyyield import backfill_yield, record_yield, window_yields
+from cogent.sip.calc_yield import calc_missed_and_yield
+
+T0 = datetime(2024, 1, 2, 20, 30)
+NOW = datetime(2024, 1, 10, 12, 7, tzinfo=UTC)
+
+
+class _FixedDateTime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW.astimezone(tz) if tz else NOW.replace(tzinfo=None)
+
+
+def _packets():
+    """``(time, seq)`` every five minutes for a day, wrapping the sequence
+    number and dropping every seventh packet and a run of ten"""
+    packets = []
+    for i in range(288):
+        if i % 7 == 3 or 100 <= i < 110:
+            continue
+        packets.append((T0 + timedelta(minutes=5 * i), (200 + i) % 256))
+    return packets
+
+
+def _hours(session):
+    return [
+        (row.hour, row.packets, row.firstSeq, row.lastSeq, row.missed)
+        for row in session.query(HourlyYield).order_by(HourlyYield.hour)
+    ]
+
+
+def test_record_yield_matches_backfill_and_window(db_engine):
+    packets = _packets()
+    # replay a few packets out of order
+    order = packets[:40] + packets[45:60] + packets[40:45] + packets[60:]
+    with Session(db_engine) as session:
+        for when, seq in order:
+            session.add(NodeState(time=when, nodeId=9, parent=0, seq_num=seq))
+            record_yield(session, 9, seq, when.replace(tzinfo=UTC))
+            session.commit()
+        recorded = _hours(session)
+        assert backfill_yield(session) == len(recorded) == 25
+        session.commit()
+        assert _hours(session) == recorded
+
+        node_yield = window_yields(session, T0)[9]
+    missed, yld = calc_missed_and_yield(len(packets), packets[0][1], packets[-1][1])
+    assert node_yield.packets == len(packets)
+    assert (node_yield.minseq, node_yield.maxseq) == (packets[0][1], packets[-1][1])
+    assert node_yield.last == packets[-1][0]
+    assert node_yield.missed == missed == 288 - len(packets)
+    assert abs(node_yield.yld - yld) < 1e-9
+
+
+def test_yield24_page(monkeypatch, house_engine):
+    now = NOW.replace(tzinfo=None)
+    with Session(house_engine) as session:
+        session.add(Node(id=61, locationId=400))
+        # four of every five packets over the last three days
+        for i in range(1, 3 * 96):
+            if i % 5:
+                session.add(
+                    NodeState(
+                        time=now - timedelta(minutes=15 * i),
+                        nodeId=61,
+                        parent=0,
+                        seq_num=(1000 - i) % 256,
+                    )
+                )
+        backfill_yield(session)
+        session.commit()
+    monkeypatch.setattr("cogent.views.main.datetime", _FixedDateTime)
+
+    client = create_app().test_client()
+    day = client.get("/yield24")
+    assert day.status_code == 200
+    assert b"Yield for last day" in day.data
+    assert b"<td>Kitchen</td>" in day.data
+    # the window starts on the hour: 77 of the 96 packets since 12:00
+    assert b"<td>77</td>" in day.data
+    assert b"<td>80.21</td>" in day.data
+
+    week = client.get("/yield24?days=7&sort=msgcnt")
+    assert b"Yield for last 7 days" in week.data
+    # more than 256 packets, so the sequence numbers have wrapped
+    assert b"<td>230</td>" in week.data
+    assert b"<td>80.14</td>" in week.data
+    assert b"sort=last&amp;days=7" in week.data
@@ -14,10 +14,12 @@ from sqlalchemy import and_
 from cogent.base.logfromflat import PROCESSED_FILES, LogFromFlat
 from cogent.base.model import (
     Bitset,
+    DataVersion,
     Deployment,
     House,
     Location,
     Node,
+    NodeAvailability,
     NodeState,
     NodeType,
     Reading,
@@ -188,6 +190,12 @@ def test_store_state():
 
         assert nodestate.localtime == 643594668
 
+        availability = session.get(NodeAvailability, (28710, 0))
+        assert availability is not None
+        assert availability.firstSeen == availability.lastSeen
+        # the duplicate packet is not counted as new data
+        assert session.get(DataVersion, "ingest").version == 1
+
         # test add_node by supplying data for a node not seen yet.
 
         res = lff.store_state(
@@ -0,0 +1,69 @@
+from datetime import UTC, datetime, timedelta
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    NodeAvailability,
+    Reading,
+    SensorType,
+    Session,
+)
+from cogent.base.model.nodeavailability import (
+    backfill_availability,
+    record_availability,
+)
+
+
+def test_record_availability_extends_range(db_engine):
+    t0 = datetime(2024, 1, 2, 12)
+    with Session(db_engine) as session:
+        record_availability(session, 5, [0, 2], t0)
+        session.commit()
+        record_availability(session, 5, [0], t0 + timedelta(hours=1))
+        record_availability(session, 5, [2], t0 - timedelta(hours=1))
+        session.commit()
+
+        row0 = session.get(NodeAvailability, (5, 0))
+        row2 = session.get(NodeAvailability, (5, 2))
+        assert (row0.firstSeen, row0.lastSeen) == (t0, t0 + timedelta(hours=1))
+        assert (row2.firstSeen, row2.lastSeen) == (t0 - timedelta(hours=1), t0)
+
+
+def test_backfill_availability(db_engine):
+    t0 = datetime(2024, 1, 2, 12)
+    with Session(db_engine) as session:
+        session.add_all(
+            [
+                Reading(time=t0 + timedelta(minutes=5 * i), nodeId=7, typeId=0, value=i)
+                for i in range(4)
+            ]
+            + [Reading(time=t0, nodeId=8, typeId=6, value=3.0)]
+        )
+        session.commit()
+        assert backfill_availability(session) == 2
+        session.commit()
+        row = session.get(NodeAvailability, (7, 0))
+        assert row.firstSeen == t0
+        assert row.lastSeen == t0 + timedelta(minutes=15)
+
+
+def test_all_graphs_uses_availability(house_engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(house_engine) as session:
+        session.add_all([Node(id=n, locationId=400) for n in (21, 22, 23)])
+        session.get(SensorType, 0).active = True
+        # 21 reported recently, 22 only long ago, 23 reported another type
+        record_availability(session, 21, [0], now - timedelta(minutes=5))
+        record_availability(session, 22, [0], now - timedelta(days=30))
+        record_availability(session, 23, [2], now - timedelta(minutes=5))
+        session.commit()
+
+    client = create_app().test_client()
+    resp = client.get("/allGraphs?typ=0&period=day")
+    assert resp.status_code == 200
+    assert b"(21)" in resp.data
+    assert b"(22)" not in resp.data
+    assert b"(23)" not in resp.data
+
+    resp = client.get("/allGraphs?typ=0&period=2-years")
+    assert b"(22)" in resp.data
@@ -0,0 +1,144 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import event
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    NodeState,
+    Reading,
+    Session,
+)
+from cogent.base.model.nodeavailability import record_availability
+from cogent.views.graph.multiseries import node_time_ranges, series_readings
+from cogent.views.graph.utils import _get_value_and_delta
+
+
+class _FixedDateTime(datetime):
+    fixed_now = datetime.now(UTC)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fixed_now.astimezone(tz) if tz else cls.fixed_now
+
+
+def _setup(engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(engine) as session:
+        session.add(Node(id=61, locationId=400))
+        for i in range(1, 80):
+            t = now - timedelta(minutes=20 * i)
+            session.add_all(
+                [
+                    Reading(time=t, nodeId=61, typeId=4, value=100 + i),
+                    Reading(time=t, nodeId=61, typeId=0, value=18.0 + i % 5),
+                    Reading(time=t, nodeId=61, typeId=1, value=0.001 * (i % 3)),
+                    NodeState(time=t, nodeId=61, parent=0, localtime=0, seq_num=i),
+                ]
+            )
+        record_availability(session, 61, [0, 4], now - timedelta(minutes=20))
+        session.commit()
+    return engine, now
+
+
+def test_series_readings_match_single_series_queries(house_engine):
+    engine, now = _setup(house_engine)
+    start, end = now - timedelta(hours=12), now - timedelta(hours=2)
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    with Session(engine) as session:
+        readings = series_readings(session, [61, 62], [0, 4], start, end)
+    # bounds of the SIP type, then every reading in one query
+    assert len(statements) == 3
+    assert sorted(readings) == [(61, 0), (61, 4)]
+    assert readings[(61, 0)] == [
+        tuple(row) for row in _get_value_and_delta(61, 0, 1, start, end)
+    ]
+    with Session(engine) as session:
+        raw = (
+            session.query(Reading.time, Reading.value)
+            .filter(
+                Reading.nodeId == 61,
+                Reading.typeId == 4,
+                Reading.time >= start,
+                Reading.time <= end,
+            )
+            .order_by(Reading.time)
+            .all()
+        )
+    assert readings[(61, 4)] == [tuple(row) for row in raw]
+
+
+def test_node_time_ranges_bound_each_node(house_engine):
+    engine, now = _setup(house_engine)
+    old = now - timedelta(days=90)
+    start, end = now - timedelta(hours=2), now
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Node(id=62, locationId=400),
+                Reading(time=old, nodeId=61, typeId=4, value=1.0),
+                Reading(time=old, nodeId=62, typeId=4, value=2.0),
+                Reading(time=now - timedelta(hours=1), nodeId=62, typeId=4, value=3.0),
+            ]
+        )
+        session.commit()
+        # node 61 looks back months; node 62 keeps to the window
+        rows = (
+            session.query(Reading.nodeId, Reading.value)
+            .filter(
+                Reading.typeId == 4,
+                node_time_ranges(
+                    Reading.nodeId, Reading.time, [61, 62], start, end, {61: old}, {}
+                ),
+            )
+            .all()
+        )
+    assert (61, 1.0) in rows
+    assert (62, 2.0) not in rows
+    assert (62, 3.0) in rows
+
+
+def test_dashboard_json_matches_series_api(monkeypatch, house_engine):
+    _, now = _setup(house_engine)
+    # both endpoints predict up to the current time, so keep it fixed
+    monkeypatch.setattr(_FixedDateTime, "fixed_now", now.replace(tzinfo=UTC))
+    monkeypatch.setattr("cogent.views.graph.graph.datetime", _FixedDateTime)
+    client = create_app().test_client()
+    response = client.get("/api/nodeDashboard?node=61&typ=4&typ=0&period=day")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["house"], body["room"]) == ("House A", "Kitchen")
+    # the window is aligned for caching but does not extend into the future
+    assert datetime.fromisoformat(body["end"]) == now
+    for entry in body["series"]:
+        assert datetime.fromisoformat(entry["points"][-1][0]) <= now
+    assert [s["type"] for s in body["series"]] == [4, 0]
+    for entry in body["series"]:
+        single = client.get(
+            f"/api/series?node=61&typ={entry['type']}&period=day"
+        ).get_json()
+        assert entry["label"] == single["label"]
+        assert entry["points"] == single["points"]
+        assert entry["table"] == single["table"]
+
+    etag = response.headers["ETag"]
+    cached = client.get(
+        "/api/nodeDashboard?node=61&typ=4&typ=0&period=day",
+        headers={"If-None-Match": etag},
+    )
+    assert cached.status_code == 304
+    assert client.get("/api/nodeDashboard?node=99&typ=4").status_code == 404
+
+
+def test_dashboard_image(house_engine):
+    _setup(house_engine)
+    client = create_app().test_client()
+    png = client.get("/nodeDashboardImage?node=61&typ=0&typ=4&typ=2")
+    assert png.status_code == 200
+    assert png.mimetype == "image/png"
+    svg = client.get("/nodeDashboardImage?node=61&typ=0&typ=4&format=svg")
+    assert svg.mimetype == "image/svg+xml"
+    assert svg.data.count(b"<g transform") == 2
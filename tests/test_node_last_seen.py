@@ -0,0 +1,70 @@
+from datetime import UTC, datetime, timedelta
+
+from cogent import create_app
+from cogent.base.model import (
+    House,
+    Location,
+    Node,
+    NodeLastSeen,
+    NodeState,
+    Room,
+    Session,
+)
+from cogent.base.model.nodelastseen import backfill_last_seen, record_last_seen
+
+
+def _setup(engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(engine) as session:
+        session.add(House(id=400, address="House A"))
+        for i, room in enumerate(["Kitchen", "Bedroom"]):
+            session.add_all(
+                [
+                    Room(id=400 + i, name=room),
+                    Location(id=400 + i, houseId=400, roomId=400 + i),
+                    Node(id=71 + i, locationId=400 + i),
+                ]
+            )
+        # node 71 was last heard 3 hours ago, 72 12 hours ago and the
+        # unregistered node 90 an hour ago
+        for node_id, hours in ((71, 3), (71, 30), (72, 12), (72, 20), (90, 1)):
+            when = now - timedelta(hours=hours)
+            session.add(
+                NodeState(time=when, nodeId=node_id, parent=0, seq_num=hours, rssi=-50)
+            )
+            record_last_seen(session, node_id, when.replace(tzinfo=UTC), hours, 0, -50)
+        session.commit()
+    return engine, now
+
+
+def _last_seen(session):
+    return [
+        (row.nodeId, row.time, row.seq_num, row.rssi)
+        for row in session.query(NodeLastSeen).order_by(NodeLastSeen.nodeId)
+    ]
+
+
+def test_record_last_seen_matches_backfill(db_engine):
+    engine, now = _setup(db_engine)
+    with Session(engine) as session:
+        recorded = _last_seen(session)
+        assert [(n, seq) for n, _, seq, _ in recorded] == [(71, 3), (72, 12), (90, 1)]
+        assert backfill_last_seen(session) == 3
+        session.commit()
+        assert _last_seen(session) == recorded
+
+
+def test_missing_threshold(db_engine):
+    _setup(db_engine)
+    client = create_app().test_client()
+    default = client.get("/missing").data
+    assert b"not reporting in last 8 hours" in default
+    assert b"<td>Bedroom</td>" in default
+    assert b"<td>Kitchen</td>" not in default
+    assert b"90 <a" in default
+
+    wider = client.get("/missing?hours=24").data
+    assert b"No nodes missing" in wider
+    narrower = client.get("/missing?hours=2.5").data
+    assert b"not reporting in last 2.5 hours" in narrower
+    assert b"<td>Kitchen</td>" in narrower
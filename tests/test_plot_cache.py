@@ -0,0 +1,59 @@
+from datetime import UTC, datetime, timedelta
+
+from cogent import create_app
+from cogent.base.model import Session
+from cogent.base.model.nodeavailability import record_availability
+from cogent.views.graph.plotcache import PlotCache
+
+
+def test_plot_cache_versions(tmp_path):
+    cache = PlotCache(str(tmp_path))
+    key = PlotCache.key("plot", 1, 0)
+    assert cache.get(key, "v1") is None
+    cache.put(key, "v1", "image/png", b"\x89PNG data")
+    entry = cache.get(key, "v1")
+    assert entry.mimetype == "image/png"
+    assert entry.data == b"\x89PNG data"
+    # a newer data version is a miss
+    assert cache.get(key, "v2") is None
+
+
+def test_plot_cache_prune(tmp_path):
+    cache = PlotCache(str(tmp_path), max_entries=3)
+    for i in range(5):
+        cache.put(PlotCache.key(i), "v", "image/png", b"x")
+    cache.prune()
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_plot_etag_and_cache(monkeypatch, db_engine):
+    renders = []
+
+    def fake_render(session, node_id, *args, **kwargs):
+        renders.append(node_id)
+        return ["image/png", b"png-%d" % len(renders)]
+
+    monkeypatch.setattr("cogent.views.graph.graph._render_graph_image", fake_render)
+    client = create_app().test_client()
+
+    url = "/plot?node=64&typ=0&minsago=1440&duration=1440"
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.data == b"png-1"
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    # unchanged data: served from the shared cache and revalidated with 304
+    assert client.get(url).data == b"png-1"
+    revalidate = client.get(url, headers={"If-None-Match": etag})
+    assert revalidate.status_code == 304
+    assert renders == [64]
+
+    # a new reading for the node invalidates the cached image
+    with Session(db_engine) as session:
+        record_availability(session, 64, [0], datetime.now(UTC) - timedelta(seconds=1))
+        session.commit()
+    second = client.get(url, headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.data == b"png-2"
+    assert second.headers["ETag"] != etag
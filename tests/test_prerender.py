@@ -0,0 +1,57 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    Reading,
+    Session,
+)
+from cogent.base.model.nodeavailability import record_availability
+from cogent.scripts import prerender
+from cogent.views.graph.graph import _series_window
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("rendered on demand")
+
+
+def test_prerender_fills_cache(monkeypatch, tmp_path, house_engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(house_engine) as session:
+        session.add_all(
+            [
+                Node(id=51, locationId=400),
+                Node(id=52, locationId=400),
+            ]
+        )
+        for n in (51, 52):
+            session.add_all(
+                Reading(
+                    time=now - timedelta(minutes=10 * i), nodeId=n, typeId=4, value=i
+                )
+                for i in range(1, 50)
+            )
+            record_availability(session, n, [4], now - timedelta(minutes=10))
+        session.commit()
+
+    args = ["--database", str(house_engine.url), "--cache-dir", str(tmp_path / "plots")]
+    args += ["--types", "4", "--periods", "day", "--jobs", "2"]
+    window = _series_window(1440, 0)[2]
+    # one /allGraphs image plus an image and a series payload per node
+    assert prerender.main(args) == 5
+    if _series_window(1440, 0)[2] != window:
+        pytest.skip("chart window moved on during the test")
+    assert prerender.main(args) == 0
+
+    monkeypatch.setattr("cogent.views.graph.graph._render_graph_image", _fail)
+    monkeypatch.setattr("cogent.views.graph.graph._render_all_graphs", _fail)
+    monkeypatch.setattr("cogent.views.graph.graph._series_payload", _fail)
+    client = create_app().test_client()
+    plot = client.get("/plot?node=51&typ=4&minsago=1440&duration=1440")
+    assert plot.status_code == 200
+    assert plot.data.startswith(b"\x89PNG")
+    series = client.get("/api/series?node=52&typ=4&period=day")
+    assert len(series.get_json()["points"]) == 49
+    assert client.get("/allGraphsImage?typ=4&period=day").status_code == 200
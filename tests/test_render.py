@@ -0,0 +1,119 @@
+"""Tests for the pyplot-free PNG renderer.
+
+``test_render_soak`` renders two modest batches of charts by default so
+the suite stays quick; set ``CH_SOAK_RENDERS`` (e.g. to 5000) for a full
+soak.
+"""
+
+import io
+import os
+import resource
+import sys
+from datetime import datetime, timedelta
+
+import matplotlib
+import matplotlib.dates as mdates
+
+from cogent.views.graph.render import Chart, render_no_data, render_png
+
+START = datetime(2024, 1, 1)
+END = START + timedelta(days=1)
+
+
+def _chart(n=96, **kwargs):
+    t = [mdates.date2num(START + timedelta(minutes=15 * i)) for i in range(n)]
+    v = [20.0 + (i % 7) * 0.5 for i in range(n)]
+    return Chart(
+        start=mdates.date2num(START),
+        end=mdates.date2num(END),
+        y_label="Temperature (C)",
+        points_x=t,
+        points_y=v,
+        **kwargs,
+    )
+
+
+def _pyplot_reference(chart):
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure()
+    try:
+        fig.set_size_inches(7, 4)
+        ax = fig.add_subplot(111)
+        ax.set_autoscalex_on(False)
+        ax.set_xlim((chart.start, chart.end))
+        ax.plot(chart.points_x, chart.points_y, chart.fmt)
+        ax.xaxis_date()
+        fig.autofmt_xdate()
+        ax.set_xlabel("Date")
+        ax.set_ylabel(chart.y_label)
+        image = io.BytesIO()
+        fig.savefig(image, format="png")
+        return image.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def test_png_output_matches_pyplot():
+    chart = _chart()
+    assert render_png(chart) == _pyplot_reference(chart)
+    # the template figure is reused, so a second render must be identical
+    render_no_data()
+    assert render_png(chart) == _pyplot_reference(chart)
+
+
+def test_empty_chart_renders_no_data():
+    assert render_png(_chart(n=0)) == render_no_data()
+
+
+def test_spline_chart_with_prediction():
+    chart = _chart(
+        line_x=[mdates.date2num(START), mdates.date2num(START + timedelta(hours=3))],
+        line_y=[20.0, 21.0],
+        prediction=(
+            (mdates.date2num(START + timedelta(hours=3)), 21.0),
+            (mdates.date2num(END), 22.0),
+        ),
+    )
+    assert render_png(chart).startswith(b"\x89PNG")
+
+
+def _rss_kb():
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def test_render_soak():
+    renders = int(os.environ.get("CH_SOAK_RENDERS", "40"))
+    charts = [_chart(), _chart(n=0), _chart(n=500)]
+
+    def batch():
+        before = _rss_kb()
+        for i in range(renders):
+            render_png(charts[i % len(charts)])
+        return _rss_kb() - before
+
+    # the first batch fills matplotlib's caches and the allocator's arenas;
+    # a leak keeps growing by the same amount in the second
+    first = batch()
+    growth = batch()
+    limit = max(256, 4 * renders)
+    assert growth < limit, (
+        f"RSS grew by {growth} kB over renders {renders + 1} to {2 * renders}"
+        f" (first {renders}: {first} kB)"
+    )
+    if "matplotlib.pyplot" in sys.modules:
+        assert sys.modules["matplotlib.pyplot"].get_fignums() == []
+
+
+def test_plot_helper_returns_png():
+    from cogent.views.graph.utils import _plot
+
+    chart = _chart()
+    mimetype, data = _plot(0, chart.points_x, chart.points_y, START, END, False, "bo")
+    assert mimetype == "image/png"
+    assert data == render_png(chart._replace(y_label="0"))
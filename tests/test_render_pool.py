@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from cogent import create_app
+from cogent.views.graph import renderpool
+from cogent.views.graph.render import Chart, render_png, render_png_grid
+from cogent.views.graph.renderpool import (
+    RenderBusy,
+    RenderPool,
+    RenderTimeout,
+    RenderUnavailable,
+    get_render_pool,
+)
+
+CHART = Chart(
+    19000.0,
+    19001.0,
+    "Temperature",
+    points_x=[19000.0 + i / 20 for i in range(20)],
+    points_y=[20.0 + i % 3 for i in range(20)],
+)
+
+
+def _slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(1, timeout=30, max_pending=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_matches_inline_rendering(pool):
+    assert pool.run(render_png, CHART) == render_png(CHART)
+    titles = ["a", "b"]
+    charts = [CHART, Chart(0.0, 1.0, "")]
+    assert pool.run(render_png_grid, charts, titles) == render_png_grid(charts, titles)
+
+
+def test_pool_rejects_when_full(pool):
+    pool.run(_slow, 0)  # start the worker
+    thread = threading.Thread(target=pool.run, args=(_slow, 1))
+    thread.start()
+    time.sleep(0.2)
+    try:
+        with pytest.raises(RenderBusy):
+            pool.run(_slow, 0)
+    finally:
+        thread.join()
+    assert pool.run(_slow, 0) == 0
+
+
+def test_pool_timeout_restarts_workers():
+    pool = RenderPool(1, timeout=30)
+    try:
+        pool.run(_slow, 0)  # start the worker
+        pool.timeout = 0.5
+        with pytest.raises(RenderTimeout):
+            pool.run(_slow, 30)
+        pool.timeout = 30
+        assert pool.run(_slow, 0) == 0
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_spares_overlapping_render():
+    pool = RenderPool(2, timeout=30)
+    try:
+        # start both workers
+        warm = threading.Thread(target=pool.run, args=(_slow, 0.5))
+        warm.start()
+        pool.run(_slow, 0.5)
+        warm.join()
+        pool.timeout = 6
+        errors = []
+
+        def stuck():
+            try:
+                pool.run(_slow, 60)
+            except RenderUnavailable as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=stuck)
+        thread.start()
+        time.sleep(5)
+        # still running when the stuck render's workers are killed, so it
+        # is run again in the new pool
+        start = time.monotonic()
+        assert pool.run(_slow, 1.5) == 1.5
+        assert time.monotonic() - start > 2.5
+        thread.join()
+        assert [type(exc) for exc in errors] == [RenderTimeout]
+    finally:
+        pool.shutdown()
+
+
+def test_pool_configured_from_environment(monkeypatch):
+    monkeypatch.setattr(renderpool, "_POOL", None)
+    monkeypatch.delenv("CH_RENDER_WORKERS", raising=False)
+    assert get_render_pool() is None
+    assert renderpool.render(_slow, 0) == 0
+    monkeypatch.setenv("CH_RENDER_WORKERS", "2")
+    monkeypatch.setenv("CH_RENDER_TIMEOUT", "3.5")
+    pool = get_render_pool()
+    assert (pool.workers, pool.timeout, pool.max_pending) == (2, 3.5, 4)
+    assert get_render_pool() is pool
+    monkeypatch.setenv("CH_RENDER_WORKERS", "1")
+    assert get_render_pool().workers == 1
+    with pytest.raises(RenderUnavailable):
+        pool.run(_slow, 0)
+
+
+def test_busy_pool_gives_service_unavailable(monkeypatch, db_engine):
+    def busy(fn, *args):
+        raise RenderBusy("full")
+
+    monkeypatch.setattr("cogent.views.graph.utils.render", busy)
+    client = create_app().test_client()
+    response = client.get("/plot?node=64&typ=0&minsago=1440&duration=1440")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
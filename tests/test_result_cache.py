@@ -0,0 +1,108 @@
+import threading
+import time
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    Session,
+)
+from cogent.base.model.dataversion import INGEST, bump_version
+from cogent.views import main
+from cogent.views.resultcache import MISS, ResultCache
+
+
+def test_get_put_version_and_expiry(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    key = cache.key("/yield24", [("days", "1")])
+    assert cache.get(key, "v1") is MISS
+
+    cache.put(key, "v1", {"rows": [1, 2]})
+    assert cache.get(key, "v1") == {"rows": [1, 2]}
+    # a new data version invalidates the entry
+    assert cache.get(key, "v2") is MISS
+
+    cache.put(key, "v1", "stale", ttl=-1)
+    assert cache.get(key, "v1") is MISS
+
+
+def test_least_recently_used_entries_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"), max_entries=2)
+    cache.put("a", "v", 1)
+    time.sleep(0.01)
+    cache.put("b", "v", 2)
+    time.sleep(0.01)
+    assert cache.get("a", "v") == 1
+    time.sleep(0.01)
+    cache.put("c", "v", 3)
+
+    assert cache.get("a", "v") == 1
+    assert cache.get("b", "v") is MISS
+    assert cache.get("c", "v") == 3
+
+
+def test_concurrent_misses_compute_once(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return "result"
+
+    results = []
+
+    def worker():
+        # a cache per thread stands in for separate worker processes
+        results.append(ResultCache(path).get_or_compute("k", "v", compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+
+
+def test_expired_lease_does_not_block(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"), lease=0.2)
+    # a worker took the lease and never finished
+    assert cache._acquire("k")
+
+    start = time.monotonic()
+    assert cache.get_or_compute("k", "v", lambda: "mine") == "mine"
+    assert time.monotonic() - start < 5
+    assert cache.get("k", "v") == "mine"
+
+
+def test_cached_view_shared_until_data_changes(monkeypatch, tmp_path, house_engine):
+    with Session(house_engine) as session:
+        session.add(Node(id=61, locationId=400))
+        session.commit()
+    monkeypatch.setenv("CH_RESULT_CACHE", str(tmp_path / "results.sqlite"))
+
+    calls = []
+    window_yields = main.window_yields
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return window_yields(*args, **kwargs)
+
+    monkeypatch.setattr(main, "window_yields", counting)
+    client = create_app().test_client()
+
+    first = client.get("/yield24?days=1")
+    second = client.get("/yield24?days=1")
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert len(calls) == 1
+
+    client.get("/yield24?days=7")
+    assert len(calls) == 2
+
+    with Session(house_engine) as session:
+        bump_version(session, INGEST)
+        session.commit()
+    client.get("/yield24?days=1")
+    assert len(calls) == 3
@@ -0,0 +1,47 @@
+from cogent import create_app
+
+
+def _app(monkeypatch, **env):
+    monkeypatch.setenv("CH_PROFILE_TOKEN", "secret")
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return create_app()
+
+
+def test_profile_report_requires_token(monkeypatch, db_engine):
+    client = _app(monkeypatch).test_client()
+    resp = client.get("/lowbat?profile=wrong")
+    assert b"Low batteries" in resp.data
+
+    resp = client.get("/lowbat?profile=secret")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    assert b"wall time" in resp.data
+    assert b"lowbat" in resp.data
+    assert b"Top allocation sites" in resp.data
+
+
+def test_profile_header_stores_report(monkeypatch, tmp_path, db_engine):
+    report_dir = tmp_path / "profiles"
+    client = _app(monkeypatch, CH_PROFILE_DIR=str(report_dir)).test_client()
+    resp = client.get("/lowbat", headers={"X-Profile": "secret"})
+    assert b"Low batteries" in resp.data
+    name = resp.headers["X-Profile-Report"]
+    assert (report_dir / name).read_text().startswith("/lowbat")
+
+
+def test_sampled_profiles_are_aggregated(monkeypatch, tmp_path, db_engine):
+    report_dir = tmp_path / "profiles"
+    client = _app(
+        monkeypatch, CH_PROFILE_SAMPLE="2", CH_PROFILE_DIR=str(report_dir)
+    ).test_client()
+    for _ in range(4):
+        assert client.get("/lowbat").status_code == 200
+
+    assert client.get("/_profile").status_code == 404
+    resp = client.get("/_profile?token=secret")
+    assert b"main.lowbat" in resp.data
+    assert b"2 samples" in resp.data
+    resp = client.get("/_profile?token=secret&endpoint=main.lowbat")
+    assert b"cumulative" in resp.data
+    assert list(report_dir.glob("main.lowbat.*.prof"))
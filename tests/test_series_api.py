@@ -0,0 +1,64 @@
+import json
+from datetime import UTC, datetime, timedelta
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    Reading,
+    Session,
+)
+from cogent.base.model.nodeavailability import record_availability
+
+
+def _client(engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(engine) as session:
+        session.add(Node(id=31, locationId=400))
+        session.add_all(
+            Reading(
+                time=now - timedelta(minutes=5 * i), nodeId=31, typeId=4, value=40 + i
+            )
+            for i in range(1, 200)
+        )
+        record_availability(session, 31, [4], now - timedelta(minutes=5))
+        session.commit()
+    return create_app().test_client()
+
+
+def test_series_json(house_engine):
+    client = _client(house_engine)
+    response = client.get("/api/series?node=31&typ=4&period=day")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["node"] == 31
+    assert body["type"] == 4
+    # 199 readings over the last day are downsampled for the chart
+    assert 0 < len(body["points"]) <= 100
+    times = [p[0] for p in body["points"]]
+    assert times == sorted(times)
+    assert all(body["start"] <= t <= body["end"] for t in times)
+    assert len(body["table"]["rows"]) == len(body["points"])
+    assert body["options"]["legend"] == {"position": "none"}
+    # the spliced table gives the same bytes as serialising the whole body
+    assert response.data == json.dumps(body).encode()
+
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"]
+    cached = client.get(
+        "/api/series?node=31&typ=4&period=day", headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+
+    budget = client.get("/api/series?node=31&typ=4&period=day&points=20&downsample=m4")
+    assert 0 < len(budget.get_json()["points"]) <= 20
+    assert budget.headers["ETag"] != etag
+
+
+def test_node_graph_renders_shell(house_engine):
+    client = _client(house_engine)
+    response = client.get("/nodeGraph?node=31&typ=4&period=day")
+    assert response.status_code == 200
+    assert b"/api/series?" in response.data
+    assert b"House A: Kitchen (31)" in response.data
+    assert client.get("/nodeGraph?node=999").status_code == 404
+    assert client.get("/api/series").status_code == 404
@@ -1,6 +1,7 @@
 from datetime import UTC, datetime, timedelta
 
 from cogent.base.model import Node, NodeState
+from cogent.base.model.nodelastseen import record_last_seen
 from cogent.report.serverdown import server_down
 
 from . import base
@@ -21,6 +22,7 @@ class TestServerDownReport(base.BaseTestCase):
                 seq_num=1,
             )
         )
+        record_last_seen(self.session, node.id, report_time, 1, 0)
         self.session.flush()
 
         start_time = report_time - timedelta(hours=1)
@@ -43,3 +45,21 @@ class TestServerDownReport(base.BaseTestCase):
         assert "No nodes have reported" in result[0]
         assert str(start_time) in result[0]
         assert str(end_time) in result[0]
+
+    def test_server_down_for_window_before_latest_report(self):
+        self.session.add(Node(id=3))
+        start_time = datetime(2024, 1, 1, tzinfo=UTC)
+        for hours in (1, 10):
+            when = start_time + timedelta(hours=hours)
+            self.session.add(
+                NodeState(time=when, nodeId=3, parent=0, localtime=0, seq_num=hours)
+            )
+            record_last_seen(self.session, 3, when, hours, 0)
+        self.session.flush()
+
+        end_time = start_time + timedelta(hours=4)
+        assert server_down(self.session, start_t=start_time, end_t=end_time) == []
+        later = server_down(
+            self.session, start_t=end_time, end_t=end_time + timedelta(hours=4)
+        )
+        assert len(later) == 1
@@ -0,0 +1,126 @@
+import fcntl
+import os
+import threading
+import time
+
+import pytest
+
+from cogent import create_app
+from cogent.views.graph.singleflight import SingleFlight
+
+
+def _run(threads):
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_calls_share_one_result(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "image"
+
+    _run(
+        [
+            threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+            for _ in range(5)
+        ]
+    )
+    assert results == ["image"] * 5
+    assert len(calls) == 1
+
+    # later calls compute again
+    assert flight.do("k", compute) == "image"
+    assert len(calls) == 2
+
+
+def test_leader_error_is_shared(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    errors = []
+
+    def compute():
+        time.sleep(0.2)
+        raise ValueError("render failed")
+
+    def call():
+        with pytest.raises(ValueError):
+            flight.do("k", compute)
+        errors.append(1)
+
+    _run([threading.Thread(target=call) for _ in range(3)])
+    assert len(errors) == 3
+
+
+def test_stuck_leader_does_not_block_followers(tmp_path):
+    flight = SingleFlight(str(tmp_path), timeout=0.2)
+    release = threading.Event()
+    leader = threading.Thread(
+        target=lambda: flight.do("k", lambda: release.wait(10) and "late")
+    )
+    leader.start()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    assert flight.do("k", lambda: "own") == "own"
+    assert time.monotonic() - start < 5
+    release.set()
+    leader.join()
+
+
+def test_follower_in_another_process_uses_stored_result(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    # a separate open file description stands in for another worker
+    fd = os.open(flight._lock_path(str(tmp_path), "k"), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    store = {}
+    results = []
+
+    def compute():
+        return "computed"
+
+    follower = threading.Thread(
+        target=lambda: results.append(flight.do("k", compute, lambda: store.get("k")))
+    )
+    follower.start()
+    time.sleep(0.2)
+    assert results == []
+    store["k"] = "stored"
+    os.close(fd)
+    follower.join()
+    assert results == ["stored"]
+
+    # an expired wait falls back to computing
+    flight = SingleFlight(str(tmp_path), timeout=0.2)
+    fd = os.open(flight._lock_path(str(tmp_path), "k"), os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        assert flight.do("k", compute, lambda: None) == "computed"
+    finally:
+        os.close(fd)
+
+
+def test_concurrent_plot_requests_render_once(monkeypatch, tmp_path, db_engine):
+    monkeypatch.setenv("CH_SINGLEFLIGHT_DIR", str(tmp_path / "locks"))
+    renders = []
+
+    def slow_render(session, node_id, *args, **kwargs):
+        renders.append(node_id)
+        time.sleep(0.3)
+        return ["image/png", b"png"]
+
+    monkeypatch.setattr("cogent.views.graph.graph._render_graph_image", slow_render)
+    app = create_app()
+    responses = []
+
+    def fetch():
+        responses.append(app.test_client().get("/plot?node=64&typ=0"))
+
+    _run([threading.Thread(target=fetch) for _ in range(4)])
+    assert [r.data for r in responses] == [b"png"] * 4
+    assert renders == [64]
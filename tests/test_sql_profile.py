@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from cogent import create_app
+from cogent.base.model import Session
+from cogent.base.model.dataversion import INGEST, bump_version
+from cogent.profiling.sql import SqlProfiler
+
+
+def test_server_timing_header(monkeypatch, db_engine):
+    monkeypatch.setenv("CH_SQL_PROFILE", "1")
+    app = create_app()
+    client = app.test_client()
+    resp = client.get("/lowbat")
+    assert resp.status_code == 200
+    header = resp.headers["Server-Timing"]
+    assert header.startswith("db;dur=")
+    # the data watermark for the validators, then the page itself
+    assert "2 queries" in header
+    assert "app;dur=" in header
+
+
+def test_server_timing_counts_fetched_rows(monkeypatch, db_engine):
+    with Session(db_engine) as session:
+        bump_version(session, INGEST)
+        session.commit()
+    monkeypatch.setenv("CH_SQL_PROFILE", "1")
+    app = create_app()
+    resp = app.test_client().get("/lowbat")
+    # the ingest and reference watermarks; no node has a low battery
+    assert '"2 queries, 2 rows"' in resp.headers["Server-Timing"]
+
+
+def test_failed_statement_leaves_no_start_time():
+    app = Flask(__name__)
+    engine = create_engine("sqlite://")
+    SqlProfiler().install(app, engine)
+    with app.test_request_context(), engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        assert conn.info["query_start"] == []
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_start"] == []
+
+
+def test_slow_query_log(monkeypatch, caplog, db_engine):
+    monkeypatch.setenv("CH_SQL_PROFILE", "yes")
+    monkeypatch.setenv("CH_SLOW_QUERY_MS", "0")
+    app = create_app()
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING, logger="cogent.slowquery"):
+        resp = client.get("/lowbat?bat=2.1")
+    assert resp.status_code == 200
+    records = [r for r in caplog.records if r.name == "cogent.slowquery"]
+    assert records
+    # the page query follows the data watermark query
+    message = records[-1].getMessage()
+    assert "route=main.lowbat" in message
+    assert "args=bat=2.1" in message
+    assert "2.1" in message.split("parameters=")[1]
+
+
+def test_profiling_disabled_by_default(monkeypatch, db_engine):
+    monkeypatch.delenv("CH_SQL_PROFILE", raising=False)
+    app = create_app()
+    resp = app.test_client().get("/lowbat")
+    assert "Server-Timing" not in resp.headers
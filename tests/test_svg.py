@@ -0,0 +1,86 @@
+"""Tests for the native SVG chart renderer."""
+
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+
+import matplotlib.dates as mdates
+
+from cogent import create_app
+from cogent.views.graph.render import Chart
+from cogent.views.graph.svg import parse_fmt, render_svg
+
+SVG = "{http://www.w3.org/2000/svg}"
+START = datetime(2024, 1, 1)
+END = START + timedelta(days=1)
+
+
+def _chart(n=96, **kwargs):
+    step = timedelta(days=1) / max(n, 1)
+    t = [mdates.date2num(START + step * i) for i in range(n)]
+    v = [20.0 + (i % 7) * 0.5 for i in range(n)]
+    return Chart(
+        start=mdates.date2num(START),
+        end=mdates.date2num(END),
+        y_label="Temperature (C)",
+        points_x=t,
+        points_y=v,
+        **kwargs,
+    )
+
+
+def test_parse_fmt():
+    assert parse_fmt("bo") == ("#1f77b4", "o", None)
+    assert parse_fmt("r-") == ("#d62728", None, "-")
+    assert parse_fmt("g.--") == ("#2ca02c", ".", "--")
+
+
+def test_svg_chart_elements():
+    chart = _chart(
+        line_x=[mdates.date2num(START), mdates.date2num(START + timedelta(hours=3))],
+        line_y=[20.0, 21.0],
+        prediction=(
+            (mdates.date2num(START + timedelta(hours=3)), 21.0),
+            (mdates.date2num(END), 22.0),
+        ),
+    )
+    root = ET.fromstring(render_svg(chart))
+    assert root.tag == SVG + "svg"
+    texts = [e.text for e in root.iter(SVG + "text")]
+    assert "Date" in texts
+    assert "Temperature (C)" in texts
+    # one marker per point plus the red prediction marker
+    assert len(list(root.iter(SVG + "circle"))) == 97
+    dashed = [e for e in root.iter(SVG + "path") if e.get("stroke-dasharray")]
+    assert len(dashed) == 1
+
+
+def test_svg_no_data():
+    root = ET.fromstring(render_svg(_chart(n=0)))
+    assert [e.text for e in root.iter(SVG + "text")] == ["No data"]
+
+
+def test_svg_is_small_and_fast():
+    chart = _chart(n=2000)
+    started = time.perf_counter()
+    data = render_svg(chart)
+    assert time.perf_counter() - started < 0.5
+    assert len(data) < 200_000
+
+
+def test_plot_serves_svg(db_engine):
+    client = create_app().test_client()
+
+    url = "/plot?node=64&typ=0&minsago=1440&duration=1440"
+    response = client.get(url + "&format=svg")
+    assert response.status_code == 200
+    assert response.mimetype == "image/svg+xml"
+    ET.fromstring(response.data)
+
+    accept = client.get(url, headers={"Accept": "image/svg+xml,image/png;q=0.5"})
+    assert accept.mimetype == "image/svg+xml"
+    assert "Accept" in accept.headers["Vary"]
+
+    png = client.get(url)
+    assert png.mimetype == "image/png"
+    assert png.headers["ETag"] != response.headers["ETag"]
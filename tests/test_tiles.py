@@ -0,0 +1,95 @@
+from datetime import UTC, datetime, timedelta
+
+from cogent import create_app
+from cogent.base.model import (
+    Node,
+    Reading,
+    Session,
+)
+from cogent.base.model.nodeavailability import record_availability
+from cogent.views.graph.tiles import (
+    TILE_BUCKETS,
+    TILE_SPANS,
+    tile_bounds,
+    tile_index,
+)
+
+DAY_ZOOM = TILE_SPANS.index(86400)
+
+
+def _client(engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(engine) as session:
+        session.add(Node(id=31, locationId=400))
+        session.add_all(
+            Reading(time=now - timedelta(minutes=30 * i), nodeId=31, typeId=4, value=i)
+            for i in range(200)
+        )
+        record_availability(session, 31, [4], now)
+        session.commit()
+    return create_app().test_client(), now
+
+
+def test_tile_geometry():
+    assert all(span % TILE_BUCKETS == 0 for span in TILE_SPANS)
+    assert TILE_SPANS == sorted(TILE_SPANS, reverse=True)
+    when = datetime(2024, 2, 29, 13, 45)
+    for zoom in range(len(TILE_SPANS)):
+        start, end = tile_bounds(zoom, tile_index(zoom, when))
+        assert start <= when < end
+
+
+def test_closed_tile_is_immutable(house_engine):
+    client, now = _client(house_engine)
+    # two days back, so the tile is closed whatever the time of day
+    index = tile_index(DAY_ZOOM, now) - 2
+    url = f"/api/tile?node=31&typ=4&zoom={DAY_ZOOM}&index={index}"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == 365 * 24 * 3600
+    body = response.get_json()
+    assert body["closed"]
+    assert body["bucket_seconds"] == 360
+    start, end = tile_bounds(DAY_ZOOM, index)
+    expected = sum(start <= now - timedelta(minutes=30 * i) < end for i in range(200))
+    assert sum(b[5] for b in body["buckets"]) == expected
+    assert all(start.isoformat() <= b[0] < end.isoformat() for b in body["buckets"])
+
+    cached = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+def test_replayed_readings_refresh_closed_tile(house_engine):
+    client, now = _client(house_engine)
+    index = tile_index(DAY_ZOOM, now) - 2
+    url = f"/api/tile?node=31&typ=4&zoom={DAY_ZOOM}&index={index}"
+    before = client.get(url)
+    start, _ = tile_bounds(DAY_ZOOM, index)
+    # a log replayed late, reaching up to the present
+    with Session(house_engine) as session:
+        session.add(Reading(time=start + timedelta(seconds=1), nodeId=31, typeId=4))
+        record_availability(session, 31, [4], now + timedelta(seconds=1))
+        session.commit()
+    after = client.get(url)
+    assert after.cache_control.immutable
+    assert after.headers["ETag"] != before.headers["ETag"]
+    count = sum(b[5] for b in after.get_json()["buckets"])
+    assert count == sum(b[5] for b in before.get_json()["buckets"]) + 1
+
+
+def test_current_tile_revalidates(house_engine):
+    client, now = _client(house_engine)
+    index = tile_index(DAY_ZOOM, now)
+    response = client.get(f"/api/tile?node=31&typ=4&zoom={DAY_ZOOM}&index={index}")
+    assert response.status_code == 200
+    assert not response.cache_control.immutable
+    assert response.cache_control.must_revalidate
+    assert not response.get_json()["closed"]
+
+    future = client.get(
+        f"/api/tile?node=31&typ=4&zoom={DAY_ZOOM}&index={index + 5}"
+    ).get_json()
+    assert future["buckets"] == []
+
+    assert client.get("/api/tile?node=31&typ=4&zoom=99&index=1").status_code == 404
@@ -0,0 +1,115 @@
+import threading
+import time
+
+from sqlalchemy import create_engine
+
+from cogent.base.model import Base, Session, Timings, meta
+from cogent.base.model.timings import TimingAggregator, _Histogram, timed, timedtext
+
+
+def test_histogram_percentiles_are_bounded():
+    hist = _Histogram()
+    for i in range(1, 101):
+        hist.add(i / 1000.0)
+    assert hist.count == 100
+    assert hist.minimum == 0.001
+    assert hist.maximum == 0.1
+    p50 = hist.percentile(50)
+    assert 0.045 <= p50 <= 0.056
+    assert hist.percentile(99) <= hist.maximum
+    assert hist.percentile(100) == hist.maximum
+
+
+def test_aggregator_flushes_one_row_per_function(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'timings.db'}")
+    Base.metadata.create_all(engine)
+
+    agg = TimingAggregator(flush_interval=None)
+    for _ in range(10):
+        agg.record("fast", None, 0.001)
+    agg.record("slow", "label", 2.0)
+
+    snap = agg.snapshot()
+    assert snap[("fast", None)]["calls"] == 10
+    assert snap[("slow", "label")]["maximum"] == 2.0
+
+    with Session(engine) as session:
+        rows = agg.flush(session)
+        session.commit()
+        assert len(rows) == 2
+        stored = {row.function: row for row in session.query(Timings).all()}
+
+    assert stored["fast"].calls == 10
+    assert abs(stored["fast"].total - 0.01) < 1e-9
+    assert stored["slow"].text == "label"
+    assert stored["slow"].p99 == 2.0
+    # stats are reset after a flush
+    assert agg.snapshot() == {}
+
+
+def test_flush_in_own_session(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'timings.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(meta, "engine", engine)
+    agg = TimingAggregator(flush_interval=None)
+    agg.record("fast", None, 0.001)
+    (row,) = agg.flush()
+    # still readable after the flush's session has closed
+    assert "fast x1" in str(row)
+    with Session(engine) as session:
+        assert session.query(Timings).count() == 1
+
+
+def test_failed_flush_keeps_statistics(tmp_path):
+    # no Timings table, so the rows cannot be written
+    engine = create_engine(f"sqlite:///{tmp_path / 'timings.db'}")
+    agg = TimingAggregator(flush_interval=None)
+    agg.record("fast", None, 0.001)
+    with Session(engine) as session:
+        assert agg.flush(session) == []
+    agg.record("fast", None, 0.003)
+    snap = agg.snapshot()[("fast", None)]
+    assert snap["calls"] == 2
+    assert snap["maximum"] == 0.003
+
+
+def test_flush_runs_off_the_calling_thread(monkeypatch):
+    agg = TimingAggregator(flush_interval=0.05)
+    flushed = threading.Event()
+    threads = []
+
+    def flush(session=None):
+        threads.append(threading.current_thread())
+        flushed.set()
+        return []
+
+    monkeypatch.setattr(agg, "flush", flush)
+    agg.record("fast", None, 0.001)
+    assert threads == []
+    assert flushed.wait(5)
+    time.sleep(0.2)
+    agg.record("fast", None, 0.001)
+    assert threading.current_thread() not in threads
+
+
+def test_decorators_record_into_global_aggregator():
+    from cogent.base.model.timings import AGGREGATOR
+
+    AGGREGATOR.reset()
+
+    @timed
+    def add(a, b):
+        return a + b
+
+    @timedtext("labelled")
+    def mul(a, b):
+        return a * b
+
+    assert add(1, 2) == 3
+    assert mul(2, 3) == 6
+    assert add.__name__ == "add"
+
+    snap = AGGREGATOR.snapshot()
+    assert snap[("add", None)]["calls"] == 1
+    assert snap[("mul", "labelled")]["calls"] == 1
+    AGGREGATOR.reset()
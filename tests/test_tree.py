@@ -0,0 +1,103 @@
+from datetime import UTC, datetime, timedelta
+
+from cogent import create_app
+from cogent.base.model import (
+    HourlyLink,
+    Node,
+    NodeState,
+    Session,
+)
+from cogent.base.model.hourlylink import backfill_links, record_link
+from cogent.views import tree
+
+
+def _add_state(session, node_id, parent, rssi, when):
+    session.add(
+        NodeState(time=when, nodeId=node_id, parent=parent, seq_num=0, rssi=rssi)
+    )
+    record_link(session, node_id, parent, rssi, when)
+
+
+def _setup(engine):
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with Session(engine) as session:
+        session.add_all(
+            [
+                Node(id=71, locationId=400),
+                Node(id=72, locationId=400),
+            ]
+        )
+        for i in range(1, 40):
+            when = now - timedelta(minutes=20 * i)
+            _add_state(session, 71, 72 if i % 4 else 0, -40 - i % 3, when)
+            _add_state(session, 72, 0, None if i % 2 else -60, when)
+            _add_state(session, 72, 65535, -70, when - timedelta(seconds=1))
+        session.commit()
+    return engine, now
+
+
+def _links(session):
+    return [
+        (r.nodeId, r.parent, r.hour, r.packets, r.rssiSum, r.rssiMin, r.rssiMax)
+        for r in session.query(HourlyLink).order_by(
+            HourlyLink.nodeId, HourlyLink.parent, HourlyLink.hour
+        )
+    ]
+
+
+def test_record_link_matches_backfill(house_engine):
+    engine, _ = _setup(house_engine)
+    with Session(engine) as session:
+        recorded = _links(session)
+        assert backfill_links(session) == len(recorded)
+        session.commit()
+        assert _links(session) == recorded
+
+
+def test_tree_source(house_engine):
+    _setup(house_engine)
+    client = create_app().test_client()
+    source = client.get("/tree?period=day&debug=y").data.decode()
+    assert "71 -> 72" in source
+    assert "71 -> 0" in source
+    assert "72 -> 0 [label=-60.0" in source
+    assert "65535" not in source
+    assert 'label="71:400:Kitchen"' in source
+
+
+def test_tree_svg_is_cached(monkeypatch, house_engine):
+    engine, now = _setup(house_engine)
+    calls = []
+
+    def pipe(self, format=None):
+        calls.append(self.source)
+        return b"<svg/>"
+
+    monkeypatch.setattr(tree.Digraph, "pipe", pipe)
+    client = create_app().test_client()
+    first = client.get("/tree?period=day")
+    assert first.mimetype == "image/svg+xml"
+    assert first.data == b"<svg/>"
+    second = client.get("/tree?period=day")
+    assert second.data == b"<svg/>"
+    assert len(calls) == 1
+    assert second.headers["ETag"] == first.headers["ETag"]
+    cached = client.get(
+        "/tree?period=day", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert cached.status_code == 304
+
+    # more packets with the same statistics leave the source unchanged
+    with Session(engine) as session:
+        _add_state(session, 72, 0, None, now - timedelta(seconds=5))
+        session.commit()
+    assert client.get("/tree?period=day").headers["ETag"] == first.headers["ETag"]
+    assert len(calls) == 1
+
+    # a new link changes the source, so the tree is drawn again
+    with Session(engine) as session:
+        _add_state(session, 72, 71, -50, now)
+        session.commit()
+    client.get("/tree?period=day")
+    assert len(calls) == 2
+    assert "72 -> 71" in calls[1]